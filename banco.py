@@ -0,0 +1,830 @@
+# banco.py
+import logging
+import os
+import pathlib
+import random
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+
+# --- Utilitário: caminho do banco confiável mesmo quando empacotado ---
+# Aqui, e não na interface: servidor e linhas de comando usam sem importar o Tk
+def get_db_path():
+    # Se empacotado com PyInstaller, sys._MEIPASS existe; guardamos o DB ao lado do exe.
+    base_path = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_path, "biblioteca_escolar.db")
+
+
+DB_PATH = get_db_path()
+
+# --- Ajustes aplicados a toda conexão aberta pelo sistema ---
+# WAL permite leituras enquanto outra aba/balcão grava; NORMAL é seguro com WAL
+# e evita um fsync por commit. cache_size negativo é em KiB (~32 MB).
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -32000),
+    ("mmap_size", 256 * 1024 * 1024),
+    ("temp_store", "MEMORY"),
+)
+
+# Pragmas gravados no arquivo (valem para todas as conexões, de qualquer
+# processo): conexões somente leitura nunca os aplicam
+PRAGMAS_PERSISTENTES = ("journal_mode",)
+
+# O que uma conexão somente leitura pode executar (ver _autorizar_leitura)
+ACOES_LEITURA = (sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ,
+                 sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE)
+PRAGMAS_LEITURA = ("user_version", "data_version")
+
+# Quantos comandos preparados o sqlite3 mantém em cache por conexão
+CACHE_COMANDOS = 256
+
+# Tempo (s) que uma conexão espera por um lock antes de falhar com "database is locked"
+TIMEOUT_LOCK = 5.0
+
+# Se o lock continuar ocupado após o TIMEOUT_LOCK, gravar() tenta de novo
+# esperando ESPERA_INICIAL, depois o dobro, e assim por diante
+TENTATIVAS_GRAVACAO = 5
+ESPERA_INICIAL = 0.05
+
+# Tabelas cujas alterações (insert/update/delete por id) são avisadas aos inscritos
+TABELAS_NOTIFICADAS = ("livros", "alunos", "emprestimos")
+
+# Colunas com aviso próprio ("tabela.coluna"), só quando o valor muda num update
+COLUNAS_NOTIFICADAS = (("alunos", "turma"), ("livros", "titulo"))
+
+
+# ---------------------- MIGRAÇÕES ----------------------
+# Cada migração recebe um cursor dentro de uma transação. A posição na lista
+# define a versão (PRAGMA user_version) que o banco passa a ter depois dela:
+# nunca altere uma migração já publicada, acrescente uma nova ao final.
+
+def _migracao_tabelas(cursor):
+    """Versão 1: tabelas originais (bancos antigos já as possuem)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS livros (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            titulo TEXT NOT NULL,
+            autor TEXT NOT NULL,
+            isbn TEXT UNIQUE,
+            categoria TEXT,
+            quantidade INTEGER DEFAULT 1,
+            disponivel INTEGER DEFAULT 1,
+            data_cadastro DATE DEFAULT CURRENT_DATE
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS alunos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            matricula TEXT UNIQUE NOT NULL,
+            serie TEXT,
+            turma TEXT,
+            telefone TEXT,
+            email TEXT,
+            data_cadastro DATE DEFAULT CURRENT_DATE
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS emprestimos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            livro_id INTEGER,
+            aluno_id INTEGER,
+            data_emprestimo DATE DEFAULT CURRENT_DATE,
+            data_devolucao_prevista DATE,
+            data_devolucao_real DATE,
+            status TEXT DEFAULT 'Emprestado',
+            observacoes TEXT,
+            FOREIGN KEY (livro_id) REFERENCES livros (id),
+            FOREIGN KEY (aluno_id) REFERENCES alunos (id)
+        )
+    ''')
+
+
+def _migracao_indices(cursor):
+    """Versão 2: índices para as consultas mais frequentes"""
+    # Devoluções do dia e lista de empréstimos ativos
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_emprestimos_status_prevista
+        ON emprestimos (status, data_devolucao_prevista)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_emprestimos_status_data
+        ON emprestimos (status, data_emprestimo)
+    ''')
+    # Livros emprestados a um aluno (cobre o filtro e o join com livros)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_emprestimos_aluno_status
+        ON emprestimos (aluno_id, status, livro_id)
+    ''')
+    # Alunos de uma turma em ordem alfabética e lista geral por nome
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_alunos_turma_nome
+        ON alunos (turma, nome)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_alunos_nome
+        ON alunos (nome, id, matricula)
+    ''')
+    # Catálogo em ordem de título
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_livros_titulo
+        ON livros (titulo)
+    ''')
+    cursor.execute('ANALYZE')
+
+
+def _migracao_busca_livros(cursor):
+    """Versão 3: índice de texto completo (FTS5) do catálogo"""
+    # Tabela de conteúdo externo: o texto continua só em livros, o FTS guarda
+    # apenas o índice. remove_diacritics faz "João" casar com "joao" e os
+    # índices de prefixo aceleram a busca enquanto o usuário digita.
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS livros_busca USING fts5(
+            titulo, autor, categoria, isbn,
+            content='livros', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS livros_busca_ai AFTER INSERT ON livros BEGIN
+            INSERT INTO livros_busca (rowid, titulo, autor, categoria, isbn)
+            VALUES (new.id, new.titulo, new.autor, new.categoria, new.isbn);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS livros_busca_ad AFTER DELETE ON livros BEGIN
+            INSERT INTO livros_busca (livros_busca, rowid, titulo, autor, categoria, isbn)
+            VALUES ('delete', old.id, old.titulo, old.autor, old.categoria, old.isbn);
+        END
+    ''')
+    # Só as colunas indexadas: empréstimos alteram "disponivel" o tempo todo
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS livros_busca_au
+        AFTER UPDATE OF titulo, autor, categoria, isbn ON livros BEGIN
+            INSERT INTO livros_busca (livros_busca, rowid, titulo, autor, categoria, isbn)
+            VALUES ('delete', old.id, old.titulo, old.autor, old.categoria, old.isbn);
+            INSERT INTO livros_busca (rowid, titulo, autor, categoria, isbn)
+            VALUES (new.id, new.titulo, new.autor, new.categoria, new.isbn);
+        END
+    ''')
+    cursor.execute("INSERT INTO livros_busca (livros_busca) VALUES ('rebuild')")
+
+
+def _migracao_ordenacao(cursor):
+    """Versão 4: índices para as colunas ordenáveis das listas paginadas"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_livros_autor
+        ON livros (autor)
+    ''')
+
+
+# Recalcula do zero os contadores da tabela estatisticas (migração e reconciliação)
+SQL_RECALCULAR_ESTATISTICAS = '''
+    INSERT OR REPLACE INTO estatisticas (chave, valor)
+    SELECT 'total_livros', COUNT(*) FROM livros
+    UNION ALL SELECT 'livros_disponiveis', COALESCE(SUM(disponivel), 0) FROM livros
+    UNION ALL SELECT 'total_alunos', COUNT(*) FROM alunos
+    UNION ALL SELECT 'emprestimos_ativos', COUNT(*) FROM emprestimos WHERE status = 'Emprestado'
+'''
+
+
+def _migracao_estatisticas(cursor):
+    """Versão 5: contadores do painel de estatísticas mantidos por gatilhos"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS estatisticas (
+            chave TEXT PRIMARY KEY,
+            valor INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    # Cada gatilho soma a diferença que a linha causa em cada contador
+    gatilhos = {
+        'livros_ai': ('AFTER INSERT ON livros', {
+            'total_livros': '1',
+            'livros_disponiveis': 'COALESCE(new.disponivel, 0)',
+        }),
+        'livros_ad': ('AFTER DELETE ON livros', {
+            'total_livros': '-1',
+            'livros_disponiveis': '-COALESCE(old.disponivel, 0)',
+        }),
+        'livros_au': ('AFTER UPDATE OF disponivel ON livros', {
+            'livros_disponiveis': 'COALESCE(new.disponivel, 0) - COALESCE(old.disponivel, 0)',
+        }),
+        'alunos_ai': ('AFTER INSERT ON alunos', {'total_alunos': '1'}),
+        'alunos_ad': ('AFTER DELETE ON alunos', {'total_alunos': '-1'}),
+        'emprestimos_ai': ('AFTER INSERT ON emprestimos', {
+            'emprestimos_ativos': "(new.status = 'Emprestado')",
+        }),
+        'emprestimos_ad': ('AFTER DELETE ON emprestimos', {
+            'emprestimos_ativos': "-(old.status = 'Emprestado')",
+        }),
+        'emprestimos_au': ('AFTER UPDATE OF status ON emprestimos', {
+            'emprestimos_ativos': "(new.status = 'Emprestado') - (old.status = 'Emprestado')",
+        }),
+    }
+    for nome, (evento, deltas) in gatilhos.items():
+        casos = ' '.join(f"WHEN '{chave}' THEN {delta}" for chave, delta in deltas.items())
+        chaves = ', '.join(f"'{chave}'" for chave in deltas)
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS estatisticas_{nome} {evento} BEGIN
+                UPDATE estatisticas SET valor = valor + CASE chave {casos} END
+                WHERE chave IN ({chaves});
+            END
+        ''')
+    cursor.execute(SQL_RECALCULAR_ESTATISTICAS)
+
+
+def _migracao_atrasos(cursor):
+    """Versão 6: (status, data_devolucao_prevista) passa a cobrir aluno_id.
+
+    O relatório de atrasos lê só o índice, sem ir à tabela para cada
+    empréstimo vencido; o índice antigo é prefixo deste e sai.
+    """
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_emprestimos_status_prevista_aluno
+        ON emprestimos (status, data_devolucao_prevista, aluno_id)
+    ''')
+    cursor.execute('DROP INDEX IF EXISTS idx_emprestimos_status_prevista')
+    cursor.execute('ANALYZE emprestimos')
+
+
+# Colunas de emprestimos, na ordem da tabela, copiadas para o arquivo
+COLUNAS_EMPRESTIMOS = ('id, livro_id, aluno_id, data_emprestimo, data_devolucao_prevista, '
+                       'data_devolucao_real, status, observacoes')
+
+
+def _migracao_arquivo(cursor):
+    """Versão 7: arquivo de empréstimos devolvidos e a visão do histórico completo.
+
+    emprestimos fica só com os abertos e os devolvidos recentes (ver
+    manutencao.py arquivar); relatórios e exportação leem emprestimos_historico.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS emprestimos_arquivo (
+            id INTEGER PRIMARY KEY,
+            livro_id INTEGER,
+            aluno_id INTEGER,
+            data_emprestimo DATE,
+            data_devolucao_prevista DATE,
+            data_devolucao_real DATE,
+            status TEXT,
+            observacoes TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_emprestimos_arquivo_aluno
+        ON emprestimos_arquivo (aluno_id)
+    ''')
+    cursor.execute(f'''
+        CREATE VIEW IF NOT EXISTS emprestimos_historico AS
+        SELECT {COLUNAS_EMPRESTIMOS} FROM emprestimos
+        UNION ALL
+        SELECT {COLUNAS_EMPRESTIMOS} FROM emprestimos_arquivo
+    ''')
+
+
+def _migracao_circulacao(cursor):
+    """Versão 8: empréstimo aberto de um livro, para a devolução pelo código de barras"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_emprestimos_livro_status
+        ON emprestimos (livro_id, status)
+    ''')
+    cursor.execute('ANALYZE emprestimos')
+
+
+def _migracao_seletor_alunos(cursor):
+    """Versão 9: nomes de alunos sem diferenciar maiúsculas, para o seletor que
+    sugere enquanto digita (nome LIKE 'texto%' vira faixa nestes índices)"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_alunos_nome_nocase
+        ON alunos (nome COLLATE NOCASE)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_alunos_turma_nome_nocase
+        ON alunos (turma, nome COLLATE NOCASE)
+    ''')
+    cursor.execute('ANALYZE alunos')
+
+
+def _somar_resumos(linha, coluna_data, emprestimos, devolucoes, condicao="1"):
+    """Comandos de gatilho que somam os deltas de um empréstimo (`linha` é new
+    ou old) aos resumos do dia em `coluna_data`. Categoria, turma e série são
+    as do livro e do aluno no momento do gatilho."""
+    dia = f"date({linha}.{coluna_data})"
+    filtro = f"WHERE {dia} IS NOT NULL AND {condicao}"
+    comandos = [f'''
+        INSERT INTO resumo_dia_categoria (dia, categoria, emprestimos, devolucoes)
+        SELECT {dia}, COALESCE((SELECT categoria FROM livros WHERE id = {linha}.livro_id), ''),
+               {emprestimos}, {devolucoes}
+        {filtro}
+        ON CONFLICT (dia, categoria) DO UPDATE SET
+            emprestimos = emprestimos + excluded.emprestimos,
+            devolucoes = devolucoes + excluded.devolucoes;''', f'''
+        INSERT INTO resumo_dia_turma (dia, turma, serie, emprestimos, devolucoes)
+        SELECT {dia}, COALESCE((SELECT turma FROM alunos WHERE id = {linha}.aluno_id), ''),
+               COALESCE((SELECT serie FROM alunos WHERE id = {linha}.aluno_id), ''),
+               {emprestimos}, {devolucoes}
+        {filtro}
+        ON CONFLICT (dia, turma, serie) DO UPDATE SET
+            emprestimos = emprestimos + excluded.emprestimos,
+            devolucoes = devolucoes + excluded.devolucoes;''']
+    if emprestimos:
+        comandos.append(f'''
+        INSERT INTO resumo_mes_livro (mes, livro_id, emprestimos)
+        SELECT substr({dia}, 1, 7), COALESCE({linha}.livro_id, 0), {emprestimos}
+        {filtro}
+        ON CONFLICT (mes, livro_id) DO UPDATE SET
+            emprestimos = emprestimos + excluded.emprestimos;''')
+    return ''.join(comandos)
+
+
+def recalcular_resumos(cursor):
+    """Refaz os resumos de circulação a partir de emprestimos_historico.
+
+    Usa a categoria, a turma e a série atuais do cadastro; os gatilhos
+    gravam as do momento de cada empréstimo e devolução.
+    """
+    for tabela in ('resumo_dia_categoria', 'resumo_dia_turma', 'resumo_mes_livro'):
+        cursor.execute(f'DELETE FROM {tabela}')
+    # Uma linha por empréstimo (e > 0) e por devolução (d > 0), já com o dia
+    eventos = '''
+        SELECT date(data_emprestimo) AS dia, livro_id, aluno_id, 1 AS e, 0 AS d
+        FROM emprestimos_historico WHERE date(data_emprestimo) IS NOT NULL
+        UNION ALL
+        SELECT date(data_devolucao_real), livro_id, aluno_id, 0, 1
+        FROM emprestimos_historico
+        WHERE status = 'Devolvido' AND date(data_devolucao_real) IS NOT NULL
+    '''
+    cursor.execute(f'''
+        INSERT INTO resumo_dia_categoria (dia, categoria, emprestimos, devolucoes)
+        SELECT ev.dia, COALESCE(l.categoria, ''), SUM(ev.e), SUM(ev.d)
+        FROM ({eventos}) ev LEFT JOIN livros l ON l.id = ev.livro_id
+        GROUP BY 1, 2
+    ''')
+    cursor.execute(f'''
+        INSERT INTO resumo_dia_turma (dia, turma, serie, emprestimos, devolucoes)
+        SELECT ev.dia, COALESCE(a.turma, ''), COALESCE(a.serie, ''), SUM(ev.e), SUM(ev.d)
+        FROM ({eventos}) ev LEFT JOIN alunos a ON a.id = ev.aluno_id
+        GROUP BY 1, 2, 3
+    ''')
+    cursor.execute('''
+        INSERT INTO resumo_mes_livro (mes, livro_id, emprestimos)
+        SELECT substr(date(data_emprestimo), 1, 7), COALESCE(livro_id, 0), COUNT(*)
+        FROM emprestimos_historico WHERE date(data_emprestimo) IS NOT NULL
+        GROUP BY 1, 2
+    ''')
+
+
+def _migracao_resumos(cursor):
+    """Versão 10: resumos de circulação para os gráficos de Relatórios.
+
+    Empréstimos e devoluções por dia e categoria, por dia e turma/série, e
+    empréstimos por mês e livro (os mais emprestados), mantidos por gatilhos
+    a cada empréstimo, devolução ou exclusão. Mover para emprestimos_arquivo
+    não altera os resumos: o empréstimo continua no histórico.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS resumo_dia_categoria (
+            dia TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            emprestimos INTEGER NOT NULL DEFAULT 0,
+            devolucoes INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dia, categoria)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS resumo_dia_turma (
+            dia TEXT NOT NULL,
+            turma TEXT NOT NULL,
+            serie TEXT NOT NULL,
+            emprestimos INTEGER NOT NULL DEFAULT 0,
+            devolucoes INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dia, turma, serie)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS resumo_mes_livro (
+            mes TEXT NOT NULL,
+            livro_id INTEGER NOT NULL,
+            emprestimos INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (mes, livro_id)
+        ) WITHOUT ROWID
+    ''')
+    # Os mais emprestados de cada mês, para o ranking do período
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_resumo_mes_livro_total
+        ON resumo_mes_livro (mes, emprestimos)
+    ''')
+    devolvido = "{0}.status = 'Devolvido'"
+    aberto = "{0}.status IS NOT 'Devolvido'"
+    gatilhos = {
+        'ai': ('AFTER INSERT ON emprestimos', '',
+               _somar_resumos('new', 'data_emprestimo', 1, 0)
+               + _somar_resumos('new', 'data_devolucao_real', 0, 1, devolvido.format('new'))),
+        'au': ('AFTER UPDATE OF status ON emprestimos', '',
+               _somar_resumos('new', 'data_devolucao_real', 0, 1,
+                              f"{devolvido.format('new')} AND {aberto.format('old')}")
+               + _somar_resumos('old', 'data_devolucao_real', 0, -1,
+                                f"{devolvido.format('old')} AND {aberto.format('new')}")),
+        # O arquivamento grava em emprestimos_arquivo antes de excluir
+        'ad': ('AFTER DELETE ON emprestimos',
+               'WHEN NOT EXISTS (SELECT 1 FROM emprestimos_arquivo WHERE id = old.id)',
+               _somar_resumos('old', 'data_emprestimo', -1, 0)
+               + _somar_resumos('old', 'data_devolucao_real', 0, -1, devolvido.format('old'))),
+    }
+    for nome, (evento, quando, corpo) in gatilhos.items():
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS resumos_emprestimos_{nome} {evento} {quando} BEGIN
+                {corpo}
+            END
+        ''')
+    recalcular_resumos(cursor)
+    cursor.execute('ANALYZE resumo_dia_categoria')
+    cursor.execute('ANALYZE resumo_dia_turma')
+    cursor.execute('ANALYZE resumo_mes_livro')
+
+
+def _migracao_versao_titulos(cursor):
+    """Versão 11: contador que muda a cada cadastro, exclusão ou troca de título.
+
+    Outros balcões não avisam o índice de títulos em memória (indice_titulos.py);
+    com este contador ele sabe, sem reler o catálogo, se precisa recarregar.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS versoes (
+            chave TEXT PRIMARY KEY,
+            valor INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO versoes (chave, valor) VALUES ('titulos', 0)")
+    for nome, evento in (('ai', 'AFTER INSERT ON livros'),
+                         ('ad', 'AFTER DELETE ON livros'),
+                         ('au', 'AFTER UPDATE OF titulo ON livros WHEN old.titulo IS NOT new.titulo')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS versoes_titulos_{nome} {evento} BEGIN
+                UPDATE versoes SET valor = valor + 1 WHERE chave = 'titulos';
+            END
+        ''')
+
+
+def _migracao_emprestimos_por_data(cursor):
+    """Versão 12: empréstimos por data (abertos e arquivados), para os dias avulsos do ranking.
+
+    Os mais emprestados somam resumo_mes_livro nos meses inteiros do período e
+    contam no histórico os dias de um mês cortado pelo meio (consultas.py);
+    os índices cobrem essa contagem sem ir às tabelas.
+    """
+    for tabela in ('emprestimos', 'emprestimos_arquivo'):
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_{tabela}_data
+            ON {tabela} (data_emprestimo, livro_id)
+        ''')
+        cursor.execute(f'ANALYZE {tabela}')
+
+MIGRACOES = [
+    _migracao_tabelas,
+    _migracao_indices,
+    _migracao_busca_livros,
+    _migracao_ordenacao,
+    _migracao_estatisticas,
+    _migracao_atrasos,
+    _migracao_arquivo,
+    _migracao_circulacao,
+    _migracao_seletor_alunos,
+    _migracao_resumos,
+    _migracao_versao_titulos,
+    _migracao_emprestimos_por_data,
+]
+
+
+def bloqueado(erro):
+    """True se o erro é de lock ocupado ("database is locked"/"busy")"""
+    mensagem = str(erro).lower()
+    return isinstance(erro, sqlite3.OperationalError) and ("locked" in mensagem or "busy" in mensagem)
+
+
+def _autorizar_leitura(acao, arg1, arg2, nome_banco, gatilho):
+    """Autorizador das conexões somente leitura: só SELECT e as leituras que ele faz.
+
+    Recusa na preparação qualquer escrita, ATTACH, transação, CREATE TEMP e
+    PRAGMA que não seja a leitura de user_version/data_version, então o SQL
+    recebido de fora não consegue desligar a proteção.
+    """
+    if acao in ACOES_LEITURA:
+        return sqlite3.SQLITE_OK
+    # Ao conectar a tabela FTS5 (livros_busca) o próprio SQLite prepara um UPDATE
+    # de sqlite_master; ele nunca grava: o esquema só muda com writable_schema,
+    # um PRAGMA recusado abaixo, e o arquivo está aberto com mode=ro
+    if acao == sqlite3.SQLITE_UPDATE and arg1 == "sqlite_master":
+        return sqlite3.SQLITE_OK
+    if acao == sqlite3.SQLITE_PRAGMA and arg1.lower() in PRAGMAS_LEITURA and arg2 is None:
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+def varreduras_completas(conn, sql, params=()):
+    """Retorna as linhas do plano de execução que percorrem uma tabela ou um índice inteiro.
+
+    Buscas por índice ("SEARCH"), consultas MATCH em tabelas FTS ("SCAN ...
+    VIRTUAL TABLE INDEX") e a leitura do resultado de subconsultas já
+    materializadas não são consideradas. Varreduras de índice ("SCAN ...
+    USING [COVERING] INDEX") contam: só são aceitáveis quando quem chama
+    sabe que a consulta para cedo (LIMIT na ordem do índice) ou lê uma
+    tabela pequena.
+    """
+    plano = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    subconsultas = {linha[3].split(None, 1)[1] for linha in plano
+                    if linha[3].startswith(("MATERIALIZE ", "CO-ROUTINE "))}
+    return [
+        linha[3] for linha in plano
+        if linha[3].startswith("SCAN ")
+        and "VIRTUAL TABLE INDEX" not in linha[3]
+        and linha[3][len("SCAN "):] not in subconsultas
+    ]
+
+
+class Banco:
+    """Gerencia conexões de longa duração com o banco SQLite.
+
+    Cada thread recebe sua própria conexão (o sqlite3 não permite compartilhar
+    conexões entre threads), criada na primeira utilização e reaproveitada até
+    fechar(). As conexões trabalham em modo autocommit; escritas com mais de um
+    comando devem usar transacao().
+
+    Com somente_leitura=True o arquivo é aberto como file:...?mode=ro, sem os
+    PRAGMAS_PERSISTENTES e com um autorizador que só deixa passar leituras.
+    """
+
+    def __init__(self, caminho, somente_leitura=False):
+        self.caminho = caminho
+        self.somente_leitura = somente_leitura
+        self._local = threading.local()
+        self._conexoes = []
+        self._lock = threading.Lock()
+        self._ouvintes = {}
+        self._notificacoes_ativas = False
+        # Diagnostico opcional (diagnostico.py) que mede cada comando SQL
+        self.monitor = None
+
+    def _abrir(self):
+        if self.somente_leitura:
+            destino = pathlib.Path(self.caminho).resolve().as_uri() + "?mode=ro"
+        else:
+            destino = self.caminho
+        conn = sqlite3.connect(
+            destino,
+            timeout=TIMEOUT_LOCK,
+            isolation_level=None,
+            cached_statements=CACHE_COMANDOS,
+            check_same_thread=False,
+            uri=self.somente_leitura,
+        )
+        for nome, valor in PRAGMAS:
+            if not (self.somente_leitura and nome in PRAGMAS_PERSISTENTES):
+                conn.execute(f"PRAGMA {nome} = {valor}")
+        if self.somente_leitura:
+            conn.set_authorizer(_autorizar_leitura)
+        if self._notificacoes_ativas:
+            self._instalar_gatilhos(conn)
+        if self.monitor is not None:
+            self.monitor.instalar(conn)
+        return conn
+
+    def conexao(self):
+        """Retorna a conexão da thread atual, abrindo-a se necessário"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._abrir()
+            self._local.conn = conn
+            with self._lock:
+                self._conexoes.append(conn)
+        return conn
+
+    def versao(self):
+        """Versão do esquema gravada no arquivo (PRAGMA user_version)"""
+        return self.consultar_um("PRAGMA user_version")[0]
+
+    def migrar(self):
+        """Aplica as migrações pendentes, uma transação por versão"""
+        while True:
+            # IMMEDIATE garante que dois balcões não apliquem a mesma migração
+            with self.transacao("IMMEDIATE") as cursor:
+                atual = cursor.execute("PRAGMA user_version").fetchone()[0]
+                if atual >= len(MIGRACOES):
+                    return atual
+                MIGRACOES[atual](cursor)
+                cursor.execute(f"PRAGMA user_version = {atual + 1}")
+
+    def executar(self, sql, params=()):
+        """Executa um comando e retorna o cursor"""
+        conn = self.conexao()
+        try:
+            cursor = conn.execute(sql, params)
+        finally:
+            self._concluido(conn)
+        if not conn.in_transaction:
+            self._despachar()
+        return cursor
+
+    def executar_varios(self, sql, linhas):
+        """Executa o mesmo comando para várias linhas, em uma única transação"""
+        with self.transacao() as cursor:
+            return cursor.executemany(sql, linhas)
+
+    def consultar(self, sql, params=()):
+        """Executa uma consulta e retorna todas as linhas"""
+        conn = self.conexao()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            self._concluido(conn)
+
+    def consultar_um(self, sql, params=()):
+        """Executa uma consulta e retorna a primeira linha (ou None)"""
+        conn = self.conexao()
+        try:
+            return conn.execute(sql, params).fetchone()
+        finally:
+            self._concluido(conn)
+
+    def _concluido(self, conn):
+        if self.monitor is not None:
+            self.monitor.comando_concluido(conn)
+
+    @contextmanager
+    def transacao(self, modo="DEFERRED"):
+        """Abre uma transação explícita; faz commit ao sair ou rollback em caso de erro"""
+        conn = self.conexao()
+        if conn.in_transaction:
+            # Transação aninhada: a externa decide o commit
+            yield conn.cursor()
+            return
+        conn.execute(f"BEGIN {modo}")
+        try:
+            yield conn.cursor()
+        except BaseException:
+            conn.rollback()
+            self._concluido(conn)
+            self._local.mudancas = []
+            raise
+        else:
+            conn.commit()
+            self._concluido(conn)
+            self._despachar()
+
+    def gravar(self, funcao, tentativas=TENTATIVAS_GRAVACAO):
+        """Executa funcao(cursor) em BEGIN IMMEDIATE e retorna o resultado.
+
+        IMMEDIATE reserva o lock de escrita antes da primeira leitura, então o
+        que funcao lê não muda até o commit. Se o banco continuar bloqueado
+        após o busy timeout, a transação inteira é repetida com espera
+        exponencial (com variação aleatória para os balcões não colidirem de
+        novo). Dentro de outra transação, apenas executa funcao.
+        """
+        if self.conexao().in_transaction:
+            return funcao(self.conexao().cursor())
+        espera = ESPERA_INICIAL
+        for tentativa in range(tentativas):
+            try:
+                with self.transacao("IMMEDIATE") as cursor:
+                    return funcao(cursor)
+            except sqlite3.OperationalError as e:
+                if not bloqueado(e) or tentativa == tentativas - 1:
+                    raise
+                log.warning("Banco ocupado, nova tentativa em %.2f s", espera)
+            time.sleep(espera * random.uniform(0.5, 1.5))
+            espera *= 2
+
+    def reconciliar_estatisticas(self):
+        """Recalcula os contadores de estatisticas a partir das tabelas.
+
+        Retorna {chave: (valor gravado, valor correto)} dos que estavam
+        diferentes; vazio quando os gatilhos mantiveram tudo exato.
+        """
+        def recalcular(cursor):
+            antes = dict(cursor.execute('SELECT chave, valor FROM estatisticas').fetchall())
+            cursor.execute(SQL_RECALCULAR_ESTATISTICAS)
+            depois = dict(cursor.execute('SELECT chave, valor FROM estatisticas').fetchall())
+            return {chave: (antes.get(chave), valor)
+                    for chave, valor in depois.items() if antes.get(chave) != valor}
+
+        return self.gravar(recalcular)
+
+    # ---------------------- NOTIFICAÇÕES DE MUDANÇA ----------------------
+    def inscrever(self, tabela, callback):
+        """Registra callback(acao, ids) para mudanças confirmadas na tabela.
+
+        acao é 'insert', 'update' ou 'delete'. O aviso vem depois do commit,
+        na mesma thread que fez a escrita, e só para escritas feitas por este
+        processo; alterações de outros balcões aparecem em versao_dados().
+        Para as COLUNAS_NOTIFICADAS, tabela pode ser "tabela.coluna": o aviso
+        ('update') só sai quando o valor da coluna realmente mudou.
+        """
+        self._ouvintes.setdefault(tabela, []).append(callback)
+
+    def ativar_notificacoes(self):
+        """Instala os gatilhos temporários que registram as mudanças por linha.
+
+        Deve ser chamada depois de migrar(); vale para a conexão da thread atual
+        e para as que forem abertas depois.
+        """
+        if self._notificacoes_ativas:
+            return
+        self._notificacoes_ativas = True
+        self._instalar_gatilhos(self.conexao())
+
+    @contextmanager
+    def silenciar(self):
+        """Não registra mudanças por linha nesta thread (ex.: importações em lote).
+
+        Quem usa deve avisar a interface de outra forma, p.ex. recarregando as listas.
+        """
+        anterior = getattr(self._local, "silencio", False)
+        self._local.silencio = True
+        try:
+            yield
+        finally:
+            self._local.silencio = anterior
+
+    def versao_dados(self):
+        """PRAGMA data_version da conexão atual: muda quando outra conexão grava"""
+        return self.consultar_um("PRAGMA data_version")[0]
+
+    def _instalar_gatilhos(self, conn):
+        conn.create_function("_registrar_mudanca", 3, self._registrar_mudanca)
+        for tabela in TABELAS_NOTIFICADAS:
+            for evento, linha in (("INSERT", "new"), ("UPDATE", "new"), ("DELETE", "old")):
+                conn.execute(f'''
+                    CREATE TEMP TRIGGER IF NOT EXISTS _mudanca_{tabela}_{evento.lower()}
+                    AFTER {evento} ON main.{tabela} BEGIN
+                        SELECT _registrar_mudanca('{tabela}', '{evento.lower()}', {linha}.id);
+                    END
+                ''')
+        for tabela, coluna in COLUNAS_NOTIFICADAS:
+            conn.execute(f'''
+                CREATE TEMP TRIGGER IF NOT EXISTS _mudanca_{tabela}_{coluna}
+                AFTER UPDATE OF {coluna} ON main.{tabela}
+                WHEN old.{coluna} IS NOT new.{coluna} BEGIN
+                    SELECT _registrar_mudanca('{tabela}.{coluna}', 'update', new.id);
+                END
+            ''')
+
+    def _registrar_mudanca(self, tabela, acao, id_linha):
+        # Chamada pelo SQLite durante o comando: só anota, o aviso sai após o commit
+        if getattr(self._local, "silencio", False):
+            return
+        mudancas = getattr(self._local, "mudancas", None)
+        if mudancas is None:
+            mudancas = self._local.mudancas = []
+        mudancas.append((tabela, acao, id_linha))
+
+    def _despachar(self):
+        mudancas = getattr(self._local, "mudancas", None)
+        if not mudancas:
+            return
+        self._local.mudancas = []
+        # Agrupa ids consecutivos da mesma tabela/ação para um único aviso
+        grupos = []
+        for tabela, acao, id_linha in mudancas:
+            if grupos and grupos[-1][0] == tabela and grupos[-1][1] == acao:
+                grupos[-1][2].append(id_linha)
+            else:
+                grupos.append((tabela, acao, [id_linha]))
+        for tabela, acao, ids in grupos:
+            for callback in self._ouvintes.get(tabela, ()):
+                try:
+                    callback(acao, ids)
+                except Exception:
+                    # A escrita já foi confirmada; uma falha na tela não deve desfazê-la
+                    log.exception("Erro ao avisar mudança em %s", tabela)
+
+    def liberar(self):
+        """Fecha a conexão da thread atual (para threads de trabalho de vida curta)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            if conn in self._conexoes:
+                self._conexoes.remove(conn)
+        conn.close()
+
+    def fechar(self):
+        """Fecha todas as conexões abertas pelo gerenciador"""
+        with self._lock:
+            conexoes, self._conexoes = self._conexoes, []
+        for conn in conexoes:
+            try:
+                if not self.somente_leitura:
+                    conn.execute("PRAGMA optimize")
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
@@ -0,0 +1,352 @@
+# benchmark.py
+"""Benchmarks dos caminhos de dados do sistema, executados sem interface gráfica.
+
+Cada operação das abas (carregar listas, buscas, empréstimo, devolução,
+estatísticas, lembrete do dia) é cronometrada sobre um banco sintético
+(gerador.py) e o resultado sai em JSON para comparar versões.
+
+Uso: python benchmark.py [--banco existente.db | --livros N --alunos N --emprestimos N]
+                         [--repeticoes 30] [--saida resultados.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import busca
+import consultas
+import gerador
+from banco import Banco
+from indice_titulos import IndiceTitulos
+from lista_paginada import ListaPaginada
+from servico import ErroServico, ServicoBiblioteca
+
+
+class ContadorComandos:
+    """Conta os comandos SQL executados pela conexão da thread atual"""
+
+    def __init__(self, banco):
+        self.conn = banco.conexao()
+        self.total = 0
+
+    def _contar(self, sql):
+        self.total += 1
+
+    def __enter__(self):
+        self.total = 0
+        self.conn.set_trace_callback(self._contar)
+        return self
+
+    def __exit__(self, *exc):
+        self.conn.set_trace_callback(None)
+
+
+def cronometrar(funcao, repeticoes=20):
+    """Executa a função várias vezes e retorna o tempo médio em ms"""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+def medir(funcao, repeticoes=30):
+    """Tempo de cada execução de funcao(i); retorna média, mediana, p95 e máximo em ms"""
+    tempos = []
+    for i in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(i)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return {
+        'execucoes': repeticoes,
+        'media_ms': round(statistics.fmean(tempos), 3),
+        'mediana_ms': round(statistics.median(tempos), 3),
+        'p95_ms': round(tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))], 3),
+        'max_ms': round(tempos[-1], 3),
+    }
+
+
+class TreeSemTela:
+    """O mínimo da ttk.Treeview que a ListaPaginada usa, para medir sem Tk"""
+
+    def __init__(self, colunas):
+        self._colunas = tuple(colunas)
+        self._titulos = {c: {'text': c} for c in colunas}
+        self._ordem = []
+        self._valores = {}
+
+    def __getitem__(self, chave):
+        return self._colunas
+
+    def heading(self, coluna, opcao=None, **kwargs):
+        if opcao:
+            return self._titulos[coluna][opcao]
+        self._titulos[coluna].update(kwargs)
+
+    def configure(self, **kwargs):
+        pass
+
+    def delete(self, *iids):
+        if len(iids) == len(self._ordem):
+            self._ordem, self._valores = [], {}
+            return
+        for iid in iids:
+            self._ordem.remove(iid)
+            del self._valores[iid]
+
+    def get_children(self):
+        return tuple(self._ordem)
+
+    def exists(self, iid):
+        return iid in self._valores
+
+    def item(self, iid, values=None):
+        self._valores[iid] = values
+
+    def insert(self, pai, posicao, iid, values=()):
+        if posicao == 'end':
+            self._ordem.append(iid)
+        else:
+            self._ordem.insert(posicao, iid)
+        self._valores[iid] = values
+
+    def yview(self):
+        return (0.0, 1.0)
+
+    def after_idle(self, funcao):
+        pass
+
+
+class BarraSemTela:
+    def set(self, primeiro, ultimo):
+        pass
+
+
+# ---------------------- ESTUDANTES POR TURMA ----------------------
+def _estudantes_da_turma_n_mais_1(banco, turma):
+    """Implementação antiga (uma consulta por aluno), mantida para comparação"""
+    resultado = []
+    alunos = banco.consultar('''
+        SELECT id, nome, matricula, serie, telefone, email
+        FROM alunos WHERE turma = ? ORDER BY nome
+    ''', (turma,))
+    for aluno in alunos:
+        livros = banco.consultar('''
+            SELECT l.titulo FROM emprestimos e
+            JOIN livros l ON e.livro_id = l.id
+            WHERE e.aluno_id = ? AND e.status = 'Emprestado'
+        ''', (aluno[0],))
+        resultado.append(aluno + (', '.join(l[0] for l in livros) if livros else 'Nenhum',))
+    return resultado
+
+
+def _popular_turma(banco, turma, alunos, livros_ids):
+    with banco.transacao() as cursor:
+        for i in range(alunos):
+            cursor.execute(
+                'INSERT INTO alunos (nome, matricula, serie, turma) VALUES (?, ?, ?, ?)',
+                (f'Aluno {turma}-{i:04d}', f'{turma}-{i:04d}', '7º Fundamental', turma))
+            aluno_id = cursor.lastrowid
+            for livro_id in random.sample(livros_ids, random.randint(0, 2)):
+                cursor.execute('''
+                    INSERT INTO emprestimos (livro_id, aluno_id, data_devolucao_prevista)
+                    VALUES (?, ?, date('now', '+15 days'))
+                ''', (livro_id, aluno_id))
+
+
+def benchmark_estudantes_turma(banco, tamanhos=(10, 40, 160)):
+    """Comandos SQL e tempo por clique em uma turma, para vários tamanhos de turma"""
+    with banco.transacao() as cursor:
+        cursor.executemany(
+            'INSERT INTO livros (titulo, autor, isbn) VALUES (?, ?, ?)',
+            [(f'Livro {i}', f'Autor {i % 50}', f'bench-{i}') for i in range(500)])
+    livros_ids = [r[0] for r in banco.consultar('SELECT id FROM livros')]
+    resultados = []
+    for tamanho in tamanhos:
+        turma = f'B{tamanho}'
+        _popular_turma(banco, turma, tamanho, livros_ids)
+        for nome, funcao in (
+            ('n+1', _estudantes_da_turma_n_mais_1),
+            ('conjunto', consultas.estudantes_da_turma),
+        ):
+            with ContadorComandos(banco) as contador:
+                linhas = funcao(banco, turma)
+            ms = cronometrar(lambda: funcao(banco, turma))
+            resultados.append({
+                'consulta': nome, 'alunos': len(linhas),
+                'comandos': contador.total, 'ms': round(ms, 3),
+            })
+    return resultados
+
+
+# ---------------------- SUÍTE ----------------------
+def _lista(banco, definicao, **extras):
+    colunas = list(definicao['ordens'])
+    return ListaPaginada(TreeSemTela(colunas), BarraSemTela(), banco, **definicao, **extras)
+
+
+def _medir_lista(banco, nome, definicao, repeticoes, resultados, **extras):
+    """Primeira página (recarregar) e rolagem até a 10ª página (carregar_mais)"""
+    lista = _lista(banco, definicao, **extras)
+    resultados[nome] = medir(lambda i: lista.recarregar(), repeticoes)
+
+    def rolar(i):
+        if i % 9 == 0:
+            lista.recarregar()
+        lista.carregar_mais()
+    resultados[nome + '_rolagem'] = medir(rolar, repeticoes)
+
+
+def suite(banco, repeticoes=30, semente=42):
+    """Cronometra cada caminho de dados de biblioteca2.py; retorna {operação: medidas}"""
+    rnd = random.Random(semente)
+    servico = ServicoBiblioteca(banco)
+    resultados = {}
+    turmas = [r[0] for r in banco.consultar(
+        "SELECT DISTINCT turma FROM alunos WHERE turma IS NOT NULL AND turma <> ''")]
+    titulos = [r[0] for r in banco.consultar('SELECT titulo FROM livros ORDER BY random() LIMIT 200')]
+    autores = [r[0] for r in banco.consultar('SELECT autor FROM livros ORDER BY random() LIMIT 200')]
+
+    _medir_lista(banco, 'carregar_livros', consultas.LISTA_LIVROS, repeticoes, resultados)
+    _medir_lista(banco, 'carregar_alunos', consultas.LISTA_ALUNOS, repeticoes, resultados)
+    turma_filtro = turmas[0] if turmas else ''
+    _medir_lista(banco, 'carregar_alunos_turma', consultas.LISTA_ALUNOS, repeticoes, resultados,
+                 filtro=lambda: consultas.filtro_turma_alunos(turma_filtro))
+    _medir_lista(banco, 'carregar_emprestimos', consultas.LISTA_EMPRESTIMOS, repeticoes, resultados)
+
+    if turmas:
+        resultados['carregar_estudantes_turma'] = medir(
+            lambda i: consultas.estudantes_da_turma(banco, rnd.choice(turmas)), repeticoes)
+
+    # O autocomplete dispara a cada tecla: prefixos de 1 a 6 letras do título
+    def autocomplete(i):
+        titulo = rnd.choice(titulos) if titulos else 'a'
+        busca.sugerir_titulos(banco, titulo[:1 + i % 6])
+    resultados['autocomplete_livro'] = medir(autocomplete, repeticoes)
+
+    # O mesmo pelo índice de títulos em memória (a carga é medida uma vez)
+    indice = IndiceTitulos(banco)
+    resultados['carregar_indice_titulos'] = medir(lambda i: indice.carregar(), 1)
+
+    def autocomplete_indice(i):
+        titulo = rnd.choice(titulos) if titulos else 'a'
+        indice.sugestoes(titulo[:1 + i % 6], busca.LIMITE_SUGESTOES)
+    resultados['autocomplete_livro_indice'] = medir(autocomplete_indice, repeticoes)
+
+    # Seletor de alunos: prefixos de 1 a 4 letras do nome, com e sem turma
+    nomes = [r[0] for r in banco.consultar('SELECT nome FROM alunos ORDER BY random() LIMIT 200')]
+
+    def seletor_aluno(i):
+        nome = rnd.choice(nomes) if nomes else 'a'
+        consultas.sugerir_alunos(banco, nome[:1 + i % 4].lower(),
+                                 rnd.choice(turmas) if turmas and i % 2 else None)
+    resultados['seletor_aluno'] = medir(seletor_aluno, repeticoes)
+
+    def por_autor(i):
+        autor = rnd.choice(autores) if autores else 'a'
+        busca.buscar_por_autor(banco, autor.split()[0][:3 + i % 4])
+    resultados['buscar_por_autor'] = medir(por_autor, repeticoes)
+
+    # Empréstimo e devolução reais, desfeitos em pares para não alterar o banco
+    livros = [r[0] for r in banco.consultar(
+        'SELECT id FROM livros WHERE disponivel > 0 ORDER BY random() LIMIT ?', (repeticoes,))]
+    aluno = banco.consultar_um('SELECT id FROM alunos LIMIT 1')
+    feitos = []
+
+    def emprestar(i):
+        try:
+            feitos.append(servico.registrar_emprestimo(livros[i % len(livros)], aluno[0])[0])
+        except ErroServico:
+            pass
+    if livros and aluno:
+        resultados['registrar_emprestimo'] = medir(emprestar, repeticoes)
+        resultados['registrar_devolucao'] = medir(
+            lambda i: servico.registrar_devolucao(feitos[i]) if i < len(feitos) else None,
+            repeticoes)
+        # Os pares de teste não ficam no histórico
+        with banco.transacao() as cursor:
+            cursor.executemany('DELETE FROM emprestimos WHERE id = ?', [(i,) for i in feitos])
+
+    resultados['atualizar_estatisticas'] = medir(lambda i: consultas.estatisticas(banco), repeticoes)
+    resultados['atualizar_atrasos'] = medir(lambda i: consultas.atrasos_por_turma(banco), repeticoes)
+    um_ano = (date.today() - timedelta(days=365)).isoformat()
+    resultados['circulacao_por_mes'] = medir(
+        lambda i: consultas.circulacao_por_mes(banco, um_ano), repeticoes)
+    resultados['circulacao_por_turma'] = medir(
+        lambda i: consultas.circulacao_por_grupo(banco, 'turma', um_ano), repeticoes)
+    resultados['livros_mais_emprestados'] = medir(
+        lambda i: consultas.livros_mais_emprestados(banco, um_ano), repeticoes)
+    hoje = date.today().isoformat()
+    resultados['check_due_today'] = medir(lambda i: consultas.devolucoes_do_dia(banco, hoje), repeticoes)
+    return resultados
+
+
+def _versao_codigo():
+    """Commit atual (git), para identificar de qual versão são os números"""
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks da biblioteca (saída em JSON)")
+    parser.add_argument('--banco', help="banco já populado (senão gera um temporário)")
+    parser.add_argument('--livros', type=int, default=100000)
+    parser.add_argument('--alunos', type=int, default=20000)
+    parser.add_argument('--emprestimos', type=int, default=1000000)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--repeticoes', type=int, default=30)
+    parser.add_argument('--saida', help="arquivo JSON (padrão: saída padrão)")
+    args = parser.parse_args()
+
+    relatorio = {
+        'versao': _versao_codigo(),
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'repeticoes': args.repeticoes,
+    }
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = args.banco or os.path.join(pasta, 'benchmark.db')
+        banco = Banco(caminho)
+        try:
+            banco.migrar()
+            if not args.banco:
+                inicio = time.perf_counter()
+                gerador.gerar(banco, args.livros, args.alunos, args.emprestimos, args.semente)
+                relatorio['geracao_s'] = round(time.perf_counter() - inicio, 1)
+            relatorio['dados'] = consultas.estatisticas(banco)
+            relatorio['dados']['emprestimos'] = banco.consultar_um('SELECT COUNT(*) FROM emprestimos')[0]
+            relatorio['resultados'] = suite(banco, args.repeticoes, args.semente)
+        finally:
+            banco.fechar()
+
+        # Comparação da consulta de turma com a implementação antiga (banco próprio)
+        random.seed(args.semente)
+        banco = Banco(os.path.join(pasta, 'comparacao.db'))
+        try:
+            banco.migrar()
+            relatorio['estudantes_turma_n_mais_1'] = benchmark_estudantes_turma(banco)
+        finally:
+            banco.fechar()
+
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto + '\n')
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
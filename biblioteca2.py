@@ -1,89 +1,154 @@
 # biblioteca_escolar.py
-import sqlite3
+import logging
+import threading
 import tkinter as tk
-from tkinter import ttk, messagebox
-from datetime import datetime, timedelta
+from tkinter import ttk, messagebox, filedialog
+from datetime import date, datetime, timedelta
 import os
 import sys
-
-# --- Utilitário: caminho do banco confiável mesmo quando empacotado ---
-def get_db_path():
-    # Se empacotado com PyInstaller, sys._MEIPASS existe; guardamos o DB ao lado do exe.
-    base_path = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
-    return os.path.join(base_path, "biblioteca_escolar.db")
-
-DB_PATH = get_db_path()
+import time
+
+import busca
+import circulacao
+import consultas
+import exportacao
+import importacao
+from graficos import GraficoBarras
+from banco import DB_PATH, Banco
+from cliente import BancoRemoto, ServicoRemoto
+from diagnostico import Diagnostico, instrumentar_tk
+from indice_titulos import IndiceTitulos
+from lembretes import AgendaDevolucoes
+from lista_paginada import ListaPaginada
+from referencia import CATEGORIAS, SERIES, CacheReferencia, ordenar_turmas
+from seletor_aluno import SeletorAluno
+from servico import ErroServico, ServicoBiblioteca
+
+# Intervalo (ms) para conferir se outro balcão gravou no banco
+INTERVALO_VERIFICACAO_EXTERNA = 5000
+
+# Vencimentos oferecidos nas ações em lote: rótulo -> data limite a partir de hoje (None = qualquer)
+VENCIMENTOS_LOTE = {
+    "Qualquer data": lambda hoje: None,
+    "Atrasados": lambda hoje: hoje - timedelta(days=1),
+    "Vencem até hoje": lambda hoje: hoje,
+    "Vencem esta semana": lambda hoje: hoje + timedelta(days=6 - hoje.weekday()),
+}
+
+# Períodos dos gráficos de circulação: rótulo -> primeiro dia a partir de hoje (None = tudo)
+PERIODOS_CIRCULACAO = {
+    "Últimos 12 meses": lambda hoje: date(hoje.year - (hoje.month < 12), hoje.month % 12 + 1, 1),
+    "Este ano": lambda hoje: date(hoje.year, 1, 1),
+    "Últimos 30 dias": lambda hoje: hoje - timedelta(days=29),
+    "Tudo": lambda hoje: None,
+}
+
+# Gráficos de circulação: rótulo -> agrupamento (GRUPOS_CIRCULACAO, 'mes' ou 'livros')
+VISOES_CIRCULACAO = {
+    "Empréstimos por mês": 'mes',
+    "Por categoria": 'categoria',
+    "Por turma": 'turma',
+    "Por série": 'serie',
+    "Livros mais emprestados": 'livros',
+}
+
+# Barras de um gráfico por grupo (os demais grupos ficam de fora)
+MAX_BARRAS_GRUPO = 15
+
+# Meta de partida a frio (ms): da criação do sistema até a janela pintada.
+# As consultas pesadas só rodam depois disso, então a meta não depende do
+# tamanho do banco; acima dela o tempo vai para o log como aviso.
+META_PARTIDA_MS = 500
+
+log = logging.getLogger(__name__)
 
 class SistemaBiblioteca:
-    def __init__(self):
+    def __init__(self, servidor=None, diagnostico=None, indice_titulos=True):
+        self._inicio_partida = time.perf_counter()
+        # Com diagnóstico, todo callback do Tk criado daqui em diante é cronometrado
+        self.diagnostico = diagnostico
+        if diagnostico is not None:
+            instrumentar_tk(diagnostico)
         self.root = tk.Tk()
         self.root.title("Sistema de Biblioteca Escolar")
         self.root.geometry("1200x800")
         self.root.configure(bg='#f0f0f0')
         
+        # Local: conexões de longa duração compartilhadas por todas as abas.
+        # Com servidor (URL), leituras e gravações passam pela API HTTP.
+        self.remoto = servidor is not None
+        if self.remoto:
+            self.banco = BancoRemoto(servidor)
+            self.servico = ServicoRemoto(servidor)
+            self.root.title(f"Sistema de Biblioteca Escolar — {servidor}")
+        else:
+            self.banco = Banco(DB_PATH)
+            self.banco.monitor = diagnostico
+            self.servico = ServicoBiblioteca(self.banco)
+
         # Criar banco de dados (usa DB_PATH)
         self.criar_banco()
         
         # criar variáveis
         self.ultimo_aviso_data = None  # para não notificar repetidamente a mesma data
+
+        # Turmas dos comboboxes; inscrito antes das abas para já estar
+        # atualizado quando elas receberem o mesmo aviso
+        self.referencia = CacheReferencia(self.banco)
+        self.banco.inscrever('alunos', self.referencia.aplicar)
+        self.banco.inscrever('alunos.turma', self.referencia.aplicar_troca_turma)
+
+        # Títulos em memória para o autocomplete (só local: precisa dos avisos
+        # por linha); carregado em segundo plano ao abrir a aba Empréstimos
+        self.indice_titulos = None
+        self._atualizando_indice = False
+        self._indice_pendente = False
+        if indice_titulos and not self.remoto:
+            self.indice_titulos = IndiceTitulos(self.banco)
+            self.banco.inscrever('livros', self.indice_titulos.aplicar)
+            self.banco.inscrever('livros.titulo', self.indice_titulos.aplicar_troca_titulo)
         
-        # Criar interface principal
+        # Criar interface principal (abas vazias, montadas ao serem abertas)
         self.criar_interface()
 
-        # Checar devoluções do dia imediatamente e periodicamente (a cada 60s)
-        self.check_due_today()  # chama e agenda próximas verificações
+        # Checar devoluções do dia a cada dia com vencimentos (sem polling)
+        self.agenda_devolucoes = AgendaDevolucoes(self.root, self.banco, self.check_due_today)
+        self.banco.inscrever('emprestimos', self.agenda_devolucoes.aplicar)
+
+        # Painel oculto de diagnóstico
+        if diagnostico is not None:
+            self.root.bind_all('<Control-Shift-D>', lambda e: self.mostrar_diagnostico())
+
+        # Consultas de partida só depois da primeira pintura da janela
+        self.versao_dados = None
+        self.root.after_idle(self._concluir_partida)
+
+    def _concluir_partida(self):
+        """Carrega a aba inicial, a agenda de devoluções e a checagem de outros balcões"""
+        # Os redesenhos pendentes entraram na fila antes deste callback
+        self.root.update_idletasks()
+        janela_ms = (time.perf_counter() - self._inicio_partida) * 1000
+        self._construir_aba_selecionada()
+        self.root.update_idletasks()
+        aba_ms = (time.perf_counter() - self._inicio_partida) * 1000
+        log.info("Partida: janela em %.0f ms, primeira aba carregada em %.0f ms", janela_ms, aba_ms)
+        if janela_ms > META_PARTIDA_MS:
+            log.warning("Partida lenta: janela em %.0f ms (meta %d ms)", janela_ms, META_PARTIDA_MS)
+        if self.diagnostico is not None:
+            self.diagnostico.registrar_handler('partida: janela visível', janela_ms)
+            self.diagnostico.registrar_handler('partida: primeira aba carregada', aba_ms)
+
+        # Lembrete de devoluções do dia (e próximos vencimentos)
+        self.agenda_devolucoes.iniciar()
+
+        # Detectar gravações feitas por outros balcões no mesmo arquivo
+        self.versao_dados = self.banco.versao_dados()
+        self.root.after(INTERVALO_VERIFICACAO_EXTERNA, self.verificar_alteracoes_externas)
 
     def criar_banco(self):
-        """Cria o banco de dados SQLite com as tabelas necessárias"""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Tabela de livros
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS livros (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                titulo TEXT NOT NULL,
-                autor TEXT NOT NULL,
-                isbn TEXT UNIQUE,
-                categoria TEXT,
-                quantidade INTEGER DEFAULT 1,
-                disponivel INTEGER DEFAULT 1,
-                data_cadastro DATE DEFAULT CURRENT_DATE
-            )
-        ''')
-        
-        # Tabela de alunos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS alunos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT NOT NULL,
-                matricula TEXT UNIQUE NOT NULL,
-                serie TEXT,
-                turma TEXT,
-                telefone TEXT,
-                email TEXT,
-                data_cadastro DATE DEFAULT CURRENT_DATE
-            )
-        ''')
-        
-        # Tabela de empréstimos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS emprestimos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                livro_id INTEGER,
-                aluno_id INTEGER,
-                data_emprestimo DATE DEFAULT CURRENT_DATE,
-                data_devolucao_prevista DATE,
-                data_devolucao_real DATE,
-                status TEXT DEFAULT 'Emprestado',
-                observacoes TEXT,
-                FOREIGN KEY (livro_id) REFERENCES livros (id),
-                FOREIGN KEY (aluno_id) REFERENCES alunos (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """Cria o banco de dados SQLite e aplica as migrações pendentes"""
+        self.banco.migrar()
+        self.banco.ativar_notificacoes()
     
     def criar_interface(self):
         """Cria a interface principal com abas"""
@@ -100,37 +165,49 @@ class SistemaBiblioteca:
         self.notebook = ttk.Notebook(main_frame)
         self.notebook.pack(fill='both', expand=True)
         
-        # Criar abas
-        self.criar_aba_livros()
-        self.criar_aba_alunos()
-        self.criar_aba_emprestimos()
-        self.criar_aba_relatorios()
-        self.criar_aba_estudante()
+        # Abas vazias; cada uma é montada e carregada na primeira vez que é aberta
+        self._abas_pendentes = {}  # frame -> (nome, função que monta a aba)
+        self._abas_prontas = set()
+        for nome, titulo, montar in (
+                ('livros', "📚 Livros", self.criar_aba_livros),
+                ('alunos', "👨‍🎓 Alunos", self.criar_aba_alunos),
+                ('emprestimos', "📋 Empréstimos", self.criar_aba_emprestimos),
+                ('relatorios', "📊 Relatórios", self.criar_aba_relatorios),
+                ('estudante', "🧑‍🎓 Estudante", self.criar_aba_estudante)):
+            frame = ttk.Frame(self.notebook)
+            self.notebook.add(frame, text=titulo)
+            self._abas_pendentes[str(frame)] = (nome, montar)
+        self.notebook.bind('<<NotebookTabChanged>>', lambda e: self._construir_aba_selecionada())
+
+        # Mudanças que atravessam abas; cada handler ignora as abas ainda não montadas
+        self.banco.inscrever('alunos', self._aplicar_mudanca_alunos)
+        self.banco.inscrever('emprestimos', self._aplicar_mudanca_emprestimos)
+        for tabela in ('livros', 'alunos', 'emprestimos'):
+            self.banco.inscrever(tabela, self._agendar_estatisticas)
+
+    def _construir_aba_selecionada(self):
+        """Monta e carrega a aba selecionada, se for a primeira vez que ela aparece"""
+        selecionada = self.notebook.select()
+        pendente = self._abas_pendentes.pop(selecionada, None)
+        if pendente is None:
+            return
+        nome, montar = pendente
+        montar(self.notebook.nametowidget(selecionada))
+        self._abas_prontas.add(nome)
+
+    def _aba_pronta(self, nome):
+        return nome in self._abas_prontas
 
     # ---------------------- ABA ESTUDANTE ----------------------
-    def criar_aba_estudante(self):
+    def criar_aba_estudante(self, frame_estudante):
         """Aba para visualizar estudantes por turma e seus empréstimos"""
-        frame_estudante = ttk.Frame(self.notebook)
-        self.notebook.add(frame_estudante, text="🧑‍🎓 Estudante")
-
         # Frame para blocos de turmas
         bloco_frame = tk.LabelFrame(frame_estudante, text="Blocos de Turmas", font=('Arial', 12, 'bold'), padx=10, pady=10)
         bloco_frame.pack(fill='x', padx=10, pady=10)
 
-        # Blocos de turmas
-        blocos = {
-            "6º Ano": ["601", "602", "603", "604"],
-            "7º Ano": ["701", "702", "703", "704"],
-            "8º Ano": ["801", "802", "803", "804"],
-            "9º Ano": ["901", "902", "903", "904"],
-            "1º Médio": ["1001", "1002", "1003", "1004", "1005"],
-            "2º Médio": ["2001", "2002", "2003", "2004", "2005"],
-            "3º Médio": ["3001", "3002", "3003", "3005"]
-        }
-
         self.selected_turma = tk.StringVar()
         col = 0
-        for bloco, turmas in blocos.items():
+        for bloco, turmas in self.referencia.blocos().items():
             bloco_label = tk.Label(bloco_frame, text=bloco, font=('Arial', 10, 'bold'))
             bloco_label.grid(row=0, column=col, padx=10, pady=5)
             for i, turma in enumerate(turmas):
@@ -159,36 +236,44 @@ class SistemaBiblioteca:
     def carregar_estudantes_turma(self):
         """Carrega estudantes da turma selecionada e mostra empréstimos ativos"""
         turma = self.selected_turma.get()
-        for item in self.tree_estudantes.get_children():
-            self.tree_estudantes.delete(item)
+        self.tree_estudantes.delete(*self.tree_estudantes.get_children())
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, nome, matricula, serie, telefone, email
-                FROM alunos WHERE turma = ? ORDER BY nome
-            ''', (turma,))
-            alunos = cursor.fetchall()
-            for aluno in alunos:
-                cursor.execute('''
-                    SELECT l.titulo FROM emprestimos e
-                    JOIN livros l ON e.livro_id = l.id
-                    WHERE e.aluno_id = ? AND e.status = 'Emprestado'
-                ''', (aluno[0],))
-                livros = cursor.fetchall()
-                livros_str = ', '.join([l[0] for l in livros]) if livros else 'Nenhum'
-                valores = aluno + (livros_str,)
-                self.tree_estudantes.insert('', 'end', values=valores)
-            conn.close()
+            for valores in consultas.estudantes_da_turma(self.banco, turma):
+                self.tree_estudantes.insert('', 'end', iid=str(valores[0]), values=valores)
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao carregar estudantes: {e}")
 
+    def atualizar_estudantes(self, aluno_ids):
+        """Refaz apenas as linhas dos alunos informados na turma exibida"""
+        if not self._aba_pronta('estudante'):
+            return
+        turma = self.selected_turma.get()
+        if not turma or not aluno_ids:
+            return
+        novos = {str(v[0]): v for v in consultas.estudantes_da_turma(self.banco, turma, aluno_ids)}
+        for aluno_id in aluno_ids:
+            iid = str(aluno_id)
+            valores = novos.get(iid)
+            if valores is None:
+                # Mudou de turma
+                if self.tree_estudantes.exists(iid):
+                    self.tree_estudantes.delete(iid)
+            elif self.tree_estudantes.exists(iid) and self.tree_estudantes.item(iid, 'values')[1] == str(valores[1]):
+                self.tree_estudantes.item(iid, values=valores)
+            else:
+                if self.tree_estudantes.exists(iid):
+                    self.tree_estudantes.delete(iid)
+                # Mantém a ordem por nome
+                posicao = 0
+                for filho in self.tree_estudantes.get_children():
+                    if self.tree_estudantes.item(filho, 'values')[1] > valores[1]:
+                        break
+                    posicao += 1
+                self.tree_estudantes.insert('', posicao, iid=iid, values=valores)
+
     # ---------------------- ABA LIVROS ----------------------
-    def criar_aba_livros(self):
+    def criar_aba_livros(self, frame_livros):
         """Aba para cadastro e gerenciamento de livros"""
-        frame_livros = ttk.Frame(self.notebook)
-        self.notebook.add(frame_livros, text="📚 Livros")
-        
         # Frame para formulário
         form_frame = tk.LabelFrame(frame_livros, text="Cadastrar/Editar Livro", 
                                   font=('Arial', 12, 'bold'), padx=10, pady=10)
@@ -209,12 +294,7 @@ class SistemaBiblioteca:
         
         tk.Label(form_frame, text="Categoria:", font=('Arial', 10)).grid(row=1, column=2, sticky='w', padx=(20, 0), pady=5)
         self.combo_categoria = ttk.Combobox(form_frame, width=25, font=('Arial', 10))
-        self.combo_categoria['values'] = (
-            'Romance', 'Conto', 'Poesia', 'Drama', 'Aventura', 'Fantasia', 'Ficção Científica',
-            'Mistério', 'Suspense', 'Terror', 'Biografia', 'Autobiografia', 'Infantil',
-            'Juvenil', 'Didático', 'Literatura Brasileira', 'Literatura Estrangeira',
-            'Clássicos', 'História', 'Ciências', 'Geografia', 'Matemática', 'Religião', 'Outros'
-        )
+        self.combo_categoria['values'] = CATEGORIAS
         self.combo_categoria.grid(row=1, column=3, padx=(10, 0), pady=5)
         
         tk.Label(form_frame, text="Quantidade:", font=('Arial', 10)).grid(row=2, column=0, sticky='w', pady=5)
@@ -229,6 +309,8 @@ class SistemaBiblioteca:
                  bg='#27ae60', fg='white', font=('Arial', 10, 'bold'), width=15).pack(side='left', padx=5)
         tk.Button(btn_frame, text="Limpar Campos", command=self.limpar_campos_livro,
                  bg='#95a5a6', fg='white', font=('Arial', 10), width=15).pack(side='left', padx=5)
+        tk.Button(btn_frame, text="Importar Planilha", command=lambda: self.importar_planilha('livros'),
+                 bg='#8e44ad', fg='white', font=('Arial', 10), width=15).pack(side='left', padx=5)
 
         # Busca por autor (live e Enter)
         search_frame = tk.Frame(form_frame)
@@ -236,9 +318,13 @@ class SistemaBiblioteca:
         tk.Label(search_frame, text="Buscar por autor disponível:", font=('Arial', 10)).pack(side='left')
         self.entry_busca_autor = tk.Entry(search_frame, width=40, font=('Arial', 10))
         self.entry_busca_autor.pack(side='left', padx=8)
+        # Busca roda em segundo plano; só o resultado do texto mais recente volta para a tela
+        self.busca_autor = busca.BuscaAoDigitar(
+            self.root, self.banco, self._consultar_por_autor,
+            self._mostrar_busca_autor, self._erro_busca_autor)
         # Atualiza ao pressionar Enter
-        self.entry_busca_autor.bind("<Return>", lambda e: self.buscar_por_autor())
-        # Opcional: também atualiza ao digitar
+        self.entry_busca_autor.bind("<Return>", lambda e: self.buscar_por_autor(imediato=True))
+        # Opcional: também atualiza ao digitar (com debounce)
         self.entry_busca_autor.bind("<KeyRelease>", lambda e: self.buscar_por_autor())
 
         # Frame para lista de livros
@@ -264,35 +350,42 @@ class SistemaBiblioteca:
         self.tree_livros.pack(side='left', fill='both', expand=True)
         scroll_y_livros.pack(side='right', fill='y')
         scroll_x_livros.pack(side='bottom', fill='x')
-        
+
+        # Linhas vêm do banco página a página; clique no cabeçalho ordena no SQL
+        self.lista_livros = ListaPaginada(
+            self.tree_livros, scroll_y_livros, self.banco, **consultas.LISTA_LIVROS)
+        # Cada escrita atualiza só as linhas afetadas
+        self.banco.inscrever('livros', self.lista_livros.aplicar)
+
         # Carregar dados
         self.carregar_livros()
 
-    def buscar_por_autor(self):
+    def buscar_por_autor(self, imediato=False):
+        """Agenda a busca por autor com o texto atual do campo"""
         q = self.entry_busca_autor.get().strip()
-        # Limpar tree
-        for item in self.tree_livros.get_children():
-            self.tree_livros.delete(item)
-        try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            if q == "":
-                cursor.execute('SELECT * FROM livros ORDER BY titulo')
-            else:
-                cursor.execute('SELECT * FROM livros WHERE autor LIKE ? AND disponivel > 0 ORDER BY titulo', ('%'+q+'%',))
-            livros = cursor.fetchall()
-            conn.close()
-            for livro in livros:
-                self.tree_livros.insert('', 'end', values=livro)
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro na busca por autor: {e}")
+        if q == "":
+            # Campo vazio volta para o catálogo completo (paginado)
+            self.busca_autor.cancelar()
+            self.carregar_livros()
+            return
+        self.busca_autor.agendar(q, imediato)
+
+    @staticmethod
+    def _consultar_por_autor(banco, q):
+        """Consulta da busca por autor (roda na thread de busca)"""
+        return busca.buscar_por_autor(
+            banco, q, campos='l.id, l.titulo, l.autor, l.isbn, l.categoria, l.quantidade, l.disponivel')
+
+    def _mostrar_busca_autor(self, q, livros):
+        """Preenche a lista de livros com o resultado da busca por autor"""
+        self.lista_livros.mostrar(livros)
+
+    def _erro_busca_autor(self, q, erro):
+        messagebox.showerror("Erro", f"Erro na busca por autor: {erro}")
 
     # ---------------------- ABA ALUNOS ----------------------
-    def criar_aba_alunos(self):
+    def criar_aba_alunos(self, frame_alunos):
         """Aba para cadastro, edição e gerenciamento de alunos filtrados por turma"""
-        frame_alunos = ttk.Frame(self.notebook)
-        self.notebook.add(frame_alunos, text="👨‍🎓 Alunos")
-
         # Frame para seleção de turma
         filtro_frame = tk.LabelFrame(frame_alunos, text="Filtrar por Turma", font=('Arial', 12, 'bold'), padx=10, pady=10)
         filtro_frame.pack(fill='x', padx=10, pady=(10, 0))
@@ -320,16 +413,12 @@ class SistemaBiblioteca:
 
         tk.Label(form_frame, text="Série:", font=('Arial', 10)).grid(row=1, column=0, sticky='w', pady=5)
         self.combo_serie = ttk.Combobox(form_frame, width=15, font=('Arial', 10))
-        self.combo_serie['values'] = (
-            '6º Fundamental', '7º Fundamental', '8º Fundamental', '9º Fundamental',
-            '1º Médio', '2º Médio', '3º Médio'
-        )
+        self.combo_serie['values'] = SERIES
         self.combo_serie.grid(row=1, column=1, padx=(10, 0), pady=5)
 
         tk.Label(form_frame, text="Turma:", font=('Arial', 10)).grid(row=1, column=2, sticky='w', padx=(20, 0), pady=5)
         self.combo_turma_aluno = ttk.Combobox(form_frame, width=15, font=('Arial', 10))
         self.combo_turma_aluno.grid(row=1, column=3, padx=(10, 0), pady=5)
-        self.atualizar_lista_turmas()
 
         tk.Label(form_frame, text="Telefone:", font=('Arial', 10)).grid(row=2, column=0, sticky='w', pady=5)
         self.entry_telefone = tk.Entry(form_frame, width=20, font=('Arial', 10))
@@ -349,6 +438,8 @@ class SistemaBiblioteca:
                  bg='#95a5a6', fg='white', font=('Arial', 10), width=15).pack(side='left', padx=5)
         tk.Button(btn_frame, text="Salvar Edição", command=self.salvar_edicao_aluno,
                  bg='#27ae60', fg='white', font=('Arial', 10, 'bold'), width=15).pack(side='left', padx=5)
+        tk.Button(btn_frame, text="Importar Planilha", command=lambda: self.importar_planilha('alunos'),
+                 bg='#8e44ad', fg='white', font=('Arial', 10), width=15).pack(side='left', padx=5)
 
         # Frame para lista de alunos
         lista_frame = tk.LabelFrame(frame_alunos, text="Lista de Alunos", font=('Arial', 12, 'bold'), padx=10, pady=10)
@@ -366,60 +457,41 @@ class SistemaBiblioteca:
         self.tree_alunos.pack(side='left', fill='both', expand=True)
         scroll_y_alunos.pack(side='right', fill='y')
 
+        self.lista_alunos = ListaPaginada(
+            self.tree_alunos, scroll_y_alunos, self.banco,
+            filtro=self._filtro_turma_alunos, **consultas.LISTA_ALUNOS)
+
         # Seleção para edição
         self.tree_alunos.bind("<<TreeviewSelect>>", self.preencher_campos_edicao_aluno)
+        self.banco.inscrever('alunos', self.lista_alunos.aplicar)
 
-        # Carregar dados
+        # Carregar dados (inclui as turmas dos combos)
         self.carregar_alunos()
 
     def atualizar_lista_turmas(self):
         """Povoar combobox de turmas a partir do banco"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('SELECT DISTINCT turma FROM alunos WHERE turma IS NOT NULL AND turma <> ""')
-            turmas_db = [t[0] for t in cursor.fetchall()]
-            conn.close()
-            # Turmas padrão corrigidas
-            turmas_padrao = [
-                "601", "602", "603", "604",
-                "701", "702", "703", "704",
-                "801", "802", "803", "804",
-                "901", "902", "903", "904",
-                "1001", "1002", "1003", "1004", "1005",
-                "2001", "2002", "2003", "2004", "2005",
-                "3001", "3002", "3003", "3005"
-            ]
-            turmas = sorted(set(turmas_db + turmas_padrao), key=lambda x: (len(x), x))
+            turmas = self.referencia.turmas()
             self.combo_turma_aluno['values'] = turmas
             self.combo_turma_filtro['values'] = turmas
         except Exception:
-            pass
+            log.exception("Erro ao carregar a lista de turmas")
+
+    @staticmethod
+    def _incluir_turma(combo, turma):
+        """Acrescenta a turma às opções do combobox, se ainda não estiver lá"""
+        turmas = list(combo['values'])
+        if turma and turma not in turmas:
+            combo['values'] = ordenar_turmas(turmas + [turma])
 
     def limpar_filtro_turma(self):
         """Limpa filtro de turma e mostra todos os alunos"""
         self.combo_turma_filtro.set('')
         self.carregar_alunos()
 
-    def carregar_alunos(self):
-        """Carrega a lista de alunos na treeview, filtrando por turma se selecionada"""
-        for item in self.tree_alunos.get_children():
-            self.tree_alunos.delete(item)
-        try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            turma = self.combo_turma_filtro.get().strip()
-            if turma:
-                cursor.execute('SELECT * FROM alunos WHERE turma = ? ORDER BY nome', (turma,))
-            else:
-                cursor.execute('SELECT * FROM alunos ORDER BY nome')
-            alunos = cursor.fetchall()
-            conn.close()
-            for aluno in alunos:
-                self.tree_alunos.insert('', 'end', values=aluno)
-            self.atualizar_lista_turmas()
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao carregar alunos: {e}")
+    def _filtro_turma_alunos(self):
+        """Condição SQL da lista de alunos conforme a turma escolhida no filtro"""
+        return consultas.filtro_turma_alunos(self.combo_turma_filtro.get().strip())
 
     def preencher_campos_edicao_aluno(self, event):
         """Preenche os campos do formulário com os dados do aluno selecionado para edição"""
@@ -449,26 +521,17 @@ class SistemaBiblioteca:
             messagebox.showerror("Erro", "Nome e Matrícula são obrigatórios!")
             return
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE alunos SET nome=?, matricula=?, serie=?, turma=?, telefone=?, email=?
-                WHERE id=?
-            ''', (
-                self.entry_nome_aluno.get(), self.entry_matricula.get(),
-                self.combo_serie.get(), self.combo_turma_aluno.get(),
-                self.entry_telefone.get(), self.entry_email.get(),
-                self.aluno_editando_id
-            ))
-            conn.commit()
-            conn.close()
+            self.servico.atualizar_aluno(
+                aluno_id=self.aluno_editando_id,
+                nome=self.entry_nome_aluno.get(), matricula=self.entry_matricula.get(),
+                serie=self.combo_serie.get(), turma=self.combo_turma_aluno.get(),
+                telefone=self.entry_telefone.get(), email=self.entry_email.get())
+            self._apos_gravar()
             messagebox.showinfo("Sucesso", "Dados do aluno atualizados!")
             self.limpar_campos_aluno()
-            self.carregar_alunos()
-            self.atualizar_combos_emprestimo()
             self.aluno_editando_id = None
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Erro", "Matrícula já existe no sistema!")
+        except ErroServico as e:
+            messagebox.showerror("Erro", str(e))
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao editar aluno: {e}")
 
@@ -483,11 +546,8 @@ class SistemaBiblioteca:
         self.aluno_editando_id = None
 
     # ---------------------- ABA EMPRÉSTIMOS ----------------------
-    def criar_aba_emprestimos(self):
+    def criar_aba_emprestimos(self, frame_emprestimos):
         """Aba para gerenciamento de empréstimos"""
-        frame_emprestimos = ttk.Frame(self.notebook)
-        self.notebook.add(frame_emprestimos, text="📋 Empréstimos")
-        
         # Frame para novo empréstimo
         form_frame = tk.LabelFrame(frame_emprestimos, text="Novo Empréstimo", 
                                   font=('Arial', 12, 'bold'), padx=10, pady=10)
@@ -509,38 +569,69 @@ class SistemaBiblioteca:
         self.listbox_livro_sugestoes.grid(row=2, column=1, padx=(10, 0), pady=(0,5), columnspan=2)
         self.listbox_livro_sugestoes.grid_remove()  # Esconde inicialmente
 
+        self.sugestoes_livro = busca.BuscaAoDigitar(
+            self.root, self.banco, busca.sugerir_titulos,
+            self._mostrar_sugestoes_livro, self._erro_sugestoes_livro, atraso_ms=150)
         self.entry_livro_emp.bind("<KeyRelease>", self.autocomplete_livro)
         self.listbox_livro_sugestoes.bind("<<ListboxSelect>>", self.selecionar_livro_sugestao)
 
-        # Seleção de aluno
+        # Seleção de aluno: nome ou matrícula, com sugestões da turma escolhida
         tk.Label(form_frame, text="Aluno:", font=('Arial', 10)).grid(row=3, column=0, sticky='w', pady=5)
-        self.combo_aluno_emp = ttk.Combobox(form_frame, width=60, font=('Arial', 10))
-        self.combo_aluno_emp.grid(row=3, column=1, padx=(10, 0), pady=5, columnspan=2)
+        self.entry_aluno_emp = tk.Entry(form_frame, width=60, font=('Arial', 10))
+        self.entry_aluno_emp.grid(row=3, column=1, padx=(10, 0), pady=5, columnspan=2)
+        self.listbox_aluno_sugestoes = tk.Listbox(form_frame, width=60, font=('Arial', 10), height=5)
+        self.listbox_aluno_sugestoes.grid(row=4, column=1, padx=(10, 0), pady=(0, 5), columnspan=2)
+        self.seletor_aluno = SeletorAluno(
+            self.root, self.banco, self.entry_aluno_emp, self.listbox_aluno_sugestoes,
+            turma=lambda: self.combo_turma_emp.get().strip() or None)
         
         # Data de devolução
-        tk.Label(form_frame, text="Dias para devolução:", font=('Arial', 10)).grid(row=4, column=0, sticky='w', pady=5)
+        tk.Label(form_frame, text="Dias para devolução:", font=('Arial', 10)).grid(row=5, column=0, sticky='w', pady=5)
         self.entry_dias_devolucao = tk.Entry(form_frame, width=10, font=('Arial', 10))
         self.entry_dias_devolucao.insert(0, "15")  # Padrão 15 dias
-        self.entry_dias_devolucao.grid(row=4, column=1, padx=(10, 0), pady=5)
+        self.entry_dias_devolucao.grid(row=5, column=1, padx=(10, 0), pady=5)
         
         # Observações
-        tk.Label(form_frame, text="Observações:", font=('Arial', 10)).grid(row=5, column=0, sticky='nw', pady=5)
+        tk.Label(form_frame, text="Observações:", font=('Arial', 10)).grid(row=6, column=0, sticky='nw', pady=5)
         self.text_observacoes = tk.Text(form_frame, width=50, height=3, font=('Arial', 10))
-        self.text_observacoes.grid(row=5, column=1, padx=(10, 0), pady=5, columnspan=2)
+        self.text_observacoes.grid(row=6, column=1, padx=(10, 0), pady=5, columnspan=2)
         
         # Botões
         btn_frame = tk.Frame(form_frame)
-        btn_frame.grid(row=6, column=0, columnspan=3, pady=10)
+        btn_frame.grid(row=7, column=0, columnspan=3, pady=10)
         
         tk.Button(btn_frame, text="Registrar Empréstimo", command=self.registrar_emprestimo,
                  bg='#e74c3c', fg='white', font=('Arial', 10, 'bold'), width=18).pack(side='left', padx=5)
         tk.Button(btn_frame, text="Atualizar Listas", command=self.atualizar_combos_emprestimo,
                  bg='#f39c12', fg='white', font=('Arial', 10), width=15).pack(side='left', padx=5)
+        tk.Button(btn_frame, text="Circulação em Lote", command=self.abrir_circulacao_lote,
+                 bg='#8e44ad', fg='white', font=('Arial', 10), width=16).pack(side='left', padx=5)
         
+        # Renovação e devolução de vários empréstimos por filtro
+        lote_frame = tk.LabelFrame(frame_emprestimos, text="Ações em Lote",
+                                   font=('Arial', 12, 'bold'), padx=10, pady=5)
+        lote_frame.pack(fill='x', padx=10)
+        tk.Label(lote_frame, text="Turma:", font=('Arial', 10)).pack(side='left')
+        self.combo_turma_lote = ttk.Combobox(lote_frame, width=10, font=('Arial', 10))
+        self.combo_turma_lote.pack(side='left', padx=(5, 15))
+        tk.Label(lote_frame, text="Vencimento:", font=('Arial', 10)).pack(side='left')
+        self.combo_vencimento_lote = ttk.Combobox(lote_frame, width=20, font=('Arial', 10), state='readonly',
+                                                  values=list(VENCIMENTOS_LOTE))
+        self.combo_vencimento_lote.set(next(iter(VENCIMENTOS_LOTE)))
+        self.combo_vencimento_lote.pack(side='left', padx=(5, 15))
+        tk.Button(lote_frame, text="Renovar Filtrados", command=self.renovar_por_filtro,
+                  bg='#2980b9', fg='white', font=('Arial', 10), width=16).pack(side='left', padx=5)
+        tk.Button(lote_frame, text="Devolver Filtrados", command=self.devolver_por_filtro,
+                  bg='#27ae60', fg='white', font=('Arial', 10), width=16).pack(side='left', padx=5)
+
         # Frame para lista de empréstimos
         lista_frame = tk.LabelFrame(frame_emprestimos, text="Empréstimos Ativos", 
                                    font=('Arial', 12, 'bold'), padx=10, pady=10)
         lista_frame.pack(fill='both', expand=True, padx=10, pady=10)
+
+        self.somente_atrasados = tk.BooleanVar(value=False)
+        tk.Checkbutton(lista_frame, text="Somente atrasados", variable=self.somente_atrasados,
+                       command=self.carregar_emprestimos, font=('Arial', 10)).pack(anchor='w')
         
         # Treeview para empréstimos
         self.tree_emprestimos = ttk.Treeview(lista_frame, columns=('ID', 'Livro', 'Aluno', 'Data Emp.', 'Prev. Dev.', 'Status'), show='headings')
@@ -552,39 +643,109 @@ class SistemaBiblioteca:
         self.tree_emprestimos.configure(yscrollcommand=scroll_y_emp.set)
         self.tree_emprestimos.pack(side='left', fill='both', expand=True)
         scroll_y_emp.pack(side='right', fill='y')
-        
+
+        self.lista_emprestimos = ListaPaginada(
+            self.tree_emprestimos, scroll_y_emp, self.banco,
+            formatar=self._formatar_emprestimo,
+            **dict(consultas.LISTA_EMPRESTIMOS, filtro=self._filtro_emprestimos))
+        self.banco.inscrever('emprestimos', self.lista_emprestimos.aplicar)
+
+        # Ctrl/Shift + clique marcam vários empréstimos para devolver ou renovar juntos
         tk.Button(lista_frame, text="Registrar Devolução", command=self.registrar_devolucao,
-                 bg='#27ae60', fg='white', font=('Arial', 10, 'bold'), width=20).pack(pady=10)
+                 bg='#27ae60', fg='white', font=('Arial', 10, 'bold'), width=20).pack(pady=(10, 5))
+        tk.Button(lista_frame, text="Renovar Selecionados", command=self.renovar_emprestimo,
+                 bg='#2980b9', fg='white', font=('Arial', 10, 'bold'), width=20).pack(pady=5)
+        self.bind_renovar_emprestimo()
         
         self.carregar_emprestimos()
         self.atualizar_combos_emprestimo()
+        self._carregar_indice_titulos()
+
+    def _carregar_indice_titulos(self):
+        """Monta (ou remonta) o índice de títulos em segundo plano; até a primeira
+        carga o autocomplete usa o FTS, numa recarga continua com o índice anterior"""
+        self._atualizar_indice_titulos(recarregar=True)
+
+    def _sincronizar_indice_titulos(self):
+        """Põe o índice em dia após gravações sem aviso, em segundo plano;
+        recarrega se os títulos mudaram"""
+        if self.indice_titulos is not None and self.indice_titulos.pronto:
+            self._atualizar_indice_titulos(recarregar=False)
+
+    def _atualizar_indice_titulos(self, recarregar):
+        # Uma carga ou sincronização por vez; pedidos no meio viram uma sincronização no fim
+        if self.indice_titulos is None:
+            return
+        if self._atualizando_indice:
+            self._indice_pendente = True
+            return
+        self._atualizando_indice = True
+        self._indice_pendente = False
+
+        def concluir(atualizado):
+            self._atualizando_indice = False
+            if recarregar:
+                log.info("Índice de títulos: %d títulos, %.0f KiB", len(self.indice_titulos),
+                         sum(self.indice_titulos.memoria().values()) / 1024)
+            if not atualizado:
+                self._carregar_indice_titulos()
+            elif self._indice_pendente:
+                self._sincronizar_indice_titulos()
+
+        def falhar():
+            self._atualizando_indice = False
+
+        def trabalhar():
+            try:
+                if recarregar:
+                    self.indice_titulos.carregar()
+                # Depois de uma carga, põe em dia os avisos ignorados enquanto ela rodava
+                atualizado = self.indice_titulos.sincronizar()
+            except Exception:
+                log.exception("Erro ao atualizar o índice de títulos")
+                self.root.after(0, falhar)
+                return
+            finally:
+                self.banco.liberar()
+            self.root.after(0, concluir, atualizado)
+
+        threading.Thread(target=trabalhar, daemon=True).start()
 
     def autocomplete_livro(self, event=None):
         """Mostra sugestões de livros conforme o texto digitado"""
         texto = self.entry_livro_emp.get().strip().lower()
         if not texto:
+            self.sugestoes_livro.cancelar()
             self.listbox_livro_sugestoes.grid_remove()
             return
-        try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('SELECT id, titulo, autor FROM livros WHERE disponivel > 0 AND LOWER(titulo) LIKE ?', ('%' + texto + '%',))
-            livros = cursor.fetchall()
-            conn.close()
-            self.listbox_livro_sugestoes.delete(0, tk.END)
-            for livro in livros:
-                self.listbox_livro_sugestoes.insert(tk.END, f"{livro[0]} - {livro[1]} ({livro[2]})")
-            if livros:
-                self.listbox_livro_sugestoes.grid()
-            else:
-                self.listbox_livro_sugestoes.grid_remove()
-        except Exception:
+        if self.indice_titulos is not None and self.indice_titulos.pronto:
+            # Em memória: responde na hora, sem debounce nem thread
+            try:
+                self._mostrar_sugestoes_livro(
+                    texto, self.indice_titulos.sugestoes(texto, busca.LIMITE_SUGESTOES))
+            except Exception as e:
+                self._erro_sugestoes_livro(texto, e)
+            return
+        self.sugestoes_livro.agendar(texto)
+
+    def _mostrar_sugestoes_livro(self, texto, livros):
+        """Preenche a lista de sugestões com o resultado da busca"""
+        self.listbox_livro_sugestoes.delete(0, tk.END)
+        for livro in livros:
+            self.listbox_livro_sugestoes.insert(tk.END, f"{livro[0]} - {livro[1]} ({livro[2]})")
+        if livros:
+            self.listbox_livro_sugestoes.grid()
+        else:
             self.listbox_livro_sugestoes.grid_remove()
 
+    def _erro_sugestoes_livro(self, texto, erro):
+        self.listbox_livro_sugestoes.grid_remove()
+
     def selecionar_livro_sugestao(self, event=None):
         """Seleciona livro da sugestão e preenche o campo"""
         selection = self.listbox_livro_sugestoes.curselection()
         if selection:
+            self.sugestoes_livro.cancelar()
             valor = self.listbox_livro_sugestoes.get(selection[0])
             self.entry_livro_emp.delete(0, tk.END)
             self.entry_livro_emp.insert(0, valor)
@@ -593,153 +754,228 @@ class SistemaBiblioteca:
     def atualizar_lista_turmas_emp(self):
         """Atualiza combobox de turmas na aba de empréstimos"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('SELECT DISTINCT turma FROM alunos WHERE turma IS NOT NULL AND turma <> ""')
-            turmas = [t[0] for t in cursor.fetchall()]
-            conn.close()
+            turmas = self.referencia.turmas(incluir_padrao=False)
             self.combo_turma_emp['values'] = turmas
+            self.combo_turma_lote['values'] = turmas
         except Exception:
-            pass
+            log.exception("Erro ao carregar as turmas dos empréstimos")
 
     def atualizar_alunos_por_turma(self):
-        """Popula combo de alunos com os alunos da turma selecionada"""
-        turma = self.combo_turma_emp.get().strip()
-        try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            if turma == "":
-                cursor.execute('SELECT id, nome, matricula FROM alunos ORDER BY nome')
-            else:
-                cursor.execute('SELECT id, nome, matricula FROM alunos WHERE turma = ? ORDER BY nome', (turma,))
-            alunos = cursor.fetchall()
-            conn.close()
-            alunos_values = [f"{al[0]} - {al[1]} ({al[2]})" for al in alunos]
-            self.combo_aluno_emp['values'] = alunos_values
-            if alunos_values:
-                self.combo_aluno_emp.set(alunos_values[0])
-            else:
-                self.combo_aluno_emp.set('')
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao carregar alunos por turma: {e}")
+        """Troca de turma: desfaz a escolha do aluno e sugere os primeiros da turma"""
+        self.seletor_aluno.limpar()
+        self.seletor_aluno.sugerir()
+        self.entry_aluno_emp.focus_set()
 
     def atualizar_combos_emprestimo(self):
-        """Atualiza os comboboxes de alunos disponíveis"""
+        """Atualiza os comboboxes de turmas (os alunos são buscados enquanto se digita)"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            # Alunos (todos por padrão)
-            cursor.execute('SELECT id, nome, matricula FROM alunos ORDER BY nome')
-            alunos = cursor.fetchall()
-            alunos_values = [f"{aluno[0]} - {aluno[1]} ({aluno[2]})" for aluno in alunos]
-            self.combo_aluno_emp['values'] = alunos_values
-            conn.close()
             self.atualizar_lista_turmas_emp()
-            self.atualizar_lista_turmas()
+            if self._aba_pronta('alunos'):
+                self.atualizar_lista_turmas()
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao atualizar listas: {e}")
 
+    def _aplicar_mudanca_alunos(self, acao, ids):
+        """Corrige combos e a aba Estudante para os alunos alterados"""
+        combos_turma = []
+        if self._aba_pronta('alunos'):
+            combos_turma += [self.combo_turma_aluno, self.combo_turma_filtro]
+        escolhido = None
+        if self._aba_pronta('emprestimos'):
+            combos_turma += [self.combo_turma_emp, self.combo_turma_lote]
+            aluno = self.seletor_aluno.aluno
+            if aluno is not None and aluno[0] in ids:
+                escolhido = aluno[0]
+                if acao == 'delete':
+                    self.seletor_aluno.limpar()
+        if acao != 'delete' and (combos_turma or escolhido):
+            linhas = self.banco.consultar(f'''
+                SELECT id, nome, matricula, turma FROM alunos
+                WHERE id IN ({', '.join('?' * len(ids))})
+            ''', ids)
+            for aluno_id, nome, matricula, turma in linhas:
+                if aluno_id == escolhido:
+                    # Nome ou matrícula do aluno escolhido mudou: atualiza o campo
+                    self.seletor_aluno.escolher((aluno_id, nome, matricula))
+                for combo in combos_turma:
+                    self._incluir_turma(combo, turma)
+        self.atualizar_estudantes(ids)
+
+    def _aplicar_mudanca_emprestimos(self, acao, ids):
+        """Atualiza na aba Estudante os alunos cujos empréstimos mudaram"""
+        if not self._aba_pronta('estudante'):
+            return
+        if acao == 'delete':
+            if self.selected_turma.get():
+                self.carregar_estudantes_turma()
+        else:
+            self.atualizar_estudantes(consultas.alunos_dos_emprestimos(self.banco, ids))
+
     def registrar_emprestimo(self):
         """Registra um novo empréstimo"""
         livro_valor = self.entry_livro_emp.get()
-        aluno_valor = self.combo_aluno_emp.get()
-        if not livro_valor or not aluno_valor:
+        aluno = self.seletor_aluno.aluno
+        if not livro_valor or aluno is None:
             messagebox.showerror("Erro", "Selecione um livro e um aluno!")
             return
         try:
             # Extrair ID do livro
             livro_id = int(livro_valor.split(' - ')[0])
-            aluno_id = int(aluno_valor.split(' - ')[0])
+            aluno_id = aluno[0]
             dias = int(self.entry_dias_devolucao.get()) if self.entry_dias_devolucao.get() else 15
-            data_devolucao = datetime.now() + timedelta(days=dias)
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('SELECT disponivel FROM livros WHERE id = ?', (livro_id,))
-            disponivel = cursor.fetchone()[0]
-            if disponivel <= 0:
-                messagebox.showerror("Erro", "Livro não está disponível!")
-                conn.close()
-                return
-            cursor.execute('''
-                INSERT INTO emprestimos (livro_id, aluno_id, data_devolucao_prevista, observacoes)
-                VALUES (?, ?, ?, ?)
-            ''', (livro_id, aluno_id, data_devolucao.strftime('%Y-%m-%d'), 
-                  self.text_observacoes.get(1.0, tk.END).strip()))
-            cursor.execute('UPDATE livros SET disponivel = disponivel - 1 WHERE id = ?', (livro_id,))
-            conn.commit()
-            conn.close()
+            self.servico.registrar_emprestimo(
+                livro_id=livro_id, aluno_id=aluno_id, dias=dias,
+                observacoes=self.text_observacoes.get(1.0, tk.END).strip())
+            self._apos_gravar()
             messagebox.showinfo("Sucesso", "Empréstimo registrado com sucesso!")
             self.entry_livro_emp.delete(0, tk.END)
-            self.combo_aluno_emp.set('')
+            self.seletor_aluno.limpar()
             self.text_observacoes.delete(1.0, tk.END)
-            self.carregar_emprestimos()
-            self.atualizar_combos_emprestimo()
+        except ErroServico as e:
+            messagebox.showerror("Erro", str(e))
         except ValueError:
             messagebox.showerror("Erro", "Dias para devolução deve ser um número!")
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao registrar empréstimo: {e}")
 
+    def abrir_circulacao_lote(self):
+        """Janela do leitor de código de barras: empréstimos ou devoluções de uma turma inteira"""
+        win = tk.Toplevel(self.root)
+        win.title("Circulação em Lote")
+        win.geometry("820x560")
+        lote = circulacao.LoteCirculacao(self.banco)
+
+        topo = tk.Frame(win)
+        topo.pack(fill='x', padx=10, pady=(10, 0))
+        modo = tk.StringVar(value=circulacao.EMPRESTIMO)
+        for texto, valor in (("Empréstimo", circulacao.EMPRESTIMO), ("Devolução", circulacao.DEVOLUCAO)):
+            tk.Radiobutton(topo, text=texto, variable=modo, value=valor, font=('Arial', 10),
+                           command=lambda: trocar_modo()).pack(side='left', padx=5)
+        tk.Label(topo, text="Dias:", font=('Arial', 10)).pack(side='left', padx=(20, 5))
+        entry_dias = tk.Entry(topo, width=5, font=('Arial', 10))
+        entry_dias.insert(0, self.entry_dias_devolucao.get() or "15")
+        entry_dias.pack(side='left')
+
+        tk.Label(win, text="Leia a matrícula do aluno e depois os livros (ISBN ou código da etiqueta):",
+                 font=('Arial', 10)).pack(anchor='w', padx=10, pady=(10, 0))
+        entry_codigo = tk.Entry(win, font=('Arial', 14))
+        entry_codigo.pack(fill='x', padx=10, pady=5)
+        label_mensagem = tk.Label(win, text="", font=('Arial', 10, 'bold'), anchor='w')
+        label_mensagem.pack(fill='x', padx=10)
+
+        tree = ttk.Treeview(win, columns=('Código', 'Livro', 'Aluno', 'Situação'), show='headings')
+        for col, largura in (('Código', 130), ('Livro', 300), ('Aluno', 200), ('Situação', 160)):
+            tree.heading(col, text=col)
+            tree.column(col, width=largura)
+        tree.pack(fill='both', expand=True, padx=10, pady=5)
+        itens = {}  # item da treeview -> ItemLote
+
+        def mostrar(mensagem, erro=False):
+            label_mensagem.config(text=mensagem, fg='#c0392b' if erro else '#27ae60')
+            if erro:
+                win.bell()
+
+        def ler(event=None):
+            codigo = entry_codigo.get().strip()
+            entry_codigo.delete(0, tk.END)
+            if not codigo:
+                return
+            try:
+                item, mensagem = lote.ler(codigo)
+            except ErroServico as e:
+                mostrar(str(e), erro=True)
+                return
+            except Exception as e:
+                mostrar(f"Erro ao ler {codigo}: {e}", erro=True)
+                return
+            if item is not None:
+                itens[tree.insert('', 0, values=(item.codigo, item.titulo[:45], item.aluno, item.situacao))] = item
+            mostrar(mensagem)
+
+        def remover():
+            for iid in tree.selection():
+                item = itens.pop(iid)
+                if item.situacao == 'Pendente':
+                    lote.remover(item)
+                tree.delete(iid)
+
+        def trocar_modo():
+            if any(item.situacao == 'Pendente' for item in lote.itens):
+                if not messagebox.askyesno("Circulação em Lote", "Descartar as leituras ainda não gravadas?",
+                                           parent=win):
+                    modo.set(lote.modo)
+                    return
+            lote.modo = modo.get()
+            lote.limpar()
+            itens.clear()
+            tree.delete(*tree.get_children())
+            mostrar("")
+            entry_codigo.focus_set()
+
+        def confirmar():
+            try:
+                gravados = lote.confirmar(self.servico, entry_dias.get() or 15)
+            except ErroServico as e:
+                messagebox.showerror("Erro", str(e), parent=win)
+                return
+            except Exception as e:
+                messagebox.showerror("Erro", f"Erro ao gravar o lote: {e}", parent=win)
+                return
+            # Uma transação: as listas recebem um único aviso com todos os ids
+            self._apos_gravar()
+            for iid, item in itens.items():
+                tree.set(iid, 'Situação', item.situacao)
+            recusados = sum(1 for item in itens.values() if item.situacao not in ('OK', 'Pendente'))
+            mostrar(f"{gravados} gravado(s)" + (f", {recusados} recusado(s)" if recusados else ""),
+                    erro=bool(recusados))
+            entry_codigo.focus_set()
+
+        botoes = tk.Frame(win)
+        botoes.pack(pady=8)
+        tk.Button(botoes, text="Gravar Lote", command=confirmar, bg='#27ae60', fg='white',
+                  font=('Arial', 10, 'bold'), width=16).pack(side='left', padx=5)
+        tk.Button(botoes, text="Remover Selecionados", command=remover, bg='#e67e22', fg='white',
+                  font=('Arial', 10), width=18).pack(side='left', padx=5)
+        tk.Button(botoes, text="Novo Lote", command=lambda: trocar_modo(), bg='#34495e', fg='white',
+                  font=('Arial', 10), width=12).pack(side='left', padx=5)
+
+        # O leitor "digita" o código e envia Enter; F12 grava o lote sem tirar a mão do leitor
+        entry_codigo.bind('<Return>', ler)
+        win.bind('<F12>', lambda e: confirmar())
+        entry_codigo.focus_set()
+
     # ---------------------- CARREGAR E LISTAR ----------------------
     def carregar_livros(self):
-        """Carrega a lista de livros na treeview"""
-        for item in self.tree_livros.get_children():
-            self.tree_livros.delete(item)
+        """Carrega a primeira página da lista de livros na treeview"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM livros ORDER BY titulo')
-            livros = cursor.fetchall()
-            conn.close()
-            for livro in livros:
-                self.tree_livros.insert('', 'end', values=livro)
+            self.lista_livros.recarregar()
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao carregar livros: {e}")
 
     def carregar_alunos(self):
-        """Carrega a lista de alunos na treeview"""
-        for item in self.tree_alunos.get_children():
-            self.tree_alunos.delete(item)
+        """Carrega a lista de alunos na treeview, filtrando por turma se selecionada"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM alunos ORDER BY nome')
-            alunos = cursor.fetchall()
-            conn.close()
-            for aluno in alunos:
-                self.tree_alunos.insert('', 'end', values=aluno)
+            self.lista_alunos.recarregar()
             self.atualizar_lista_turmas()
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao carregar alunos: {e}")
 
     def carregar_emprestimos(self):
-        """Carrega a lista de empréstimos ativos na treeview"""
-        for item in self.tree_emprestimos.get_children():
-            self.tree_emprestimos.delete(item)
+        """Carrega a primeira página dos empréstimos ativos na treeview"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT e.id, l.titulo, a.nome, e.data_emprestimo, 
-                       e.data_devolucao_prevista, e.status
-                FROM emprestimos e
-                JOIN livros l ON e.livro_id = l.id
-                JOIN alunos a ON e.aluno_id = a.id
-                WHERE e.status = 'Emprestado'
-                ORDER BY e.data_emprestimo DESC
-            ''')
-            emprestimos = cursor.fetchall()
-            conn.close()
-            for emp in emprestimos:
-                data_prev = datetime.strptime(emp[4], '%Y-%m-%d')
-                if data_prev.date() < datetime.now().date():
-                    status = "ATRASADO"
-                else:
-                    status = emp[5]
-                valores = (emp[0], emp[1][:30], emp[2][:20], emp[3], emp[4], status)
-                self.tree_emprestimos.insert('', 'end', values=valores)
+            self.lista_emprestimos.recarregar()
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao carregar empréstimos: {e}")
 
+    def _filtro_emprestimos(self):
+        """Condição SQL da lista de empréstimos conforme "Somente atrasados\""""
+        return consultas.filtro_emprestimos(self.somente_atrasados.get())
+
+    @staticmethod
+    def _formatar_emprestimo(emp):
+        """Valores exibidos de um empréstimo (o status ATRASADO já vem do SQL)"""
+        return (emp[0], emp[1][:30], emp[2][:20], emp[3], emp[4], emp[5])
+
     # ---------------------- CADASTROS E UTILIDADES ----------------------
     def cadastrar_livro(self):
         """Cadastra um novo livro no banco de dados"""
@@ -747,21 +983,16 @@ class SistemaBiblioteca:
             messagebox.showerror("Erro", "Título e Autor são obrigatórios!")
             return
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
             quantidade = int(self.entry_quantidade.get()) if self.entry_quantidade.get() else 1
-            cursor.execute('''
-                INSERT INTO livros (titulo, autor, isbn, categoria, quantidade, disponivel)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (self.entry_titulo.get(), self.entry_autor.get(), self.entry_isbn.get(),
-                  self.combo_categoria.get(), quantidade, quantidade))
-            conn.commit()
-            conn.close()
+            self.servico.cadastrar_livro(
+                titulo=self.entry_titulo.get(), autor=self.entry_autor.get(),
+                isbn=self.entry_isbn.get(), categoria=self.combo_categoria.get(),
+                quantidade=quantidade)
+            self._apos_gravar()
             messagebox.showinfo("Sucesso", "Livro cadastrado com sucesso!")
             self.limpar_campos_livro()
-            self.carregar_livros()
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Erro", "ISBN já existe no sistema!")
+        except ErroServico as e:
+            messagebox.showerror("Erro", str(e))
         except ValueError:
             messagebox.showerror("Erro", "Quantidade deve ser um número!")
         except Exception as e:
@@ -781,22 +1012,15 @@ class SistemaBiblioteca:
             messagebox.showerror("Erro", "Nome e Matrícula são obrigatórios!")
             return
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO alunos (nome, matricula, serie, turma, telefone, email)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (self.entry_nome_aluno.get(), self.entry_matricula.get(), 
-                  self.combo_serie.get(), self.combo_turma_aluno.get(),
-                  self.entry_telefone.get(), self.entry_email.get()))
-            conn.commit()
-            conn.close()
+            self.servico.cadastrar_aluno(
+                nome=self.entry_nome_aluno.get(), matricula=self.entry_matricula.get(),
+                serie=self.combo_serie.get(), turma=self.combo_turma_aluno.get(),
+                telefone=self.entry_telefone.get(), email=self.entry_email.get())
+            self._apos_gravar()
             messagebox.showinfo("Sucesso", "Aluno cadastrado com sucesso!")
             self.limpar_campos_aluno()
-            self.carregar_alunos()
-            self.atualizar_combos_emprestimo()
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Erro", "Matrícula já existe no sistema!")
+        except ErroServico as e:
+            messagebox.showerror("Erro", str(e))
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao cadastrar aluno: {e}")
 
@@ -810,65 +1034,98 @@ class SistemaBiblioteca:
         self.entry_telefone.delete(0, tk.END)
         self.entry_email.delete(0, tk.END)
 
+    def _emprestimos_selecionados(self):
+        """Ids dos empréstimos marcados na lista"""
+        return [self.tree_emprestimos.item(iid)['values'][0] for iid in self.tree_emprestimos.selection()]
+
     def registrar_devolucao(self):
-        """Registra a devolução de um livro"""
-        selected_item = self.tree_emprestimos.selection()
-        if not selected_item:
+        """Registra a devolução dos empréstimos selecionados"""
+        emprestimo_ids = self._emprestimos_selecionados()
+        if not emprestimo_ids:
             messagebox.showerror("Erro", "Selecione um empréstimo para devolver!")
             return
         try:
-            item = self.tree_emprestimos.item(selected_item)
-            emprestimo_id = item['values'][0]
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('SELECT livro_id FROM emprestimos WHERE id = ?', (emprestimo_id,))
-            livro_id = cursor.fetchone()[0]
-            cursor.execute('''
-                UPDATE emprestimos 
-                SET data_devolucao_real = CURRENT_DATE, status = 'Devolvido'
-                WHERE id = ?
-            ''', (emprestimo_id,))
-            cursor.execute('UPDATE livros SET disponivel = disponivel + 1 WHERE id = ?', (livro_id,))
-            conn.commit()
-            conn.close()
-            messagebox.showinfo("Sucesso", "Devolução registrada com sucesso!")
-            self.carregar_emprestimos()
-            self.atualizar_combos_emprestimo()
+            if len(emprestimo_ids) == 1:
+                self.servico.registrar_devolucao(emprestimo_id=emprestimo_ids[0])
+                self._apos_gravar()
+                messagebox.showinfo("Sucesso", "Devolução registrada com sucesso!")
+                return
+            if not messagebox.askyesno("Devolução", f"Registrar a devolução de {len(emprestimo_ids)} empréstimos?"):
+                return
+            resultados = self.servico.devolver_lote(emprestimo_ids=emprestimo_ids)
+            self._apos_gravar()
+            devolvidos = sum(1 for _, erro in resultados if erro is None)
+            messagebox.showinfo("Sucesso", f"{devolvidos} devolução(ões) registrada(s)."
+                                + self._texto_recusados(len(emprestimo_ids) - devolvidos))
+        except ErroServico as e:
+            messagebox.showerror("Erro", str(e))
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao registrar devolução: {e}")
 
     def renovar_emprestimo(self, event=None):
-        """Renova o empréstimo do livro para mais 7 dias"""
-        selected_item = self.tree_emprestimos.selection()
-        if not selected_item:
+        """Renova os empréstimos selecionados por mais 7 dias"""
+        emprestimo_ids = self._emprestimos_selecionados()
+        if not emprestimo_ids:
             messagebox.showerror("Erro", "Selecione um empréstimo para renovar!")
             return
         try:
-            item = self.tree_emprestimos.item(selected_item)
-            emprestimo_id = item['values'][0]
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            # Buscar data atual prevista
-            cursor.execute('SELECT data_devolucao_prevista FROM emprestimos WHERE id = ?', (emprestimo_id,))
-            row = cursor.fetchone()
-            if not row:
-                conn.close()
-                messagebox.showerror("Erro", "Empréstimo não encontrado!")
+            if len(emprestimo_ids) == 1:
+                nova_data = datetime.strptime(
+                    self.servico.renovar_emprestimo(emprestimo_id=emprestimo_ids[0]), '%Y-%m-%d')
+                self._apos_gravar()
+                messagebox.showinfo("Sucesso", f"Empréstimo renovado para {nova_data.strftime('%d/%m/%Y')}!")
                 return
-            data_prevista = datetime.strptime(row[0], '%Y-%m-%d')
-            nova_data = data_prevista + timedelta(days=7)
-            cursor.execute('''
-                UPDATE emprestimos
-                SET data_devolucao_prevista = ?
-                WHERE id = ? AND status = 'Emprestado'
-            ''', (nova_data.strftime('%Y-%m-%d'), emprestimo_id))
-            conn.commit()
-            conn.close()
-            messagebox.showinfo("Sucesso", f"Empréstimo renovado para {nova_data.strftime('%d/%m/%Y')}!")
-            self.carregar_emprestimos()
+            renovados = self.servico.renovar_lote(emprestimo_ids=emprestimo_ids)
+            self._apos_gravar()
+            messagebox.showinfo("Sucesso", f"{renovados} empréstimo(s) renovado(s) por mais 7 dias."
+                                + self._texto_recusados(len(emprestimo_ids) - renovados))
+        except ErroServico as e:
+            messagebox.showerror("Erro", str(e))
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao renovar empréstimo: {e}")
 
+    @staticmethod
+    def _texto_recusados(quantidade):
+        return f"\n{quantidade} já estava(m) devolvido(s) ou não foi(ram) encontrado(s)." if quantidade else ""
+
+    def _filtro_lote(self):
+        """(turma, vence_ate, descrição) escolhidos em Ações em Lote"""
+        turma = self.combo_turma_lote.get().strip() or None
+        rotulo = self.combo_vencimento_lote.get()
+        limite = VENCIMENTOS_LOTE[rotulo](date.today())
+        descricao = ", ".join(parte for parte in (
+            f"turma {turma}" if turma else "", rotulo.lower() if limite else "") if parte)
+        return turma, limite.isoformat() if limite else None, descricao
+
+    def _acao_por_filtro(self, verbo, executar):
+        """Confirma com a quantidade alcançada e executa a renovação/devolução por filtro"""
+        turma, vence_ate, descricao = self._filtro_lote()
+        if not turma and not vence_ate:
+            messagebox.showerror("Erro", "Escolha a turma ou o vencimento!")
+            return
+        try:
+            quantidade = consultas.contar_abertos(self.banco, turma, vence_ate)
+            if not quantidade:
+                messagebox.showinfo(verbo, f"Nenhum empréstimo aberto ({descricao}).")
+                return
+            if not messagebox.askyesno(verbo, f"{verbo} {quantidade} empréstimo(s) ({descricao})?"):
+                return
+            feitos = executar(turma=turma, vence_ate=vence_ate)
+            self._apos_gravar()
+            messagebox.showinfo("Sucesso", f"{verbo}: {feitos} empréstimo(s).")
+        except ErroServico as e:
+            messagebox.showerror("Erro", str(e))
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro na ação em lote: {e}")
+
+    def renovar_por_filtro(self):
+        """Renova todos os empréstimos abertos da turma/vencimento escolhidos"""
+        self._acao_por_filtro("Renovar", self.servico.renovar_por_filtro)
+
+    def devolver_por_filtro(self):
+        """Devolve todos os empréstimos abertos da turma/vencimento escolhidos"""
+        self._acao_por_filtro("Devolver", self.servico.devolver_por_filtro)
+
     # Adiciona o duplo clique no nome do aluno para renovar
     def bind_renovar_emprestimo(self):
         """Associa duplo clique na coluna 'Aluno' para renovar empréstimo"""
@@ -880,14 +1137,9 @@ class SistemaBiblioteca:
                 self.renovar_emprestimo()
         self.tree_emprestimos.bind("<Double-1>", on_double_click)
 
-    # Chame bind_renovar_emprestimo após criar a treeview de empréstimos
-
     # ---------------------- RELATÓRIOS ----------------------
-    def criar_aba_relatorios(self):
+    def criar_aba_relatorios(self, frame_relatorios):
         """Aba para relatórios e estatísticas"""
-        frame_relatorios = ttk.Frame(self.notebook)
-        self.notebook.add(frame_relatorios, text="📊 Relatórios")
-        
         # Frame para estatísticas rápidas
         stats_frame = tk.LabelFrame(frame_relatorios, text="Estatísticas Rápidas", 
                                    font=('Arial', 12, 'bold'), padx=10, pady=10)
@@ -910,70 +1162,200 @@ class SistemaBiblioteca:
         tk.Button(stats_frame, text="Atualizar Estatísticas", command=self.atualizar_estatisticas,
                  bg='#9b59b6', fg='white', font=('Arial', 10, 'bold')).grid(row=2, column=0, columnspan=2, pady=20)
         
-        # Atualizar estatísticas iniciais
+        # Atrasos por turma e série, em faixas de dias
+        atrasos_frame = tk.LabelFrame(frame_relatorios, text="Empréstimos Atrasados por Turma",
+                                      font=('Arial', 12, 'bold'), padx=10, pady=10)
+        atrasos_frame.pack(fill='both', expand=True, padx=10, pady=10)
+        topo = tk.Frame(atrasos_frame)
+        topo.pack(fill='x')
+        self.label_total_atrasados = tk.Label(topo, text="Total em atraso: 0", font=('Arial', 11))
+        self.label_total_atrasados.pack(side='left')
+        tk.Button(topo, text="Atualizar Atrasos", command=self.atualizar_atrasos,
+                  bg='#c0392b', fg='white', font=('Arial', 9)).pack(side='left', padx=10)
+        colunas = ['Turma', 'Série'] + [rotulo for rotulo, _, _ in consultas.FAIXAS_ATRASO] + ['Total']
+        self.tree_atrasos = ttk.Treeview(atrasos_frame, columns=colunas, show='headings', height=8)
+        for col in colunas:
+            self.tree_atrasos.heading(col, text=col)
+            self.tree_atrasos.column(col, width=140 if col == 'Série' else 90)
+        scroll_atrasos = ttk.Scrollbar(atrasos_frame, orient='vertical', command=self.tree_atrasos.yview)
+        self.tree_atrasos.configure(yscrollcommand=scroll_atrasos.set)
+        self.tree_atrasos.pack(side='left', fill='both', expand=True, pady=(5, 0))
+        scroll_atrasos.pack(side='right', fill='y', pady=(5, 0))
+
+        # Circulação por período, lida das tabelas de resumo (ver consultas.py)
+        circulacao_frame = tk.LabelFrame(frame_relatorios, text="Circulação",
+                                         font=('Arial', 12, 'bold'), padx=10, pady=10)
+        circulacao_frame.pack(fill='both', expand=True, padx=10, pady=10)
+        topo = tk.Frame(circulacao_frame)
+        topo.pack(fill='x')
+        self.combo_visao_circulacao = ttk.Combobox(topo, values=list(VISOES_CIRCULACAO),
+                                                   state='readonly', width=24)
+        self.combo_visao_circulacao.current(0)
+        self.combo_visao_circulacao.pack(side='left')
+        self.combo_periodo_circulacao = ttk.Combobox(topo, values=list(PERIODOS_CIRCULACAO),
+                                                     state='readonly', width=18)
+        self.combo_periodo_circulacao.current(0)
+        self.combo_periodo_circulacao.pack(side='left', padx=10)
+        for combo in (self.combo_visao_circulacao, self.combo_periodo_circulacao):
+            combo.bind('<<ComboboxSelected>>', lambda e: self.atualizar_grafico_circulacao())
+        tk.Button(topo, text="Atualizar Gráfico", command=self.atualizar_grafico_circulacao,
+                  bg='#2980b9', fg='white', font=('Arial', 9)).pack(side='left')
+        canvas = tk.Canvas(circulacao_frame, height=220, bg='white', highlightthickness=0)
+        canvas.pack(fill='both', expand=True, pady=(5, 0))
+        self.grafico_circulacao = GraficoBarras(canvas)
+
+        # Exportação completa (histórico, catálogo, alunos) para CSV/JSON
+        export_frame = tk.LabelFrame(frame_relatorios, text="Exportar Dados",
+                                     font=('Arial', 12, 'bold'), padx=10, pady=10)
+        export_frame.pack(fill='x', padx=10, pady=10)
+
+        self._tipos_exportacao = {desc: tipo for tipo, (desc, _, _) in exportacao.EXPORTACOES.items()}
+        tk.Label(export_frame, text="Dados:", font=('Arial', 10)).grid(row=0, column=0, sticky='w')
+        self.combo_exportacao = ttk.Combobox(export_frame, values=list(self._tipos_exportacao),
+                                             state='readonly', width=30)
+        self.combo_exportacao.current(0)
+        self.combo_exportacao.grid(row=0, column=1, padx=10, pady=5)
+        tk.Button(export_frame, text="Exportar...", command=self.exportar_dados,
+                  bg='#16a085', fg='white', font=('Arial', 10, 'bold')).grid(row=0, column=2, padx=5)
+        self.label_exportacao = tk.Label(export_frame, text="", font=('Arial', 10), fg='#7f8c8d')
+        self.label_exportacao.grid(row=1, column=0, columnspan=3, sticky='w', pady=5)
+        self._exportando = None  # threading.Event de cancelamento da exportação em andamento
+
+        # Atualizar estatísticas iniciais; depois, a cada mudança nas tabelas.
+        # Os atrasos mudam também com a data: atualizam ao abrir e pelo botão.
+        self._estatisticas_agendadas = None
         self.atualizar_estatisticas()
+        self.atualizar_atrasos()
+        self.atualizar_grafico_circulacao()
 
     def atualizar_estatisticas(self):
-        """Atualiza as estatísticas na aba de relatórios"""
+        """Atualiza as estatísticas na aba de relatórios (contadores mantidos por gatilhos)"""
+        self._estatisticas_agendadas = None
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            # Total de livros
-            cursor.execute('SELECT COUNT(*) FROM livros')
-            total_livros = cursor.fetchone()[0]
-            
-            # Total de alunos
-            cursor.execute('SELECT COUNT(*) FROM alunos')
-            total_alunos = cursor.fetchone()[0]
-            
-            # Empréstimos ativos
-            cursor.execute("SELECT COUNT(*) FROM emprestimos WHERE status = 'Emprestado'")
-            emprestimos_ativos = cursor.fetchone()[0]
-            
-            # Livros disponíveis
-            cursor.execute('SELECT SUM(disponivel) FROM livros')
-            livros_disponiveis = cursor.fetchone()[0] or 0
-            
-            conn.close()
-            
-            # Atualizar labels
-            self.label_total_livros.config(text=f"Total de Livros: {total_livros}")
-            self.label_total_alunos.config(text=f"Total de Alunos: {total_alunos}")
-            self.label_emprestimos_ativos.config(text=f"Empréstimos Ativos: {emprestimos_ativos}")
-            self.label_livros_disponiveis.config(text=f"Livros Disponíveis: {livros_disponiveis}")
-            
+            valores = consultas.estatisticas(self.banco)
+            self.label_total_livros.config(text=f"Total de Livros: {valores.get('total_livros', 0)}")
+            self.label_total_alunos.config(text=f"Total de Alunos: {valores.get('total_alunos', 0)}")
+            self.label_emprestimos_ativos.config(
+                text=f"Empréstimos Ativos: {valores.get('emprestimos_ativos', 0)}")
+            self.label_livros_disponiveis.config(
+                text=f"Livros Disponíveis: {valores.get('livros_disponiveis', 0)}")
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao atualizar estatísticas: {e}")
 
+    def atualizar_atrasos(self):
+        """Preenche o relatório de atrasos por turma/série e o total em atraso"""
+        try:
+            linhas = consultas.atrasos_por_turma(self.banco)
+            self.tree_atrasos.delete(*self.tree_atrasos.get_children())
+            for linha in linhas:
+                self.tree_atrasos.insert('', 'end', values=linha)
+            if linhas:
+                totais = [sum(coluna) for coluna in list(zip(*linhas))[2:]]
+                self.tree_atrasos.insert('', 'end', values=['Total', ''] + totais)
+            self.label_total_atrasados.config(
+                text=f"Total em atraso: {sum(linha[-1] for linha in linhas)}")
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao carregar atrasos: {e}")
+
+    def atualizar_grafico_circulacao(self):
+        """Desenha a visão e o período escolhidos a partir dos resumos de circulação"""
+        hoje = date.today()
+        desde = PERIODOS_CIRCULACAO[self.combo_periodo_circulacao.get()](hoje)
+        desde = desde and desde.isoformat()
+        visao = VISOES_CIRCULACAO[self.combo_visao_circulacao.get()]
+        try:
+            if visao == 'mes':
+                linhas = consultas.circulacao_por_mes(self.banco, desde, hoje.isoformat())
+                self.grafico_circulacao.mostrar(
+                    [f"{mes[5:]}/{mes[2:4]}" for mes, _, _ in linhas],
+                    [[l[1] for l in linhas], [l[2] for l in linhas]],
+                    nomes=("Empréstimos", "Devoluções"))
+            elif visao == 'livros':
+                linhas = consultas.livros_mais_emprestados(self.banco, desde, hoje.isoformat())
+                self.grafico_circulacao.mostrar(
+                    [titulo for _, titulo, _, _ in linhas], [[l[3] for l in linhas]],
+                    horizontal=True)
+            else:
+                linhas = consultas.circulacao_por_grupo(self.banco, visao, desde, hoje.isoformat())
+                linhas = linhas[:MAX_BARRAS_GRUPO]
+                self.grafico_circulacao.mostrar(
+                    [grupo or '(sem)' for grupo, _, _ in linhas],
+                    [[l[1] for l in linhas], [l[2] for l in linhas]],
+                    nomes=("Empréstimos", "Devoluções"), horizontal=True)
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao carregar circulação: {e}")
+
+    def _agendar_estatisticas(self, acao=None, ids=None):
+        """Atualiza os contadores uma vez depois de uma rajada de mudanças"""
+        if self._aba_pronta('relatorios') and self._estatisticas_agendadas is None:
+            self._estatisticas_agendadas = self.root.after_idle(self.atualizar_estatisticas)
+
+    def exportar_dados(self):
+        """Exporta os dados escolhidos em segundo plano, lendo o banco em lotes"""
+        if self.remoto:
+            messagebox.showerror("Erro", "A exportação deve ser feita no computador do servidor "
+                                         "(python exportacao.py).")
+            return
+        if self._exportando is not None:
+            if messagebox.askyesno("Exportação", "Há uma exportação em andamento. Cancelar?"):
+                self._exportando.set()
+            return
+        tipo = self._tipos_exportacao[self.combo_exportacao.get()]
+        caminho = filedialog.asksaveasfilename(
+            title="Exportar", initialfile=f"{tipo}_{datetime.now():%Y%m%d}.csv",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("CSV compactado", "*.csv.gz"),
+                       ("JSON", "*.json"), ("JSON compactado", "*.json.gz")])
+        if not caminho:
+            return
+        cancelar = self._exportando = threading.Event()
+        self.label_exportacao.config(text="Exportando...")
+
+        def mostrar_progresso(total):
+            if self._exportando is cancelar:
+                self.label_exportacao.config(text=f"Exportando... {total} linhas")
+
+        def concluir(total, erro):
+            self._exportando = None
+            if erro is None:
+                self.label_exportacao.config(text=f"{total} linhas exportadas para {caminho}")
+            elif isinstance(erro, exportacao.ExportacaoCancelada):
+                self.label_exportacao.config(text="Exportação cancelada")
+            else:
+                self.label_exportacao.config(text="")
+                messagebox.showerror("Erro", f"Erro ao exportar: {erro}")
+
+        def trabalhar():
+            total = erro = None
+            try:
+                total = exportacao.exportar(
+                    self.banco, tipo, caminho, cancelado=cancelar.is_set,
+                    progresso=lambda n: self.root.after(0, mostrar_progresso, n))
+            except Exception as e:
+                erro = e
+            finally:
+                self.banco.liberar()
+            self.root.after(0, concluir, total, erro)
+
+        threading.Thread(target=trabalhar, daemon=True).start()
+
     # ---------------------- NOTIFICAÇÕES ----------------------
     def check_due_today(self):
-        """Verifica empréstimos com devolução prevista para hoje e mostra notificação."""
+        """Verifica empréstimos com devolução prevista para hoje e mostra notificação.
+
+        Chamada pela AgendaDevolucoes apenas quando há vencimento hoje.
+        """
         try:
             hoje = datetime.now().date()
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT e.id, a.nome, a.matricula, l.titulo, e.data_devolucao_prevista
-                FROM emprestimos e
-                JOIN alunos a ON e.aluno_id = a.id
-                JOIN livros l ON e.livro_id = l.id
-                WHERE e.status = 'Emprestado' AND e.data_devolucao_prevista = ?
-            ''', (hoje.strftime('%Y-%m-%d'),))
-            rows = cursor.fetchall()
-            conn.close()
+            rows = consultas.devolucoes_do_dia(self.banco, hoje.strftime('%Y-%m-%d'))
 
             if rows:
                 # evitar notificar repetidamente no mesmo dia
                 if self.ultimo_aviso_data != hoje:
                     self.ultimo_aviso_data = hoje
                     self.mostrar_notificacao_devolucoes(rows)
-            # Reagendar verificação em 60 segundos (60000 ms)
         except Exception:
-            pass
-        finally:
-            # agenda próxima verificação
-            self.root.after(60000, self.check_due_today)
+            log.exception("Erro ao verificar devoluções do dia")
 
     def mostrar_notificacao_devolucoes(self, rows):
         """Mostra uma janela topmost listando devoluções previstas para hoje."""
@@ -994,12 +1376,165 @@ class SistemaBiblioteca:
         btn = tk.Button(win, text="OK", command=win.destroy, bg='#27ae60', fg='white')
         btn.pack(pady=8)
 
+    # ---------------------- IMPORTAÇÃO ----------------------
+    def importar_planilha(self, tipo):
+        """Importa livros ou alunos de um CSV/XLSX em segundo plano, com progresso"""
+        if self.remoto:
+            messagebox.showerror("Erro", "A importação deve ser feita no computador do servidor "
+                                         "(python importacao.py).")
+            return
+        caminho = filedialog.askopenfilename(
+            title=f"Importar {tipo}",
+            filetypes=[("Planilhas", "*.csv *.xlsx"), ("CSV", "*.csv"), ("Excel", "*.xlsx")])
+        if not caminho:
+            return
+        relatorio = importacao.caminho_relatorio_erros(caminho)
+
+        win = tk.Toplevel(self.root)
+        win.title("Importação")
+        win.geometry("360x110")
+        win.transient(self.root)
+        win.grab_set()
+        win.protocol("WM_DELETE_WINDOW", lambda: None)  # só fecha ao terminar
+        tk.Label(win, text=f"Importando {os.path.basename(caminho)}...",
+                 font=('Arial', 10, 'bold')).pack(pady=(15, 5))
+        progresso = tk.Label(win, text="Lendo planilha...")
+        progresso.pack()
+
+        def mostrar_progresso(r):
+            progresso.config(text=f"{r.processadas} linhas lidas, {r.importadas} importadas, "
+                                  f"{r.total_erros} com erro")
+
+        def concluir(resultado, erro):
+            win.destroy()
+            if erro is not None:
+                if isinstance(erro, importacao.ErroImportacao):
+                    messagebox.showerror("Erro", str(erro))
+                else:
+                    messagebox.showerror("Erro", f"Erro ao importar planilha: {erro}")
+            # A importação não avisa linha a linha: recarrega as listas abertas uma vez
+            if tipo == 'livros':
+                self.carregar_livros()
+                self._sincronizar_indice_titulos()
+            else:
+                self.referencia.limpar()
+                if self._aba_pronta('alunos'):
+                    self.carregar_alunos()
+                if self._aba_pronta('emprestimos'):
+                    self.atualizar_combos_emprestimo()
+            self._agendar_estatisticas()
+            self.versao_dados = self.banco.versao_dados()
+            if erro is not None:
+                return
+            mensagem = f"{resultado.importadas} de {resultado.processadas} linhas importadas."
+            if resultado.total_erros:
+                mensagem += (f"\n{resultado.total_erros} linhas com erro, "
+                             f"detalhadas em:\n{relatorio}")
+                messagebox.showwarning("Importação concluída", mensagem)
+            else:
+                messagebox.showinfo("Importação concluída", mensagem)
+
+        def trabalhar():
+            resultado = erro = None
+            try:
+                resultado = importacao.importar(
+                    self.banco, tipo, caminho,
+                    progresso=lambda r: self.root.after(0, mostrar_progresso, r),
+                    relatorio_erros=relatorio)
+            except Exception as e:
+                erro = e
+            finally:
+                self.banco.liberar()
+            self.root.after(0, concluir, resultado, erro)
+
+        threading.Thread(target=trabalhar, daemon=True).start()
+
+    # ---------------------- ALTERAÇÕES DE OUTROS BALCÕES ----------------------
+    def verificar_alteracoes_externas(self, reagendar=True):
+        """Recarrega as listas se outra conexão gravou no banco desde a última checagem"""
+        try:
+            versao = self.banco.versao_dados()
+            if versao != self.versao_dados:
+                self.versao_dados = versao
+                self.referencia.limpar()
+                self._sincronizar_indice_titulos()
+                self.agenda_devolucoes.recarregar()
+                if self._aba_pronta('livros'):
+                    if self.entry_busca_autor.get().strip():
+                        self.buscar_por_autor(imediato=True)
+                    else:
+                        self.lista_livros.recarregar()
+                if self._aba_pronta('alunos'):
+                    self.lista_alunos.recarregar()
+                if self._aba_pronta('emprestimos'):
+                    self.lista_emprestimos.recarregar()
+                    self.atualizar_combos_emprestimo()
+                self._agendar_estatisticas()
+                if self._aba_pronta('estudante') and self.selected_turma.get():
+                    self.carregar_estudantes_turma()
+        except Exception:
+            log.exception("Erro ao conferir alterações de outros balcões")
+        finally:
+            if reagendar:
+                self.root.after(INTERVALO_VERIFICACAO_EXTERNA, self.verificar_alteracoes_externas)
+
+    def _apos_gravar(self):
+        """No modo servidor não há avisos por linha: confere a versão logo após gravar"""
+        if self.remoto:
+            self.verificar_alteracoes_externas(reagendar=False)
+
+    # ---------------------- DIAGNÓSTICO ----------------------
+    def mostrar_diagnostico(self):
+        """Janela com as métricas de SQL, handlers e erros recentes (Ctrl+Shift+D)"""
+        win = tk.Toplevel(self.root)
+        win.title("Diagnóstico")
+        win.geometry("900x600")
+        txt = tk.Text(win, wrap='none', font=('Courier', 9))
+        txt.pack(fill='both', expand=True, padx=10, pady=(10, 0))
+
+        def atualizar():
+            txt.config(state='normal')
+            txt.delete('1.0', tk.END)
+            txt.insert('1.0', self.diagnostico.texto())
+            if self.indice_titulos is not None and self.indice_titulos.pronto:
+                memoria = self.indice_titulos.memoria()
+                partes = ', '.join(f"{parte} {tamanho / 1024:.0f}" for parte, tamanho in memoria.items())
+                txt.insert(tk.END, f"\n\n== Índice de títulos ==\n{len(self.indice_titulos)} títulos, "
+                                   f"{sum(memoria.values()) / 1024:.0f} KiB ({partes})")
+            txt.config(state='disabled')
+
+        tk.Button(win, text="Atualizar", command=atualizar,
+                  bg='#34495e', fg='white').pack(pady=8)
+        atualizar()
+
     # ---------------------- EXECUTAR ----------------------
     def executar(self):
         """Inicia a aplicação"""
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            if self._aba_pronta('livros'):
+                self.busca_autor.parar()
+            if self._aba_pronta('emprestimos'):
+                self.sugestoes_livro.parar()
+                self.seletor_aluno.parar()
+            self.banco.fechar()
+            if self.diagnostico is not None:
+                print(self.diagnostico.texto())
 
 # Executar o sistema
+# python biblioteca2.py                  -> usa o banco local (DB_PATH)
+# python biblioteca2.py --servidor URL   -> usa o servidor.py de outro computador
+# python biblioteca2.py --diagnostico    -> mede SQL e handlers (Ctrl+Shift+D, relatório ao sair)
+# python biblioteca2.py --sem-indice     -> autocomplete de livros só pelo FTS, sem títulos em memória
 if __name__ == "__main__":
-    sistema = SistemaBiblioteca()
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    servidor = os.environ.get("BIBLIOTECA_SERVIDOR")
+    if "--servidor" in sys.argv[1:-1]:
+        servidor = sys.argv[sys.argv.index("--servidor") + 1]
+    diagnostico = None
+    if "--diagnostico" in sys.argv[1:] or os.environ.get("BIBLIOTECA_DIAGNOSTICO"):
+        diagnostico = Diagnostico(os.path.join(os.path.dirname(DB_PATH), "consultas_lentas.log"))
+    indice = not ("--sem-indice" in sys.argv[1:] or os.environ.get("BIBLIOTECA_SEM_INDICE"))
+    sistema = SistemaBiblioteca(servidor, diagnostico, indice)
     sistema.executar()
@@ -0,0 +1,172 @@
+# busca.py
+"""Busca no catálogo de livros usando o índice FTS5 (livros_busca)."""
+import re
+import sqlite3
+import threading
+
+# Limite padrão de resultados para as buscas feitas enquanto o usuário digita
+LIMITE_SUGESTOES = 20
+LIMITE_BUSCA = 500
+
+# Peso de cada coluna no bm25 (titulo, autor, categoria, isbn)
+PESOS_BM25 = (10.0, 5.0, 1.0, 2.0)
+
+# Abaixo deste total de letras (ex.: "a", "ro") quase todo o catálogo casa e
+# calcular o bm25 de cada linha custaria mais que a busca; devolvemos os
+# primeiros resultados na ordem do índice.
+MIN_CARACTERES_RANKING = 3
+
+_PALAVRA = re.compile(r"\w+", re.UNICODE)
+
+
+def expressao_fts(texto, coluna=None):
+    """Converte o texto digitado em uma expressão MATCH do FTS5.
+
+    Cada palavra vira um prefixo ("dom casm" -> "dom"* AND "casm"*), o que
+    também neutraliza aspas e operadores digitados pelo usuário. Retorna ""
+    quando não há nenhuma palavra pesquisável.
+    """
+    termos = [f'"{p}"*' for p in _PALAVRA.findall(texto)]
+    if not termos:
+        return ""
+    expressao = " AND ".join(termos)
+    if coluna:
+        return f"{{{coluna}}} : ({expressao})"
+    return expressao
+
+
+def buscar_livros(banco, texto, coluna=None, somente_disponiveis=True,
+                  limite=LIMITE_BUSCA, campos="l.*"):
+    """Retorna os livros que casam com o texto, do mais ao menos relevante"""
+    expressao = expressao_fts(texto, coluna)
+    if not expressao:
+        return []
+    filtro = "AND l.disponivel > 0" if somente_disponiveis else ""
+    ordem = ""
+    if len("".join(_PALAVRA.findall(texto))) >= MIN_CARACTERES_RANKING:
+        ordem = f"ORDER BY bm25(livros_busca, {', '.join(map(str, PESOS_BM25))})"
+    return banco.consultar(f'''
+        SELECT {campos}
+        FROM livros_busca f
+        JOIN livros l ON l.id = f.rowid
+        WHERE livros_busca MATCH ? {filtro}
+        {ordem}
+        LIMIT ?
+    ''', (expressao, limite))
+
+
+def sugerir_titulos(banco, texto, limite=LIMITE_SUGESTOES):
+    """Sugestões (id, titulo, autor) de livros disponíveis para o autocomplete"""
+    return buscar_livros(banco, texto, coluna="titulo", limite=limite,
+                         campos="l.id, l.titulo, l.autor")
+
+
+def buscar_por_autor(banco, texto, limite=LIMITE_BUSCA):
+    """Livros disponíveis cujo autor casa com o texto"""
+    return buscar_livros(banco, texto, coluna="autor", limite=limite)
+
+
+class BuscaAoDigitar:
+    """Executa uma busca fora da thread da interface enquanto o usuário digita.
+
+    Cada tecla apenas reagenda a busca (debounce); quando o usuário para de
+    digitar por `atraso_ms`, o texto é enviado a uma thread de trabalho. Se uma
+    consulta ainda estiver rodando para um texto antigo ela é interrompida
+    (sqlite3.Connection.interrupt) e só o resultado do texto mais recente é
+    entregue a `ao_concluir(texto, linhas)`, sempre via root.after.
+    """
+
+    def __init__(self, root, banco, consulta, ao_concluir, ao_erro=None, atraso_ms=250):
+        self.root = root
+        self.banco = banco
+        self.consulta = consulta
+        self.ao_concluir = ao_concluir
+        self.ao_erro = ao_erro
+        self.atraso_ms = atraso_ms
+        self._agendado = None
+        self._geracao = 0
+        self._pendente = None
+        self._conn_trabalho = None
+        self._ativo = True
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._trabalhar, daemon=True)
+        self._thread.start()
+
+    def agendar(self, texto, imediato=False):
+        """Pede uma busca por `texto`; chamadas seguidas substituem as anteriores"""
+        if self._agendado is not None:
+            self.root.after_cancel(self._agendado)
+        self._agendado = self.root.after(0 if imediato else self.atraso_ms, self._disparar, texto)
+
+    def cancelar(self):
+        """Descarta buscas agendadas ou em andamento"""
+        if self._agendado is not None:
+            self.root.after_cancel(self._agendado)
+            self._agendado = None
+        with self._cond:
+            self._geracao += 1
+            self._pendente = None
+            self._interromper()
+
+    def parar(self):
+        """Encerra a thread de trabalho (pode ser chamado após destruir a janela)"""
+        with self._cond:
+            self._geracao += 1
+            self._pendente = None
+            self._ativo = False
+            self._interromper()
+            self._cond.notify()
+
+    def _interromper(self):
+        # Chamado com self._cond adquirido
+        if self._conn_trabalho is not None:
+            self._conn_trabalho.interrupt()
+
+    def _disparar(self, texto):
+        self._agendado = None
+        with self._cond:
+            self._geracao += 1
+            self._pendente = (self._geracao, texto)
+            self._interromper()
+            self._cond.notify()
+
+    def _trabalhar(self):
+        while True:
+            with self._cond:
+                while self._ativo and self._pendente is None:
+                    self._cond.wait()
+                if not self._ativo:
+                    return
+                geracao, texto = self._pendente
+                self._pendente = None
+                self._conn_trabalho = self.banco.conexao()
+            try:
+                linhas = self.consulta(self.banco, texto)
+                erro = None
+            except sqlite3.OperationalError as e:
+                if "interrupt" in str(e):
+                    # Substituída por um texto mais novo
+                    linhas, erro = None, None
+                else:
+                    linhas, erro = None, e
+            except Exception as e:
+                linhas, erro = None, e
+            with self._cond:
+                self._conn_trabalho = None
+                atual = geracao == self._geracao and self._ativo
+            if not atual:
+                continue
+            try:
+                if erro is not None:
+                    if self.ao_erro is not None:
+                        self.root.after(0, self.ao_erro, texto, erro)
+                elif linhas is not None:
+                    self.root.after(0, self._entregar, geracao, texto, linhas)
+            except RuntimeError:
+                # Interface já foi destruída
+                return
+
+    def _entregar(self, geracao, texto, linhas):
+        # Na thread da interface: confere de novo, pode ter chegado tecla nova
+        if geracao == self._geracao:
+            self.ao_concluir(texto, linhas)
@@ -0,0 +1,140 @@
+# circulacao.py
+"""Circulação em lote pelo leitor de código de barras (turma inteira no balcão).
+
+Cada leitura é identificada por uma busca indexada: matrícula do aluno
+(UNIQUE), ISBN do livro (UNIQUE) ou, para etiquetas só com número, o id do
+livro. O lote guarda os itens lidos em memória; nada é gravado até
+confirmar(), que manda tudo ao serviço em uma única transação.
+
+Empréstimo: lê a matrícula do aluno e em seguida os livros dele; a próxima
+matrícula troca o aluno. Devolução: basta ler os livros; com uma matrícula
+lida antes, a devolução é procurada entre os empréstimos desse aluno.
+"""
+from servico import ErroServico
+
+EMPRESTIMO = 'emprestimo'
+DEVOLUCAO = 'devolucao'
+
+
+def identificar(banco, codigo):
+    """('aluno', id, nome, matricula), ('livro', id, titulo, disponivel) ou None"""
+    codigo = codigo.strip()
+    if not codigo:
+        return None
+    aluno = banco.consultar_um('SELECT id, nome, matricula FROM alunos WHERE matricula = ?', (codigo,))
+    if aluno:
+        return ('aluno',) + tuple(aluno)
+    livro = banco.consultar_um('SELECT id, titulo, disponivel FROM livros WHERE isbn = ?', (codigo,))
+    if livro is None and codigo.isdigit():
+        livro = banco.consultar_um('SELECT id, titulo, disponivel FROM livros WHERE id = ?', (int(codigo),))
+    if livro:
+        return ('livro',) + tuple(livro)
+    return None
+
+
+def emprestimo_aberto(banco, livro_id, aluno_id=None, ignorar=()):
+    """(id, nome do aluno) do empréstimo aberto mais antigo do livro, fora os
+    ids em `ignorar` (busca por idx_emprestimos_livro_status)"""
+    filtro, params = '', [livro_id]
+    if aluno_id is not None:
+        filtro += ' AND e.aluno_id = ?'
+        params.append(aluno_id)
+    if ignorar:
+        filtro += f" AND e.id NOT IN ({', '.join('?' * len(ignorar))})"
+        params.extend(ignorar)
+    return banco.consultar_um(f'''
+        SELECT e.id, a.nome FROM emprestimos e
+        JOIN alunos a ON a.id = e.aluno_id
+        WHERE e.livro_id = ? AND e.status = 'Emprestado'{filtro}
+        ORDER BY e.data_emprestimo, e.id
+        LIMIT 1
+    ''', params)
+
+
+class ItemLote:
+    """Um livro lido: o que será gravado e como aparece na lista"""
+
+    def __init__(self, codigo, livro_id, titulo, aluno_id, aluno, emprestimo_id=None):
+        self.codigo = codigo
+        self.livro_id = livro_id
+        self.titulo = titulo
+        self.aluno_id = aluno_id
+        self.aluno = aluno
+        self.emprestimo_id = emprestimo_id
+        self.situacao = 'Pendente'
+
+
+class LoteCirculacao:
+    """Leituras de um lote de empréstimos ou devoluções, ainda não gravadas"""
+
+    def __init__(self, banco, modo=EMPRESTIMO):
+        self.banco = banco
+        self.modo = modo
+        self.limpar()
+
+    def limpar(self):
+        self.itens = []
+        self.aluno = None  # (id, nome, matricula) da última matrícula lida
+
+    def ler(self, codigo):
+        """Processa uma leitura e retorna (item novo ou None, mensagem).
+
+        Leituras recusadas (código desconhecido, sem exemplar) lançam ErroServico.
+        """
+        codigo = codigo.strip()
+        achado = identificar(self.banco, codigo)
+        if achado is None:
+            raise ErroServico(f"Código não encontrado: {codigo}")
+        if achado[0] == 'aluno':
+            self.aluno = achado[1:]
+            return None, f"Aluno: {self.aluno[1]} ({self.aluno[2]})"
+        _, livro_id, titulo, disponivel = achado
+        if self.modo == EMPRESTIMO:
+            return self._ler_emprestimo(codigo, livro_id, titulo, disponivel)
+        return self._ler_devolucao(codigo, livro_id, titulo)
+
+    def _ler_emprestimo(self, codigo, livro_id, titulo, disponivel):
+        if self.aluno is None:
+            raise ErroServico("Leia a matrícula do aluno antes dos livros")
+        # Exemplares já reservados neste lote ainda não saíram do banco
+        no_lote = sum(1 for item in self.itens
+                      if item.livro_id == livro_id and item.situacao == 'Pendente')
+        if (disponivel or 0) - no_lote <= 0:
+            raise ErroServico(f"Sem exemplar disponível: {titulo}")
+        item = ItemLote(codigo, livro_id, titulo, self.aluno[0], self.aluno[1])
+        self.itens.append(item)
+        return item, f"{titulo} -> {self.aluno[1]}"
+
+    def _ler_devolucao(self, codigo, livro_id, titulo):
+        aluno_id = self.aluno[0] if self.aluno else None
+        # Mais de um exemplar emprestado: cada leitura baixa o próximo empréstimo aberto
+        lidos = [item.emprestimo_id for item in self.itens if item.livro_id == livro_id]
+        aberto = emprestimo_aberto(self.banco, livro_id, aluno_id, lidos)
+        if aberto is None:
+            raise ErroServico(f"Nenhum empréstimo aberto de: {titulo}")
+        item = ItemLote(codigo, livro_id, titulo, aluno_id, aberto[1], emprestimo_id=aberto[0])
+        self.itens.append(item)
+        return item, f"Devolução: {titulo} ({aberto[1]})"
+
+    def remover(self, item):
+        self.itens.remove(item)
+
+    def confirmar(self, servico, dias):
+        """Grava os itens pendentes em uma transação e marca a situação de cada um.
+
+        Retorna quantos foram gravados. Os recusados (exemplar que outro
+        balcão levou, empréstimo já devolvido) ficam com o motivo na situação.
+        """
+        pendentes = [item for item in self.itens if item.situacao == 'Pendente']
+        if not pendentes:
+            return 0
+        if self.modo == EMPRESTIMO:
+            resultados, _ = servico.emprestar_lote(
+                itens=[[item.livro_id, item.aluno_id] for item in pendentes], dias=dias)
+        else:
+            resultados = servico.devolver_lote(emprestimo_ids=[item.emprestimo_id for item in pendentes])
+        gravados = 0
+        for item, (_, erro) in zip(pendentes, resultados):
+            item.situacao = erro or 'OK'
+            gravados += erro is None
+        return gravados
@@ -0,0 +1,99 @@
+# cliente.py
+"""Acesso ao servidor da biblioteca (servidor.py) com a mesma interface do modo local.
+
+BancoRemoto substitui o Banco nas leituras da interface e ServicoRemoto
+substitui o ServicoBiblioteca nas gravações, então a tela funciona igual
+nos dois modos.
+"""
+import json
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+
+from servico import ErroServico, ServicoBiblioteca
+
+# Segundos de espera por uma resposta do servidor
+TIMEOUT = 10
+
+
+def _chamar(url, rota, dados=None):
+    """GET (sem dados) ou POST JSON em url/api/rota; retorna o JSON da resposta"""
+    corpo = None if dados is None else json.dumps(dados).encode('utf-8')
+    requisicao = urllib.request.Request(
+        f"{url.rstrip('/')}/api/{rota}", data=corpo,
+        headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(requisicao, timeout=TIMEOUT) as resposta:
+            return json.loads(resposta.read())
+    except urllib.error.HTTPError as e:
+        try:
+            mensagem = json.loads(e.read()).get('erro', str(e))
+        except ValueError:
+            mensagem = str(e)
+        raise ErroServico(mensagem)
+    except (urllib.error.URLError, OSError) as e:
+        raise ErroServico(f"Servidor da biblioteca indisponível ({url}): {e}")
+
+
+class _SemConexao:
+    """Requisições HTTP não são interrompidas; respostas antigas são descartadas"""
+
+    def interrupt(self):
+        pass
+
+
+class BancoRemoto:
+    """Leituras do Banco feitas pelo servidor (somente consultas)"""
+
+    def __init__(self, url):
+        self.url = url
+
+    def consultar(self, sql, params=()):
+        linhas = _chamar(self.url, 'consulta', {'sql': sql, 'params': list(params)})['linhas']
+        return [tuple(linha) for linha in linhas]
+
+    def consultar_um(self, sql, params=()):
+        linhas = _chamar(self.url, 'consulta', {'sql': sql, 'params': list(params), 'um': True})['linhas']
+        return tuple(linhas[0]) if linhas else None
+
+    def versao_dados(self):
+        return _chamar(self.url, 'versao')['versao']
+
+    def conexao(self):
+        return _SemConexao()
+
+    # O servidor aplica as migrações e não envia avisos por linha
+    def migrar(self):
+        pass
+
+    def ativar_notificacoes(self):
+        pass
+
+    def inscrever(self, tabela, callback):
+        pass
+
+    @contextmanager
+    def silenciar(self):
+        yield
+
+    def liberar(self):
+        pass
+
+    def fechar(self):
+        pass
+
+
+class ServicoRemoto:
+    """Mesmos métodos do ServicoBiblioteca, executados no servidor"""
+
+    def __init__(self, url):
+        self.url = url
+
+    def __getattr__(self, nome):
+        if nome not in ServicoBiblioteca.LEITURAS + ServicoBiblioteca.GRAVACOES:
+            raise AttributeError(nome)
+
+        def chamar(**kwargs):
+            return _chamar(self.url, nome, kwargs)['resultado']
+        chamar.__name__ = nome
+        return chamar
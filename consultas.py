@@ -0,0 +1,361 @@
+# consultas.py
+"""Consultas de leitura usadas pelas abas, independentes da interface Tk."""
+import json
+from datetime import date, timedelta
+
+# Máximo de alunos sugeridos enquanto o nome é digitado
+LIMITE_SUGESTOES_ALUNOS = 20
+
+# Livros no ranking dos mais emprestados
+LIMITE_MAIS_EMPRESTADOS = 10
+# Acima de tantos livros candidatos o ranking soma todos os livros do período
+MAX_CANDIDATOS_RANKING = 5000
+
+# Agrupamentos da circulação por período: nome -> (tabela de resumo, coluna)
+GRUPOS_CIRCULACAO = {
+    'categoria': ('resumo_dia_categoria', 'categoria'),
+    'turma': ('resumo_dia_turma', 'turma'),
+    'serie': ('resumo_dia_turma', 'serie'),
+}
+
+# Definições das listas paginadas (argumentos de ListaPaginada), compartilhadas
+# entre as abas e o benchmark
+LISTA_LIVROS = dict(
+    campos='id, titulo, autor, isbn, categoria, quantidade, disponivel',
+    origem='livros',
+    ordens={'ID': ('id',), 'Título': ('titulo', 'id'), 'Autor': ('autor', 'id')},
+    ordem_inicial='Título',
+)
+
+LISTA_ALUNOS = dict(
+    campos='id, nome, matricula, serie, turma, telefone, email',
+    origem='alunos',
+    ordens={'ID': ('id',), 'Nome': ('nome', 'id'), 'Matrícula': ('matricula',)},
+    ordem_inicial='Nome',
+)
+
+# Status exibido: 'ATRASADO' calculado no SQL para os abertos com prazo vencido
+STATUS_EMPRESTIMO = '''CASE WHEN e.status = 'Emprestado'
+                             AND e.data_devolucao_prevista < date('now', 'localtime')
+                       THEN 'ATRASADO' ELSE e.status END'''
+
+
+def filtro_turma_alunos(turma=None):
+    """Condição da lista de alunos filtrada pela turma (idx_alunos_turma_nome)"""
+    if turma:
+        return 'turma = ?', (turma,)
+    return None, ()
+
+
+def filtro_emprestimos(somente_atrasados=False):
+    """Condição da lista de empréstimos ativos (usa idx_emprestimos_status_prevista_aluno)"""
+    if somente_atrasados:
+        return ("e.status = 'Emprestado' AND e.data_devolucao_prevista < date('now', 'localtime')", ())
+    return "e.status = 'Emprestado'", ()
+
+
+LISTA_EMPRESTIMOS = dict(
+    campos=f'''e.id, l.titulo, a.nome, e.data_emprestimo,
+               e.data_devolucao_prevista, {STATUS_EMPRESTIMO}''',
+    origem='''emprestimos e
+              JOIN livros l ON e.livro_id = l.id
+              JOIN alunos a ON e.aluno_id = a.id''',
+    ordens={'Data Emp.': ('e.data_emprestimo', 'e.id'),
+            'Prev. Dev.': ('e.data_devolucao_prevista', 'e.id')},
+    ordem_inicial='Data Emp.', descendente=True,
+    filtro=filtro_emprestimos,
+    coluna_id='e.id',
+)
+
+
+def filtro_abertos(emprestimo_ids=None, turma=None, vence_ate=None):
+    """Condição (sem alias de tabela) dos empréstimos abertos escolhidos para
+    uma ação em lote: os ids marcados e/ou os da turma com vencimento até a
+    data (AAAA-MM-DD). A turma é resolvida por idx_alunos_turma_nome e os
+    empréstimos de cada aluno por idx_emprestimos_aluno_status."""
+    condicoes, params = ["status = 'Emprestado'"], []
+    if emprestimo_ids is not None:
+        condicoes.append(f"id IN ({', '.join('?' * len(emprestimo_ids))})")
+        params.extend(emprestimo_ids)
+    if turma:
+        condicoes.append("aluno_id IN (SELECT id FROM alunos WHERE turma = ?)")
+        params.append(turma)
+    if vence_ate:
+        condicoes.append("data_devolucao_prevista <= ?")
+        params.append(vence_ate)
+    return ' AND '.join(condicoes), params
+
+
+def contar_abertos(banco, turma=None, vence_ate=None):
+    """Quantos empréstimos abertos uma ação em lote por filtro alcançaria"""
+    condicao, params = filtro_abertos(turma=turma, vence_ate=vence_ate)
+    return banco.consultar_um(f'SELECT COUNT(*) FROM emprestimos WHERE {condicao}', params)[0]
+
+
+# Faixas do relatório de atrasos: (rótulo, dias mínimos, dias máximos ou None)
+FAIXAS_ATRASO = (('1–7 dias', 1, 7), ('8–30 dias', 8, 30), ('> 30 dias', 31, None))
+
+
+def estudantes_da_turma(banco, turma, aluno_ids=None):
+    """Alunos da turma com os títulos emprestados a cada um, em uma única consulta.
+
+    Retorna (id, nome, matricula, serie, telefone, email, livros), onde livros
+    é a lista de títulos separada por vírgula ou 'Nenhum'. Com aluno_ids,
+    retorna só esses alunos (se forem da turma).
+    """
+    filtro, params = '', [turma]
+    if aluno_ids is not None:
+        filtro = f"AND a.id IN ({', '.join('?' * len(aluno_ids))})"
+        params.extend(aluno_ids)
+    return banco.consultar(f'''
+        SELECT a.id, a.nome, a.matricula, a.serie, a.telefone, a.email,
+               COALESCE(group_concat(l.titulo, ', '), 'Nenhum')
+        FROM alunos a
+        LEFT JOIN emprestimos e ON e.aluno_id = a.id AND e.status = 'Emprestado'
+        LEFT JOIN livros l ON l.id = e.livro_id
+        WHERE a.turma = ? {filtro}
+        GROUP BY a.nome, a.id
+        ORDER BY a.nome, a.id
+    ''', params)
+
+
+def sugerir_alunos(banco, texto, turma=None, limite=LIMITE_SUGESTOES_ALUNOS):
+    """(id, nome, matricula) para o seletor de alunos, no máximo `limite`.
+
+    A matrícula digitada (ou lida no cartão) por inteiro vem primeiro, de
+    qualquer turma; depois os nomes que começam com o texto, sem diferenciar
+    maiúsculas, em ordem alfabética (faixa em idx_alunos_nome_nocase ou
+    idx_alunos_turma_nome_nocase). Sem texto, os primeiros nomes da turma.
+    """
+    texto = texto.strip()
+    linhas = []
+    if texto:
+        exata = banco.consultar_um('SELECT id, nome, matricula FROM alunos WHERE matricula = ?', (texto,))
+        if exata:
+            linhas.append(tuple(exata))
+    padrao = texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    filtro, params = '', [padrao]
+    if turma:
+        filtro = 'AND turma = ?'
+        params.append(turma)
+    params.append(limite)
+    for linha in banco.consultar(f'''
+        SELECT id, nome, matricula FROM alunos
+        WHERE nome LIKE ? ESCAPE '\\' {filtro}
+        ORDER BY nome COLLATE NOCASE, id
+        LIMIT ?
+    ''', params):
+        if len(linhas) < limite and (not linhas or linha[0] != linhas[0][0]):
+            linhas.append(tuple(linha))
+    return linhas
+
+
+def alunos_dos_emprestimos(banco, emprestimo_ids):
+    """Ids dos alunos envolvidos nos empréstimos informados"""
+    return [r[0] for r in banco.consultar(f'''
+        SELECT DISTINCT aluno_id FROM emprestimos
+        WHERE id IN ({', '.join('?' * len(emprestimo_ids))})
+    ''', emprestimo_ids)]
+
+
+def estatisticas(banco):
+    """Contadores do painel ({chave: valor}), lidos da tabela mantida por gatilhos"""
+    return dict(banco.consultar('SELECT chave, valor FROM estatisticas'))
+
+
+def atrasos_por_turma(banco, hoje=None):
+    """Empréstimos atrasados por turma e série, contados em FAIXAS_ATRASO.
+
+    Retorna (turma, serie, quantidade por faixa..., total), em ordem de turma.
+    Só os abertos com prazo vencido são lidos, por faixa do índice
+    (status, data_devolucao_prevista, aluno_id), sem ir à tabela. As faixas
+    viram limites de data comparados como texto, e a contagem é somada por
+    aluno antes do join, para buscar cada aluno uma vez.
+    """
+    hoje = hoje or date.today()
+    params = {'hoje': hoje.isoformat()}
+    faixas = []
+    for i, (_, minimo, maximo) in enumerate(FAIXAS_ATRASO):
+        # Atraso de d dias: prevista = hoje - d
+        params[f'ate{i}'] = (hoje - timedelta(days=minimo)).isoformat()
+        condicao = f"data_devolucao_prevista <= :ate{i}"
+        if maximo is not None:
+            params[f'desde{i}'] = (hoje - timedelta(days=maximo)).isoformat()
+            condicao += f" AND data_devolucao_prevista >= :desde{i}"
+        faixas.append(f"SUM({condicao}) AS f{i}")
+    somas = ', '.join(f"SUM(e.f{i})" for i in range(len(FAIXAS_ATRASO)))
+    # +aluno_id: agrupa a faixa do índice em vez de percorrer idx_emprestimos_aluno_status inteiro
+    return banco.consultar(f'''
+        SELECT COALESCE(a.turma, ''), COALESCE(a.serie, ''), {somas}, SUM(e.total)
+        FROM (
+            SELECT aluno_id, {', '.join(faixas)}, COUNT(*) AS total
+            FROM emprestimos
+            WHERE status = 'Emprestado' AND data_devolucao_prevista < :hoje
+            GROUP BY +aluno_id
+        ) e
+        JOIN alunos a ON a.id = e.aluno_id
+        GROUP BY a.turma, a.serie
+        ORDER BY length(a.turma), a.turma, a.serie
+    ''', params)
+
+
+def devolucoes_do_dia(banco, data):
+    """Empréstimos abertos com devolução prevista na data (AAAA-MM-DD)"""
+    return banco.consultar('''
+        SELECT e.id, a.nome, a.matricula, l.titulo, e.data_devolucao_prevista
+        FROM emprestimos e
+        JOIN alunos a ON e.aluno_id = a.id
+        JOIN livros l ON e.livro_id = l.id
+        WHERE e.status = 'Emprestado' AND e.data_devolucao_prevista = ?
+    ''', (data,))
+
+
+# ---------------------- CIRCULAÇÃO (tabelas de resumo) ----------------------
+def _periodo(banco, desde, ate):
+    """(desde, ate) em AAAA-MM-DD; sem `desde`, o primeiro dia com movimento"""
+    ate = ate or date.today().isoformat()
+    if desde is None:
+        desde = banco.consultar_um('SELECT MIN(dia) FROM resumo_dia_categoria')[0]
+    return desde or ate, ate
+
+
+def _meses(desde, ate):
+    """Meses AAAA-MM de `desde` até `ate`, inclusive"""
+    ano, mes = int(desde[:4]), int(desde[5:7])
+    meses = []
+    while f"{ano:04d}-{mes:02d}" <= ate[:7]:
+        meses.append(f"{ano:04d}-{mes:02d}")
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+    return meses
+
+
+def circulacao_por_mes(banco, desde=None, ate=None):
+    """(mes AAAA-MM, emprestimos, devolucoes) de cada mês do período, com zero
+    nos meses sem movimento. Lê a faixa de dias de resumo_dia_categoria."""
+    desde, ate = _periodo(banco, desde, ate)
+    totais = {mes: (emprestimos, devolucoes) for mes, emprestimos, devolucoes in banco.consultar('''
+        SELECT substr(dia, 1, 7), SUM(emprestimos), SUM(devolucoes)
+        FROM resumo_dia_categoria
+        WHERE dia BETWEEN ? AND ?
+        GROUP BY 1
+    ''', (desde, ate))}
+    return [(mes, *totais.get(mes, (0, 0))) for mes in _meses(desde, ate)]
+
+
+def circulacao_por_grupo(banco, grupo, desde=None, ate=None):
+    """(categoria, turma ou série, emprestimos, devolucoes) no período, do
+    grupo com mais empréstimos ao com menos (ver GRUPOS_CIRCULACAO)"""
+    tabela, coluna = GRUPOS_CIRCULACAO[grupo]
+    desde, ate = _periodo(banco, desde, ate)
+    return banco.consultar(f'''
+        SELECT {coluna}, SUM(emprestimos), SUM(devolucoes)
+        FROM {tabela}
+        WHERE dia BETWEEN ? AND ?
+        GROUP BY {coluna}
+        HAVING SUM(emprestimos) > 0 OR SUM(devolucoes) > 0
+        ORDER BY 2 DESC, 1
+    ''', (desde, ate))
+
+
+def _dias_avulsos(banco, desde, ate, meses):
+    """Separa os meses do período cobertos por inteiro dos cortados pelo meio.
+
+    Um mês da ponta conta como inteiro se o resumo diário não tem empréstimos
+    nos dias dele fora do período (o mês corrente até hoje, o primeiro mês de
+    "Tudo"). Nos outros, os empréstimos dos dias do período são contados no
+    histórico. Retorna (meses inteiros, {livro_id: empréstimos nos dias avulsos}).
+    """
+    inteiros, avulsos = list(meses), {}
+    for mes in sorted({meses[0], meses[-1]}) if meses else ():
+        primeiro = date.fromisoformat(f"{mes}-01")
+        ultimo = (primeiro + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+        inicio, fim = max(desde, primeiro.isoformat()), min(ate, ultimo.isoformat())
+        if (inicio, fim) == (primeiro.isoformat(), ultimo.isoformat()):
+            continue
+        fora = banco.consultar_um('''
+            SELECT COALESCE(SUM(emprestimos), 0) FROM resumo_dia_categoria
+            WHERE dia BETWEEN ? AND ? AND dia NOT BETWEEN ? AND ?
+        ''', (primeiro.isoformat(), ultimo.isoformat(), inicio, fim))[0]
+        if not fora:
+            continue
+        inteiros.remove(mes)
+        # Limite exclusivo no dia seguinte: também pega datas gravadas com hora.
+        # As duas tabelas do histórico direto, e não a visão: assim só os índices
+        # (data_emprestimo, livro_id) são lidos, sem ir às linhas
+        dia_seguinte = (date.fromisoformat(fim) + timedelta(days=1)).isoformat()
+        for livro_id, quantidade in banco.consultar('''
+            SELECT COALESCE(livro_id, 0), COUNT(*) FROM (
+                SELECT livro_id FROM emprestimos
+                WHERE data_emprestimo >= ? AND data_emprestimo < ?
+                UNION ALL
+                SELECT livro_id FROM emprestimos_arquivo
+                WHERE data_emprestimo >= ? AND data_emprestimo < ?
+            )
+            GROUP BY 1
+        ''', (inicio, dia_seguinte) * 2):
+            avulsos[livro_id] = avulsos.get(livro_id, 0) + quantidade
+    return inteiros, avulsos
+
+
+def livros_mais_emprestados(banco, desde=None, ate=None, limite=LIMITE_MAIS_EMPRESTADOS):
+    """(livro_id, titulo, autor, emprestimos) dos mais emprestados no período.
+
+    Os meses inteiros do período vêm de resumo_mes_livro; os dias de um mês
+    cortado pelo meio (ex.: "Últimos 30 dias"), do histórico (_dias_avulsos).
+    Somar resumo_mes_livro por livro passaria por todos os livros de cada
+    mês. Em vez disso, lê os `candidatos` primeiros de cada mês
+    (idx_resumo_mes_livro_total) e dos dias avulsos e soma só esses,
+    buscando cada par (mes, livro) pela chave primária. Um livro fora de
+    todas essas listas tem no máximo a soma dos últimos valores lidos em
+    cada uma: se o último do ranking alcança esse teto, o ranking é exato;
+    senão a busca repete com mais candidatos. Meses, candidatos e dias
+    avulsos vão como listas JSON (json_each), um parâmetro cada.
+    """
+    desde, ate = _periodo(banco, desde, ate)
+    meses, avulsos = _dias_avulsos(banco, desde, ate, _meses(desde, ate))
+    avulsos = sorted(avulsos.items(), key=lambda item: -item[1])
+    candidatos = limite * 4
+    while True:
+        ids, teto, truncado = {livro_id for livro_id, _ in avulsos[:candidatos]}, 0, False
+        if len(avulsos) > candidatos:
+            teto += avulsos[candidatos - 1][1]
+            truncado = True
+        for mes in meses:
+            linhas = banco.consultar('''
+                SELECT livro_id, emprestimos FROM resumo_mes_livro
+                WHERE mes = ? ORDER BY emprestimos DESC LIMIT ?
+            ''', (mes, candidatos))
+            ids.update(livro_id for livro_id, _ in linhas)
+            if len(linhas) == candidatos:
+                teto += linhas[-1][1]
+                truncado = True
+        if not ids:
+            return []
+        # Com muitos empates nos primeiros de cada mês, somar tudo sai mais barato
+        filtro, params, somados = '', [json.dumps(meses)], avulsos
+        if len(ids) <= MAX_CANDIDATOS_RANKING:
+            filtro = "AND livro_id IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(sorted(ids)))
+            somados = [item for item in avulsos if item[0] in ids]
+        else:
+            truncado = False
+        ranking = banco.consultar(f'''
+            SELECT r.livro_id, COALESCE(l.titulo, '(excluído)'), COALESCE(l.autor, ''), r.total
+            FROM (
+                SELECT livro_id, SUM(emprestimos) AS total
+                FROM (
+                    SELECT livro_id, emprestimos FROM resumo_mes_livro
+                    WHERE mes IN (SELECT value FROM json_each(?)) {filtro}
+                    UNION ALL
+                    SELECT value ->> 0, value ->> 1 FROM json_each(?)
+                )
+                GROUP BY livro_id
+            ) r
+            LEFT JOIN livros l ON l.id = r.livro_id
+            WHERE r.total > 0
+            ORDER BY r.total DESC, r.livro_id
+            LIMIT ?
+        ''', (*params, json.dumps(somados), limite))
+        if not truncado or (len(ranking) == limite and ranking[-1][3] >= teto):
+            return ranking
+        candidatos *= 4
@@ -0,0 +1,242 @@
+# diagnostico.py
+"""Instrumentação de desempenho: tempo de cada comando SQL, latência dos
+handlers da interface e registro rotativo das consultas lentas.
+
+Ativada com `python biblioteca2.py --diagnostico` (ou BIBLIOTECA_DIAGNOSTICO=1).
+Com ela ligada, Ctrl+Shift+D abre o painel de diagnóstico e o relatório é
+impresso ao fechar o programa.
+"""
+import bisect
+import logging
+import logging.handlers
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+
+# Comandos SQL a partir desta duração vão para o registro de consultas lentas
+LIMIAR_LENTO_MS = 50.0
+
+# Limites superiores (ms) das faixas dos histogramas
+LIMITES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Registro de consultas lentas: tamanho máximo de cada arquivo e quantos antigos manter
+TAMANHO_LOG = 1024 * 1024
+ARQUIVOS_LOG = 3
+
+# Erros recentes guardados para o painel
+MAX_ERROS = 50
+
+_TEXTO_SQL = re.compile(r"'(?:[^']|'')*'")
+_NUMERO_SQL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_ESPACOS = re.compile(r"\s+")
+
+
+def normalizar_sql(sql):
+    """Troca os valores literais por ? para agrupar execuções do mesmo comando"""
+    sql = _TEXTO_SQL.sub('?', sql)
+    sql = _NUMERO_SQL.sub('?', sql)
+    return _ESPACOS.sub(' ', sql).strip()[:300]
+
+
+class Histograma:
+    """Contagem de durações por faixa, com total e máximo"""
+
+    def __init__(self):
+        self.faixas = [0] * (len(LIMITES_MS) + 1)
+        self.contagem = 0
+        self.total_ms = 0.0
+        self.maximo_ms = 0.0
+
+    def registrar(self, ms):
+        self.faixas[bisect.bisect_left(LIMITES_MS, ms)] += 1
+        self.contagem += 1
+        self.total_ms += ms
+        self.maximo_ms = max(self.maximo_ms, ms)
+
+    def percentil(self, p):
+        """Limite superior da faixa que contém o percentil p (0-100)"""
+        alvo = self.contagem * p / 100
+        acumulado = 0
+        for limite, quantidade in zip(LIMITES_MS + (None,), self.faixas):
+            acumulado += quantidade
+            if quantidade and acumulado >= alvo:
+                return limite if limite is not None else self.maximo_ms
+        return 0
+
+    def resumo(self):
+        nomes = [f"<={limite}" for limite in LIMITES_MS] + [f">{LIMITES_MS[-1]}"]
+        return {
+            'execucoes': self.contagem,
+            'total_ms': round(self.total_ms, 1),
+            'media_ms': round(self.total_ms / self.contagem, 3) if self.contagem else 0,
+            'p50_ms': self.percentil(50),
+            'p95_ms': self.percentil(95),
+            'max_ms': round(self.maximo_ms, 1),
+            'faixas': {nome: n for nome, n in zip(nomes, self.faixas) if n},
+        }
+
+
+class _ErrosRecentes(logging.Handler):
+    """Guarda as últimas mensagens de erro do programa para o painel"""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.registros = deque(maxlen=MAX_ERROS)
+
+    def emit(self, registro):
+        self.registros.append(f"{time.strftime('%H:%M:%S')} {registro.name}: {registro.getMessage()}"
+                              + (f" ({registro.exc_info[1]!r})" if registro.exc_info else ''))
+
+
+class Diagnostico:
+    """Coleta as métricas; o Banco chama comando_iniciado/comando_concluido.
+
+    O sqlite3 só avisa (set_trace_callback) quando um comando começa. A
+    duração vai desse aviso até o próximo comando da mesma thread ou até o
+    Banco terminar a chamada (consultar, executar, fim da transação). Os
+    subcomandos de gatilhos e do FTS5 contam no tempo do comando que os disparou.
+    """
+
+    def __init__(self, caminho_log=None, limiar_lento_ms=LIMIAR_LENTO_MS):
+        self.limiar_lento_ms = limiar_lento_ms
+        self.comandos = {}   # SQL normalizado -> Histograma
+        self.handlers = {}   # nome do handler -> Histograma
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.erros = _ErrosRecentes()
+        logging.getLogger().addHandler(self.erros)
+        self.log_lento = logging.getLogger(f"{__name__}.lentas")
+        self.log_lento.propagate = False
+        if caminho_log:
+            arquivo = logging.handlers.RotatingFileHandler(
+                caminho_log, maxBytes=TAMANHO_LOG, backupCount=ARQUIVOS_LOG, encoding='utf-8')
+            arquivo.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            self.log_lento.addHandler(arquivo)
+            self.log_lento.setLevel(logging.INFO)
+
+    # ---------------------- SQL ----------------------
+    def instalar(self, conn):
+        """Liga o rastreamento de comandos na conexão"""
+        conn.set_trace_callback(self.comando_iniciado)
+
+    def comando_iniciado(self, sql):
+        # Chamado de dentro do SQLite: só registra, não usa a conexão
+        local = self._local
+        if getattr(local, 'explicando', False):
+            return
+        atual = getattr(local, 'atual', None)
+        if atual is not None and (atual[0] == sql or sql.startswith('--')):
+            # Subcomando do comando aberto: gatilho ou tabela virtual (FTS5)
+            return
+        self._encerrar(local)
+        local.atual = (sql, time.perf_counter())
+
+    def comando_concluido(self, conn):
+        """O Banco terminou a chamada: fecha o comando aberto e explica os lentos"""
+        local = self._local
+        self._encerrar(local)
+        pendentes = getattr(local, 'lentos', None)
+        if pendentes:
+            local.lentos = []
+            for sql, ms in pendentes:
+                self._registrar_lento(conn, sql, ms)
+
+    def _encerrar(self, local):
+        atual = getattr(local, 'atual', None)
+        if atual is None:
+            return
+        local.atual = None
+        sql, inicio = atual
+        ms = (time.perf_counter() - inicio) * 1000
+        with self._lock:
+            self.comandos.setdefault(normalizar_sql(sql), Histograma()).registrar(ms)
+        if ms >= self.limiar_lento_ms:
+            if not hasattr(local, 'lentos'):
+                local.lentos = []
+            local.lentos.append((sql, ms))
+
+    def _registrar_lento(self, conn, sql, ms):
+        plano = ''
+        palavra = sql.split(None, 1)[0].upper() if sql.strip() else ''
+        if palavra in ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE'):
+            self._local.explicando = True
+            try:
+                plano = '\n'.join(f"    {linha[3]}" for linha in
+                                  conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall())
+            except sqlite3.Error as e:
+                plano = f"    (sem plano: {e})"
+            finally:
+                self._local.explicando = False
+        self.log_lento.info("%.1f ms\n  %s\n%s", ms, _ESPACOS.sub(' ', sql).strip(), plano)
+
+    # ---------------------- INTERFACE ----------------------
+    def registrar_handler(self, nome, ms):
+        with self._lock:
+            self.handlers.setdefault(nome, Histograma()).registrar(ms)
+
+    # ---------------------- RELATÓRIO ----------------------
+    def relatorio(self, limite=20):
+        """Métricas coletadas: comandos por tempo total, handlers e erros recentes"""
+        with self._lock:
+            comandos = sorted(self.comandos.items(), key=lambda c: c[1].total_ms, reverse=True)
+            handlers = sorted(self.handlers.items(), key=lambda h: h[1].total_ms, reverse=True)
+            return {
+                'comandos_sql': [dict(sql=sql, **h.resumo()) for sql, h in comandos[:limite]],
+                'handlers': {nome: h.resumo() for nome, h in handlers},
+                'erros_recentes': list(self.erros.registros),
+            }
+
+    def texto(self, limite=20):
+        """Relatório em texto para o painel e para o terminal"""
+        dados = self.relatorio(limite)
+        linhas = ["== Handlers da interface (por tempo total) =="]
+        for nome, h in dados['handlers'].items():
+            linhas.append(f"{h['execucoes']:6d}x  média {h['media_ms']:8.2f} ms  p95 <= {h['p95_ms']} ms  "
+                          f"máx {h['max_ms']:8.1f} ms  {nome}")
+        linhas.append("")
+        linhas.append(f"== Comandos SQL (top {limite} por tempo total) ==")
+        for c in dados['comandos_sql']:
+            linhas.append(f"{c['execucoes']:6d}x  total {c['total_ms']:9.1f} ms  média {c['media_ms']:8.3f} ms  "
+                          f"máx {c['max_ms']:8.1f} ms")
+            linhas.append(f"        {c['sql'][:160]}")
+        linhas.append("")
+        linhas.append("== Erros recentes ==")
+        linhas.extend(dados['erros_recentes'] or ["(nenhum)"])
+        return '\n'.join(linhas)
+
+
+# Posição de %T nos argumentos que o Tk passa aos callbacks de bind (Misc._subst_format)
+_POSICAO_TIPO_EVENTO = 15
+
+
+def instrumentar_tk(diagnostico):
+    """Mede todo callback do Tk (command=, bind, after) registrado depois desta chamada.
+
+    O tkinter embrulha cada callback em tkinter.CallWrapper; trocamos a classe
+    por uma que cronometra a chamada e registra no histograma do handler.
+    Para eventos (KeyRelease, TreeviewSelect...) o tipo entra no nome.
+    """
+    import tkinter
+
+    original = tkinter.CallWrapper
+
+    class CallWrapperMedido(original):
+        def __call__(self, *args):
+            inicio = time.perf_counter()
+            try:
+                return super().__call__(*args)
+            finally:
+                nome = getattr(self.func, '__qualname__', repr(self.func))
+                if self.subst and len(args) > _POSICAO_TIPO_EVENTO:
+                    # Callback de bind: o tipo do evento (%T) entra no nome
+                    tipo = args[_POSICAO_TIPO_EVENTO]
+                    try:
+                        tipo = tkinter.EventType(tipo).name
+                    except ValueError:
+                        pass
+                    nome = f"{nome} <{tipo}>"
+                diagnostico.registrar_handler(nome, (time.perf_counter() - inicio) * 1000)
+
+    tkinter.CallWrapper = CallWrapperMedido
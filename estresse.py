@@ -0,0 +1,138 @@
+# estresse.py
+"""Teste de estresse da circulação: vários processos emprestando e devolvendo
+os mesmos exemplares ao mesmo tempo, como vários balcões no mesmo arquivo.
+
+Ao final confere se nenhum livro foi emprestado além do estoque
+(disponivel >= 0 e disponivel + empréstimos ativos = quantidade) e mostra
+quantos empréstimos por segundo foram feitos. --ingenuo usa o caminho antigo
+(lê disponivel, confere em Python e só então grava) para comparação.
+
+Uso: python estresse.py [--processos 8] [--livros 20] [--exemplares 2] [--segundos 5] [--ingenuo]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+from banco import Banco
+from servico import ErroServico, ServicoBiblioteca
+
+# Chance de, a cada passo, devolver um empréstimo em vez de pegar outro
+CHANCE_DEVOLVER = 0.4
+
+
+def _emprestar_ingenuo(banco, livro_id, aluno_id):
+    """Caminho antigo de registrar_emprestimo, mantido para comparação"""
+    disponivel = banco.consultar_um('SELECT disponivel FROM livros WHERE id = ?', (livro_id,))[0]
+    if disponivel <= 0:
+        raise ErroServico("Livro não está disponível!")
+    prevista = (date.today() + timedelta(days=15)).isoformat()
+    with banco.transacao() as cursor:
+        cursor.execute('''
+            INSERT INTO emprestimos (livro_id, aluno_id, data_devolucao_prevista)
+            VALUES (?, ?, ?)
+        ''', (livro_id, aluno_id, prevista))
+        cursor.execute('UPDATE livros SET disponivel = disponivel - 1 WHERE id = ?', (livro_id,))
+        return cursor.lastrowid
+
+
+def _balcao(caminho, numero, livros, segundos, ingenuo):
+    """Um processo (balcão): empresta e devolve até o tempo acabar"""
+    random.seed(numero)
+    banco = Banco(caminho)
+    servico = ServicoBiblioteca(banco)
+    aluno_id = numero + 1
+    meus = []
+    totais = {'emprestimos': 0, 'devolucoes': 0, 'esgotados': 0, 'bloqueios': 0}
+    fim = time.monotonic() + segundos
+    try:
+        while time.monotonic() < fim:
+            try:
+                if meus and random.random() < CHANCE_DEVOLVER:
+                    servico.registrar_devolucao(meus.pop(random.randrange(len(meus))))
+                    totais['devolucoes'] += 1
+                else:
+                    livro_id = random.randint(1, livros)
+                    if ingenuo:
+                        meus.append(_emprestar_ingenuo(banco, livro_id, aluno_id))
+                    else:
+                        meus.append(servico.registrar_emprestimo(livro_id, aluno_id)[0])
+                    totais['emprestimos'] += 1
+            except ErroServico:
+                totais['esgotados'] += 1
+            except sqlite3.OperationalError:
+                # "database is locked" que sobreviveu às retentativas
+                totais['bloqueios'] += 1
+    finally:
+        banco.fechar()
+    return totais
+
+
+def _preparar(caminho, livros, exemplares, processos):
+    banco = Banco(caminho)
+    try:
+        banco.migrar()
+        banco.executar_varios('''
+            INSERT INTO livros (titulo, autor, isbn, quantidade, disponivel) VALUES (?, ?, ?, ?, ?)
+        ''', [(f'Livro {i}', 'Autor', f'estresse-{i}', exemplares, exemplares) for i in range(livros)])
+        banco.executar_varios('INSERT INTO alunos (nome, matricula) VALUES (?, ?)',
+                              [(f'Balcão {i}', f'balcao-{i}') for i in range(processos)])
+    finally:
+        banco.fechar()
+
+
+def _conferir(caminho):
+    """Livros com estoque negativo ou que não fecha com os empréstimos ativos"""
+    banco = Banco(caminho)
+    try:
+        return banco.consultar('''
+            SELECT l.id, l.quantidade, l.disponivel, COUNT(e.id) AS ativos
+            FROM livros l
+            LEFT JOIN emprestimos e ON e.livro_id = l.id AND e.status = 'Emprestado'
+            GROUP BY l.id
+            HAVING l.disponivel < 0 OR l.disponivel + ativos <> l.quantidade
+        ''')
+    finally:
+        banco.fechar()
+
+
+def estressar(caminho, processos=8, livros=20, exemplares=2, segundos=5.0, ingenuo=False):
+    """Roda os balcões em paralelo e retorna (totais somados, livros inconsistentes, duração)"""
+    _preparar(caminho, livros, exemplares, processos)
+    inicio = time.perf_counter()
+    with multiprocessing.Pool(processos) as pool:
+        parciais = pool.starmap(_balcao, [(caminho, n, livros, segundos, ingenuo)
+                                          for n in range(processos)])
+    duracao = time.perf_counter() - inicio
+    totais = {chave: sum(p[chave] for p in parciais) for chave in parciais[0]}
+    return totais, _conferir(caminho), duracao
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estresse de empréstimos concorrentes")
+    parser.add_argument('--processos', type=int, default=8)
+    parser.add_argument('--livros', type=int, default=20)
+    parser.add_argument('--exemplares', type=int, default=2)
+    parser.add_argument('--segundos', type=float, default=5.0)
+    parser.add_argument('--ingenuo', action='store_true', help="usa o caminho antigo (sem UPDATE condicional)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        totais, inconsistentes, duracao = estressar(
+            os.path.join(pasta, 'estresse.db'), args.processos, args.livros,
+            args.exemplares, args.segundos, args.ingenuo)
+    print(f"{args.processos} processos, {args.livros} livros x {args.exemplares} exemplares, "
+          f"{duracao:.1f} s{' (caminho antigo)' if args.ingenuo else ''}")
+    print(f"  empréstimos: {totais['emprestimos']} ({totais['emprestimos'] / duracao:.0f}/s)")
+    print(f"  devoluções:  {totais['devolucoes']}")
+    print(f"  recusados por falta de exemplar: {totais['esgotados']}")
+    print(f"  falhas por banco bloqueado: {totais['bloqueios']}")
+    if inconsistentes:
+        print(f"  ERRO: {len(inconsistentes)} livros emprestados além do estoque "
+              f"(id, quantidade, disponivel, ativos): {inconsistentes[:5]}")
+        raise SystemExit(1)
+    print("  OK: nenhum exemplar emprestado duas vezes")
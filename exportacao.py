@@ -0,0 +1,135 @@
+# exportacao.py
+"""Exportação do histórico de empréstimos, do catálogo e dos alunos para CSV ou JSON.
+
+As linhas saem do cursor em lotes (fetchmany) direto para o arquivo, então a
+memória usada não depende do tamanho da tabela. Arquivos terminados em .gz
+são compactados com gzip.
+
+Uso: python exportacao.py emprestimos|livros|alunos arquivo.csv[.gz]|arquivo.json[.gz] [banco.db]
+"""
+import csv
+import gzip
+import json
+import os
+import sys
+
+# Linhas trazidas do cursor por vez
+TAMANHO_LOTE = 2000
+
+# tipo -> (descrição, colunas do arquivo, consulta)
+EXPORTACOES = {
+    'emprestimos': ("Histórico de empréstimos", (
+        'id', 'data_emprestimo', 'data_devolucao_prevista', 'data_devolucao_real',
+        'status', 'observacoes', 'livro_id', 'titulo', 'autor', 'isbn',
+        'aluno_id', 'aluno', 'matricula', 'serie', 'turma',
+    ), '''
+        SELECT e.id, e.data_emprestimo, e.data_devolucao_prevista, e.data_devolucao_real,
+               e.status, e.observacoes, l.id, l.titulo, l.autor, l.isbn,
+               a.id, a.nome, a.matricula, a.serie, a.turma
+        FROM emprestimos_historico e
+        LEFT JOIN livros l ON l.id = e.livro_id
+        LEFT JOIN alunos a ON a.id = e.aluno_id
+        ORDER BY e.id
+    '''),
+    'livros': ("Catálogo de livros", (
+        'id', 'titulo', 'autor', 'isbn', 'categoria', 'quantidade', 'disponivel', 'data_cadastro',
+    ), '''
+        SELECT id, titulo, autor, isbn, categoria, quantidade, disponivel, data_cadastro
+        FROM livros ORDER BY id
+    '''),
+    'alunos': ("Cadastro de alunos", (
+        'id', 'nome', 'matricula', 'serie', 'turma', 'telefone', 'email', 'data_cadastro',
+    ), '''
+        SELECT id, nome, matricula, serie, turma, telefone, email, data_cadastro
+        FROM alunos ORDER BY id
+    '''),
+}
+
+
+class ExportacaoCancelada(Exception):
+    """A exportação foi interrompida pelo usuário"""
+
+
+def _abrir_saida(caminho):
+    if caminho.lower().endswith('.gz'):
+        return gzip.open(caminho, 'wt', compresslevel=6, newline='', encoding='utf-8')
+    return open(caminho, 'w', newline='', encoding='utf-8-sig')
+
+
+def formato_do_arquivo(caminho):
+    """'csv' ou 'json', pela extensão (ignorando um .gz final)"""
+    nome = caminho.lower()
+    if nome.endswith('.gz'):
+        nome = nome[:-3]
+    return 'json' if nome.endswith('.json') else 'csv'
+
+
+def _lotes(banco, sql, tamanho_lote):
+    cursor = banco.conexao().execute(sql)
+    try:
+        while True:
+            lote = cursor.fetchmany(tamanho_lote)
+            if not lote:
+                break
+            yield lote
+    finally:
+        cursor.close()
+
+
+def exportar(banco, tipo, caminho, progresso=None, cancelado=None,
+             tamanho_lote=TAMANHO_LOTE):
+    """Grava todas as linhas do tipo no arquivo e retorna quantas foram exportadas.
+
+    progresso(total) é chamado a cada lote; se cancelado() retornar True a
+    exportação para, o arquivo parcial é removido e ExportacaoCancelada é
+    lançada. Pode rodar fora da thread da interface (usa a conexão da thread).
+    """
+    if tipo not in EXPORTACOES:
+        raise ValueError(f"Tipo de exportação desconhecido: {tipo}")
+    _, colunas, sql = EXPORTACOES[tipo]
+    formato = formato_do_arquivo(caminho)
+    total = 0
+    try:
+        with _abrir_saida(caminho) as saida:
+            if formato == 'csv':
+                escritor = csv.writer(saida, delimiter=';')
+                escritor.writerow(colunas)
+            else:
+                saida.write('[')
+            separador = '\n'
+            for lote in _lotes(banco, sql, tamanho_lote):
+                if cancelado and cancelado():
+                    raise ExportacaoCancelada()
+                if formato == 'csv':
+                    escritor.writerows(lote)
+                else:
+                    # Um objeto por linha, sem montar a lista inteira na memória
+                    for linha in lote:
+                        saida.write(separador)
+                        saida.write(json.dumps(dict(zip(colunas, linha)), ensure_ascii=False))
+                        separador = ',\n'
+                total += len(lote)
+                if progresso:
+                    progresso(total)
+            if formato == 'json':
+                saida.write('\n]\n')
+    except BaseException:
+        if os.path.exists(caminho):
+            os.remove(caminho)
+        raise
+    return total
+
+
+if __name__ == "__main__":
+    from banco import DB_PATH, Banco
+
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(2)
+    tipo, caminho = sys.argv[1], sys.argv[2]
+    banco = Banco(sys.argv[3] if len(sys.argv) > 3 else DB_PATH)
+    try:
+        total = exportar(banco, tipo, caminho)
+    finally:
+        banco.fechar()
+    print(f"{total} linhas exportadas para {caminho}")
@@ -0,0 +1,258 @@
+# federacao.py
+"""Consultas em vários bancos de escolas ao mesmo tempo (rede de bibliotecas).
+
+Cada escola continua com o seu próprio arquivo; o registro (escolas.json ao
+lado do banco) só guarda nome -> caminho. As consultas rodam em paralelo num
+pool de processos, uma escola por tarefa, e os resultados são juntados aqui.
+Cada processo mantém abertas, em somente leitura, as conexões das escolas que
+já consultou: só as páginas dos índices usados são lidas, nunca o banco inteiro.
+
+Uso: python federacao.py registrar nome caminho.db
+     python federacao.py remover nome
+     python federacao.py listar
+     python federacao.py buscar "texto" [--coluna titulo|autor] [--disponiveis] [--limite 50]
+     python federacao.py estatisticas
+     python federacao.py isbn 9788535914849
+Todos aceitam [--registro escolas.json].
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import busca
+import consultas
+from banco import DB_PATH, MIGRACOES, Banco
+
+NOME_REGISTRO = "escolas.json"
+
+# Resultados por escola antes de juntar a busca do catálogo
+LIMITE_BUSCA_FEDERADA = 50
+
+
+# ---------------------- REGISTRO ----------------------
+def carregar_registro(caminho):
+    """{nome: caminho_do_banco} das escolas registradas (vazio se não houver arquivo)"""
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def salvar_registro(caminho, escolas):
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(escolas, arquivo, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(temporario, caminho)
+
+
+# ---------------------- TAREFAS (rodam nos processos do pool) ----------------------
+# Bancos já abertos neste processo, por caminho
+_bancos = {}
+
+
+def _banco(caminho):
+    banco = _bancos.get(caminho)
+    if banco is None:
+        if not os.path.exists(caminho):
+            raise FileNotFoundError(f"arquivo não encontrado: {caminho}")
+        # mode=ro, sem journal_mode nem outro PRAGMA gravado no arquivo: o banco de
+        # outra escola não muda de modo nem ganha -wal/-shm, e pode estar num
+        # compartilhamento somente leitura
+        banco = Banco(caminho, somente_leitura=True)
+        versao = banco.versao()
+        if versao < len(MIGRACOES):
+            banco.fechar()
+            raise RuntimeError(f"banco desatualizado (versão {versao} de {len(MIGRACOES)}); "
+                               f"abra-o uma vez no sistema para migrar")
+        _bancos[caminho] = banco
+    return banco
+
+
+def _buscar(banco, texto, coluna, somente_disponiveis, limite):
+    return [tuple(linha) for linha in busca.buscar_livros(
+        banco, texto, coluna, somente_disponiveis, limite,
+        campos="l.titulo, l.autor, l.isbn, l.categoria, l.quantidade, l.disponivel")]
+
+
+def _estatisticas(banco):
+    return consultas.estatisticas(banco)
+
+
+def _isbn(banco, isbn):
+    linha = banco.consultar_um(
+        'SELECT titulo, autor, quantidade, disponivel FROM livros WHERE isbn = ?', (isbn,))
+    return tuple(linha) if linha else None
+
+
+_TAREFAS = {'buscar': _buscar, 'estatisticas': _estatisticas, 'isbn': _isbn}
+
+
+def _executar(tarefa, caminho, args):
+    """Roda uma tarefa em um banco; retorna (resultado, erro, segundos)"""
+    inicio = time.perf_counter()
+    try:
+        resultado, erro = _TAREFAS[tarefa](_banco(caminho), *args), None
+    except Exception as e:
+        # Uma escola com problema não derruba a consulta das demais
+        _bancos.pop(caminho, None)
+        resultado, erro = None, str(e)
+    return resultado, erro, time.perf_counter() - inicio
+
+
+# ---------------------- FEDERAÇÃO ----------------------
+class ResultadoEscola:
+    """O que uma escola respondeu: resultado ou erro, e quanto demorou"""
+
+    def __init__(self, nome, resultado, erro, segundos):
+        self.nome = nome
+        self.resultado = resultado
+        self.erro = erro
+        self.segundos = segundos
+
+
+class Federacao:
+    """Executa a mesma consulta em todas as escolas registradas, em paralelo.
+
+    O pool de processos é criado na primeira consulta e reaproveitado até
+    fechar(), para que as conexões (e o cache de páginas) de cada processo
+    sirvam às consultas seguintes. Processos em vez de ATTACH: o SQLite anexa
+    no máximo 10 bancos por conexão e executa a consulta em uma só thread.
+    """
+
+    def __init__(self, escolas, processos=None):
+        self.escolas = dict(escolas)
+        self.processos = processos or min(len(self.escolas), os.cpu_count() or 1) or 1
+        self._pool = None
+
+    def fechar(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def _em_todas(self, tarefa, *args):
+        """[ResultadoEscola], na ordem dos nomes das escolas"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.processos)
+        nomes = sorted(self.escolas)
+        futuros = [self._pool.submit(_executar, tarefa, self.escolas[nome], args) for nome in nomes]
+        return [ResultadoEscola(nome, *futuro.result()) for nome, futuro in zip(nomes, futuros)]
+
+    def buscar(self, texto, coluna=None, somente_disponiveis=False, limite=LIMITE_BUSCA_FEDERADA):
+        """Busca no catálogo de todas as escolas, juntando o mesmo livro.
+
+        Retorna (livros, respostas). Cada livro é um dict com titulo, autor,
+        isbn, categoria e `escolas` [(nome, quantidade, disponivel)]; o mesmo
+        ISBN (ou título e autor, sem ISBN) em várias escolas vira um só livro,
+        na melhor posição que teve em alguma delas.
+        """
+        respostas = self._em_todas('buscar', texto, coluna, somente_disponiveis, limite)
+        livros = {}
+        for resposta in respostas:
+            for posicao, (titulo, autor, isbn, categoria, quantidade, disponivel) in enumerate(
+                    resposta.resultado or ()):
+                chave = isbn or ((titulo or '').casefold(), (autor or '').casefold())
+                livro = livros.get(chave)
+                if livro is None:
+                    livro = livros[chave] = dict(titulo=titulo, autor=autor, isbn=isbn,
+                                                 categoria=categoria, posicao=posicao, escolas=[])
+                livro['posicao'] = min(livro['posicao'], posicao)
+                livro['escolas'].append((resposta.nome, quantidade, disponivel))
+        ordenados = sorted(livros.values(), key=lambda l: (l['posicao'], -len(l['escolas']),
+                                                           (l['titulo'] or '').casefold()))
+        return ordenados[:limite], respostas
+
+    def estatisticas(self):
+        """(totais somados {chave: valor}, respostas com os contadores de cada escola)"""
+        respostas = self._em_todas('estatisticas')
+        totais = {}
+        for resposta in respostas:
+            for chave, valor in (resposta.resultado or {}).items():
+                totais[chave] = totais.get(chave, 0) + valor
+        return totais, respostas
+
+    def disponibilidade_isbn(self, isbn):
+        """[(escola, titulo, autor, quantidade, disponivel)] das escolas que têm o ISBN,
+        mais as respostas (para erros e tempos)"""
+        respostas = self._em_todas('isbn', isbn.strip())
+        encontrados = [(r.nome, *r.resultado) for r in respostas if r.resultado]
+        return encontrados, respostas
+
+
+# ---------------------- LINHA DE COMANDO ----------------------
+def _mostrar_respostas(respostas):
+    for resposta in respostas:
+        situacao = f"ERRO: {resposta.erro}" if resposta.erro else "ok"
+        print(f"  {resposta.nome}: {resposta.segundos * 1000:.1f} ms, {situacao}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas em vários bancos de escolas")
+    parser.add_argument('--registro', default=os.path.join(os.path.dirname(DB_PATH), NOME_REGISTRO),
+                        help=f"arquivo com as escolas registradas (padrão {NOME_REGISTRO} ao lado do banco)")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    comando = comandos.add_parser('registrar', help="inclui (ou troca o caminho de) uma escola")
+    comando.add_argument('nome')
+    comando.add_argument('caminho')
+    comando = comandos.add_parser('remover', help="tira uma escola do registro")
+    comando.add_argument('nome')
+    comandos.add_parser('listar', help="mostra as escolas registradas")
+    comando = comandos.add_parser('buscar', help="busca no catálogo de todas as escolas")
+    comando.add_argument('texto')
+    comando.add_argument('--coluna', choices=('titulo', 'autor'))
+    comando.add_argument('--disponiveis', action='store_true', help="só livros com exemplar disponível")
+    comando.add_argument('--limite', type=int, default=LIMITE_BUSCA_FEDERADA)
+    comandos.add_parser('estatisticas', help="contadores somados de todas as escolas")
+    comando = comandos.add_parser('isbn', help="em quais escolas o livro está disponível")
+    comando.add_argument('isbn')
+    args = parser.parse_args()
+
+    escolas = carregar_registro(args.registro)
+    if args.comando == 'registrar':
+        escolas[args.nome] = os.path.abspath(args.caminho)
+        salvar_registro(args.registro, escolas)
+        print(f"{args.nome}: {escolas[args.nome]}")
+        return
+    if args.comando == 'remover':
+        if escolas.pop(args.nome, None) is None:
+            parser.exit(1, f"Escola não registrada: {args.nome}\n")
+        salvar_registro(args.registro, escolas)
+        return
+    if args.comando == 'listar':
+        for nome in sorted(escolas):
+            print(f"{nome}: {escolas[nome]}")
+        return
+    if not escolas:
+        parser.exit(1, f"Nenhuma escola registrada em {args.registro}\n")
+
+    inicio = time.perf_counter()
+    with Federacao(escolas) as federacao:
+        if args.comando == 'buscar':
+            livros, respostas = federacao.buscar(args.texto, args.coluna, args.disponiveis, args.limite)
+            for livro in livros:
+                locais = ', '.join(f"{nome} {disponivel}/{quantidade}"
+                                   for nome, quantidade, disponivel in livro['escolas'])
+                print(f"{livro['titulo']} — {livro['autor']} [{livro['isbn'] or 'sem ISBN'}]: {locais}")
+        elif args.comando == 'estatisticas':
+            totais, respostas = federacao.estatisticas()
+            for chave in sorted(totais):
+                print(f"{chave}: {totais[chave]}")
+        else:
+            encontrados, respostas = federacao.disponibilidade_isbn(args.isbn)
+            for nome, titulo, autor, quantidade, disponivel in encontrados:
+                print(f"{nome}: {titulo} — {autor}, {disponivel} de {quantidade} disponíveis")
+            if not encontrados:
+                print("ISBN não encontrado em nenhuma escola")
+    print(f"{len(escolas)} escolas em {(time.perf_counter() - inicio) * 1000:.0f} ms:")
+    _mostrar_respostas(respostas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# gerador.py
+"""Gera um banco sintético com o esquema real para testes de desempenho.
+
+Os dados imitam uma escola: alunos distribuídos pelas turmas padrão, acervo
+com poucos exemplares por título, popularidade dos livros concentrada em
+poucos títulos (Zipf) e empréstimos ao longo de dois anos, com a maioria já
+devolvida e uma parte dos abertos em atraso. A mesma semente gera sempre o
+mesmo banco.
+
+Uso: python gerador.py destino.db [--livros 100000] [--alunos 20000] [--emprestimos 1000000] [--semente 42]
+"""
+import argparse
+import itertools
+import os
+import random
+from datetime import date, timedelta
+
+from banco import Banco
+from referencia import CATEGORIAS, TURMAS_PADRAO
+
+# Linhas por transação
+TAMANHO_BLOCO = 50000
+
+# Período coberto pelo histórico de empréstimos
+DIAS_HISTORICO = 730
+PRAZO_DIAS = 15
+
+# Chance de um empréstimo continuar aberto, pela idade (dias desde a retirada).
+# Até o prazo, boa parte ainda não voltou; depois disso, o que está aberto é
+# atraso, e bem antigo só sobra o livro "perdido".
+CHANCE_ABERTO = ((PRAZO_DIAS, 0.6), (120, 0.04), (DIAS_HISTORICO, 0.002))
+
+# Peso de cada categoria no acervo (as demais têm peso 1)
+PESO_CATEGORIAS = {'Didático': 6, 'Literatura Brasileira': 5, 'Infantil': 4, 'Juvenil': 4,
+                   'Romance': 3, 'Aventura': 2, 'Fantasia': 2}
+
+# Exemplares por título
+PESO_QUANTIDADE = {1: 60, 2: 20, 3: 10, 4: 4, 5: 3, 8: 2, 10: 1}
+
+# Expoente da distribuição de popularidade dos livros (1.0 = Zipf clássico)
+EXPOENTE_ZIPF = 1.0
+
+NOMES = ('Ana', 'Beatriz', 'Bruno', 'Camila', 'Carlos', 'Daniel', 'Eduarda', 'Felipe',
+         'Gabriel', 'Gabriela', 'Guilherme', 'Heitor', 'Isabela', 'João', 'Júlia', 'Laura',
+         'Lucas', 'Luiza', 'Manuela', 'Maria', 'Mateus', 'Miguel', 'Pedro', 'Rafael',
+         'Sofia', 'Theo', 'Valentina', 'Vitória', 'Arthur', 'Helena', 'Alice', 'Davi')
+SOBRENOMES = ('Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves',
+              'Pereira', 'Lima', 'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho',
+              'Almeida', 'Lopes', 'Soares', 'Fernandes', 'Vieira', 'Barbosa', 'Rocha',
+              'Dias', 'Nascimento', 'Andrade', 'Moreira', 'Nunes', 'Marques', 'Machado')
+PALAVRAS = ('Sol', 'Mar', 'Casa', 'Noite', 'Rio', 'Sertão', 'Estrela', 'Jardim', 'Caminho',
+            'Segredo', 'Cidade', 'Menino', 'Menina', 'Viagem', 'Tempo', 'Floresta', 'Ilha',
+            'Sonho', 'Tesouro', 'Castelo', 'Dragão', 'Vento', 'Lua', 'Memórias', 'História',
+            'Guerra', 'Amor', 'Escola', 'Pássaro', 'Montanha', 'Sombra', 'Luz', 'Fogo')
+CONECTORES = ('do', 'da', 'de', 'e o', 'e a', 'sem', 'além do', 'sob a')
+
+
+def _serie_da_turma(turma):
+    """'701' -> '7º Fundamental', '2003' -> '2º Médio'"""
+    if len(turma) == 3:
+        return f"{turma[0]}º Fundamental"
+    return f"{turma[0]}º Médio"
+
+
+def _pesos_acumulados(pesos):
+    return list(itertools.accumulate(pesos))
+
+
+def _gerar_alunos(rnd, total):
+    ano = date.today().year
+    for i in range(total):
+        turma = rnd.choice(TURMAS_PADRAO)
+        nome = f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}"
+        tem_contato = rnd.random() < 0.7
+        yield (nome, f"{ano}{i:06d}", _serie_da_turma(turma), turma,
+               f"(11) 9{rnd.randint(1000, 9999)}-{rnd.randint(1000, 9999)}" if tem_contato else '',
+               f"aluno{i}@escola.edu.br" if tem_contato else '')
+
+
+def _gerar_livros(rnd, total):
+    autores = [f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)}" for _ in range(max(total // 12, 1))]
+    acum_autores = _pesos_acumulados(1 / (i + 1) for i in range(len(autores)))
+    categorias = list(CATEGORIAS)
+    acum_categorias = _pesos_acumulados(PESO_CATEGORIAS.get(c, 1) for c in categorias)
+    quantidades = list(PESO_QUANTIDADE)
+    acum_quantidades = _pesos_acumulados(PESO_QUANTIDADE.values())
+    for i in range(total):
+        titulo = (f"{rnd.choice(PALAVRAS)} {rnd.choice(CONECTORES)} "
+                  f"{rnd.choice(PALAVRAS)}{'' if rnd.random() < 0.7 else ' ' + str(rnd.randint(2, 9))}")
+        quantidade = rnd.choices(quantidades, cum_weights=acum_quantidades)[0]
+        yield (titulo, rnd.choices(autores, cum_weights=acum_autores)[0], f"978{i:010d}",
+               rnd.choices(categorias, cum_weights=acum_categorias)[0], quantidade, quantidade)
+
+
+def _chance_aberto(idade):
+    for limite, chance in CHANCE_ABERTO:
+        if idade <= limite:
+            return chance
+    return 0.0
+
+
+def _gerar_emprestimos(rnd, total, livros, alunos, disponivel):
+    """Empréstimos em ordem cronológica; `disponivel` (lista por livro) é atualizada"""
+    hoje = date.today()
+    acum_livros = _pesos_acumulados(1 / (i + 1) ** EXPOENTE_ZIPF for i in range(livros))
+    ordem_livros = list(range(1, livros + 1))
+    rnd.shuffle(ordem_livros)  # popularidade não segue a ordem de cadastro
+    por_dia = total / DIAS_HISTORICO
+    gerados = 0
+    for idade in range(DIAS_HISTORICO, -1, -1):
+        dia = hoje - timedelta(days=idade)
+        # Fim de semana quase sem movimento; o resto do dia compensa
+        fator = 0.1 if dia.weekday() >= 5 else 1.36
+        quantidade = total - gerados if idade == 0 else int(rnd.gauss(por_dia * fator, por_dia * 0.1))
+        quantidade = max(0, min(quantidade, total - gerados))
+        retirada = dia.isoformat()
+        prevista = (dia + timedelta(days=PRAZO_DIAS)).isoformat()
+        chance = _chance_aberto(idade)
+        for _ in range(quantidade):
+            livro_id = ordem_livros[rnd.choices(range(livros), cum_weights=acum_livros)[0]]
+            aluno_id = rnd.randint(1, alunos)
+            if rnd.random() < chance and disponivel[livro_id] > 0:
+                disponivel[livro_id] -= 1
+                yield (livro_id, aluno_id, retirada, prevista, None, 'Emprestado')
+            else:
+                devolucao = min(dia + timedelta(days=rnd.randint(1, PRAZO_DIAS + 10)), hoje)
+                yield (livro_id, aluno_id, retirada, prevista, devolucao.isoformat(), 'Devolvido')
+        gerados += quantidade
+
+
+def _inserir(banco, sql, linhas):
+    total = 0
+    while True:
+        bloco = list(itertools.islice(linhas, TAMANHO_BLOCO))
+        if not bloco:
+            return total
+        banco.executar_varios(sql, bloco)
+        total += len(bloco)
+
+
+def gerar(banco, livros=100000, alunos=20000, emprestimos=1000000, semente=42):
+    """Popula um banco vazio (já migrado) e retorna as quantidades geradas"""
+    rnd = random.Random(semente)
+    if banco.consultar_um('SELECT 1 FROM livros LIMIT 1'):
+        raise ValueError("O gerador deve ser usado em um banco vazio")
+    with banco.silenciar():
+        _inserir(banco, '''
+            INSERT INTO alunos (nome, matricula, serie, turma, telefone, email)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', _gerar_alunos(rnd, alunos))
+        _inserir(banco, '''
+            INSERT INTO livros (titulo, autor, isbn, categoria, quantidade, disponivel)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', _gerar_livros(rnd, livros))
+        disponivel = [0] + [r[0] for r in banco.consultar('SELECT quantidade FROM livros ORDER BY id')]
+        _inserir(banco, '''
+            INSERT INTO emprestimos (livro_id, aluno_id, data_emprestimo, data_devolucao_prevista,
+                                     data_devolucao_real, status)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', _gerar_emprestimos(rnd, emprestimos, livros, alunos, disponivel))
+        banco.executar_varios(
+            'UPDATE livros SET disponivel = ? WHERE id = ? AND disponivel <> ?',
+            [(d, i, d) for i, d in enumerate(disponivel) if i])
+    banco.executar('ANALYZE')
+    return {'livros': livros, 'alunos': alunos, 'emprestimos': emprestimos}
+
+
+if __name__ == "__main__":
+    import time
+
+    parser = argparse.ArgumentParser(description="Gera um banco sintético da biblioteca")
+    parser.add_argument('destino')
+    parser.add_argument('--livros', type=int, default=100000)
+    parser.add_argument('--alunos', type=int, default=20000)
+    parser.add_argument('--emprestimos', type=int, default=1000000)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    if os.path.exists(args.destino):
+        parser.error(f"{args.destino} já existe")
+    inicio = time.perf_counter()
+    banco = Banco(args.destino)
+    try:
+        banco.migrar()
+        gerar(banco, args.livros, args.alunos, args.emprestimos, args.semente)
+        ativos, atrasados = banco.consultar_um('''
+            SELECT COUNT(*), SUM(data_devolucao_prevista < date('now', 'localtime'))
+            FROM emprestimos WHERE status = 'Emprestado'
+        ''')
+    finally:
+        banco.fechar()
+    print(f"{args.livros} livros, {args.alunos} alunos, {args.emprestimos} empréstimos "
+          f"({ativos} abertos, {atrasados or 0} atrasados) em {time.perf_counter() - inicio:.1f} s")
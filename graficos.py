@@ -0,0 +1,96 @@
+# graficos.py
+"""Gráficos de barras simples desenhados num tk.Canvas (sem dependências externas)."""
+import math
+
+# Cores das séries, na ordem em que são passadas
+CORES_SERIES = ('#3498db', '#27ae60', '#e67e22', '#9b59b6')
+
+MARGEM = 10
+FONTE = ('Arial', 8)
+
+
+class GraficoBarras:
+    """Barras verticais (uma por rótulo, lado a lado por série) ou horizontais.
+
+    `mostrar` guarda os dados e desenha; o gráfico é redesenhado quando o
+    Canvas muda de tamanho. Com muitos rótulos na vertical, só alguns são
+    escritos no eixo, para não se sobreporem.
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self._dados = None
+        canvas.bind('<Configure>', lambda event: self._desenhar())
+
+    def mostrar(self, rotulos, series, nomes=(), horizontal=False):
+        """`series` é uma lista de listas de valores, uma por série, alinhadas com `rotulos`"""
+        self._dados = (list(rotulos), [list(valores) for valores in series], list(nomes), horizontal)
+        self._desenhar()
+
+    def limpar(self, mensagem=""):
+        self._dados = None
+        self.canvas.delete('all')
+        if mensagem:
+            self.canvas.create_text(self._largura() / 2, self._altura() / 2, text=mensagem,
+                                    fill='#7f8c8d', font=('Arial', 10))
+
+    def _largura(self):
+        return max(self.canvas.winfo_width(), int(self.canvas.cget('width')))
+
+    def _altura(self):
+        return max(self.canvas.winfo_height(), int(self.canvas.cget('height')))
+
+    def _desenhar(self):
+        if self._dados is None:
+            return
+        rotulos, series, nomes, horizontal = self._dados
+        self.canvas.delete('all')
+        if not rotulos:
+            self.limpar("Sem movimento no período")
+            return
+        maximo = max((max(valores) for valores in series if valores), default=0) or 1
+        if horizontal:
+            self._horizontal(rotulos, series, maximo)
+        else:
+            self._vertical(rotulos, series, maximo)
+        for i, nome in enumerate(nomes):
+            x = self._largura() - MARGEM - 110 * (len(nomes) - i)
+            cor = CORES_SERIES[i % len(CORES_SERIES)]
+            self.canvas.create_rectangle(x, MARGEM, x + 10, MARGEM + 10, fill=cor, outline='')
+            self.canvas.create_text(x + 14, MARGEM + 5, text=nome, anchor='w', font=FONTE)
+
+    def _vertical(self, rotulos, series, maximo):
+        largura, altura = self._largura(), self._altura()
+        esquerda, base, topo = MARGEM + 40, altura - MARGEM - 15, MARGEM + 20
+        passo = (largura - esquerda - MARGEM) / len(rotulos)
+        barra = max(passo * 0.8 / len(series), 1)
+        self.canvas.create_line(esquerda, base, largura - MARGEM, base, fill='#7f8c8d')
+        self.canvas.create_text(esquerda - 4, topo, text=f"{maximo}", anchor='e', font=FONTE)
+        self.canvas.create_text(esquerda - 4, base, text="0", anchor='e', font=FONTE)
+        # Um rótulo a cada `salto` barras, para caberem (~60 px cada)
+        salto = max(1, math.ceil(60 / passo))
+        for i, rotulo in enumerate(rotulos):
+            x = esquerda + i * passo + passo * 0.1
+            for s, valores in enumerate(series):
+                y = base - (base - topo) * valores[i] / maximo
+                self.canvas.create_rectangle(x + s * barra, y, x + (s + 1) * barra, base,
+                                             fill=CORES_SERIES[s % len(CORES_SERIES)], outline='')
+            if i % salto == 0:
+                self.canvas.create_text(esquerda + (i + 0.5) * passo, base + 8, text=rotulo, font=FONTE)
+
+    def _horizontal(self, rotulos, series, maximo):
+        largura, altura = self._largura(), self._altura()
+        esquerda, direita, topo = MARGEM + 190, largura - MARGEM - 50, MARGEM + 20
+        passo = (altura - topo - MARGEM) / len(rotulos)
+        barra = max(passo * 0.8 / len(series), 1)
+        for i, rotulo in enumerate(rotulos):
+            y = topo + i * passo + passo * 0.1
+            texto = rotulo if len(rotulo) <= 32 else rotulo[:31] + '…'
+            self.canvas.create_text(esquerda - 6, topo + (i + 0.5) * passo, text=texto,
+                                    anchor='e', font=FONTE)
+            for s, valores in enumerate(series):
+                x = esquerda + (direita - esquerda) * valores[i] / maximo
+                self.canvas.create_rectangle(esquerda, y + s * barra, x, y + (s + 1) * barra,
+                                             fill=CORES_SERIES[s % len(CORES_SERIES)], outline='')
+                self.canvas.create_text(x + 4, y + (s + 0.5) * barra, text=str(valores[i]),
+                                        anchor='w', font=FONTE)
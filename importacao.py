@@ -0,0 +1,309 @@
+# importacao.py
+"""Importação em lote de livros e alunos a partir de planilhas CSV ou XLSX.
+
+O arquivo é lido em blocos (nunca inteiro na memória), cada linha é validada
+e as válidas são gravadas com executemany, uma transação por bloco.
+
+Uso: python importacao.py livros|alunos arquivo.csv [banco.db]
+"""
+import csv
+import itertools
+import os
+import sqlite3
+import sys
+import unicodedata
+
+from referencia import TURMAS_PADRAO
+
+# Linhas por bloco/transação
+TAMANHO_BLOCO = 5000
+
+# Erros guardados no resultado; o relatório em arquivo recebe todos
+MAX_ERROS_MEMORIA = 1000
+
+# Nomes aceitos no cabeçalho (já normalizados) para cada campo
+SINONIMOS = {
+    'titulo': 'titulo', 'autor': 'autor', 'isbn': 'isbn', 'categoria': 'categoria',
+    'quantidade': 'quantidade', 'qtd': 'quantidade', 'exemplares': 'quantidade',
+    'nome': 'nome', 'matricula': 'matricula', 'serie': 'serie', 'turma': 'turma',
+    'telefone': 'telefone', 'email': 'email',
+}
+
+
+def caminho_relatorio_erros(caminho):
+    """Relatório de erros ao lado da planilha: alunos.xlsx -> alunos.erros.csv"""
+    return os.path.splitext(caminho)[0] + '.erros.csv'
+
+
+class ErroImportacao(Exception):
+    """Arquivo que não pode ser importado (formato, cabeçalho ou dependência)"""
+
+
+class ResultadoImportacao:
+    """Totais da importação e os erros por linha"""
+
+    def __init__(self):
+        self.processadas = 0
+        self.importadas = 0
+        self.total_erros = 0
+        self.erros = []  # (número da linha no arquivo, mensagem)
+
+    def registrar_erro(self, numero, mensagem):
+        self.total_erros += 1
+        if len(self.erros) < MAX_ERROS_MEMORIA:
+            self.erros.append((numero, mensagem))
+
+
+# ---------------------- LEITURA ----------------------
+def _normalizar_cabecalho(nome):
+    sem_acento = unicodedata.normalize('NFKD', str(nome or '')).encode('ascii', 'ignore').decode()
+    chave = ''.join(c for c in sem_acento.lower() if c.isalnum())
+    return SINONIMOS.get(chave, chave)
+
+
+def _linhas_csv(caminho):
+    with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+        amostra = arquivo.read(4096)
+        arquivo.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=';,\t')
+        except csv.Error:
+            dialeto = csv.excel
+        leitor = csv.reader(arquivo, dialeto)
+        cabecalho = next(leitor, None)
+        if not cabecalho:
+            return
+        campos = [_normalizar_cabecalho(c) for c in cabecalho]
+        for numero, valores in enumerate(leitor, start=2):
+            if any(v.strip() for v in valores):
+                yield numero, dict(zip(campos, valores))
+
+
+def _linhas_xlsx(caminho):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ErroImportacao("Para importar XLSX instale o pacote openpyxl (ou salve a planilha como CSV).")
+    # read_only lê a planilha em fluxo, sem montar todas as células na memória
+    planilha = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        linhas = planilha.active.iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if not cabecalho:
+            return
+        campos = [_normalizar_cabecalho(c) for c in cabecalho]
+        for numero, valores in enumerate(linhas, start=2):
+            valores = ['' if v is None else str(v) for v in valores]
+            if any(v.strip() for v in valores):
+                yield numero, dict(zip(campos, valores))
+    finally:
+        planilha.close()
+
+
+def ler_planilha(caminho):
+    """Gera (número da linha, {campo: valor}) para cada linha com conteúdo"""
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao in ('.xlsx', '.xlsm'):
+        return _linhas_xlsx(caminho)
+    if extensao in ('.csv', '.txt'):
+        return _linhas_csv(caminho)
+    raise ErroImportacao(f"Formato não suportado: {extensao or caminho}")
+
+
+# ---------------------- VALIDAÇÃO ----------------------
+def _texto(linha, campo):
+    return (linha.get(campo) or '').strip()
+
+
+def _existentes(banco, tabela, coluna, valores):
+    """Quais dos valores já existem na coluna (consulta pelo índice UNIQUE)"""
+    if not valores:
+        return set()
+    valores = list(valores)
+    encontrados = set()
+    # Respeita o limite de parâmetros do SQLite
+    for inicio in range(0, len(valores), 900):
+        parte = valores[inicio:inicio + 900]
+        encontrados.update(r[0] for r in banco.consultar(
+            f"SELECT {coluna} FROM {tabela} WHERE {coluna} IN ({', '.join('?' * len(parte))})", parte))
+    return encontrados
+
+
+class _Livros:
+    tabela = 'livros'
+    chave = 'isbn'
+    insert = '''
+        INSERT INTO livros (titulo, autor, isbn, categoria, quantidade, disponivel)
+        VALUES (?, ?, ?, ?, ?, ?)
+    '''
+
+    def __init__(self, banco):
+        pass
+
+    def validar(self, linha):
+        """Retorna (valores para o INSERT, chave única) ou lança ValueError"""
+        titulo, autor = _texto(linha, 'titulo'), _texto(linha, 'autor')
+        if not titulo or not autor:
+            raise ValueError("Título e Autor são obrigatórios")
+        quantidade = _texto(linha, 'quantidade') or '1'
+        try:
+            quantidade = int(float(quantidade.replace(',', '.')))
+        except ValueError:
+            raise ValueError(f"Quantidade inválida: {quantidade}")
+        if quantidade < 1:
+            raise ValueError("Quantidade deve ser maior que zero")
+        isbn = _texto(linha, 'isbn') or None
+        return (titulo, autor, isbn, _texto(linha, 'categoria'), quantidade, quantidade), isbn
+
+
+class _Alunos:
+    tabela = 'alunos'
+    chave = 'matricula'
+    insert = '''
+        INSERT INTO alunos (nome, matricula, serie, turma, telefone, email)
+        VALUES (?, ?, ?, ?, ?, ?)
+    '''
+
+    def __init__(self, banco):
+        self.turmas = set(TURMAS_PADRAO)
+        self.turmas.update(r[0] for r in banco.consultar(
+            'SELECT DISTINCT turma FROM alunos WHERE turma IS NOT NULL AND turma <> ""'))
+
+    def validar(self, linha):
+        nome, matricula = _texto(linha, 'nome'), _texto(linha, 'matricula')
+        if not nome or not matricula:
+            raise ValueError("Nome e Matrícula são obrigatórios")
+        turma = _texto(linha, 'turma')
+        if turma.endswith('.0'):
+            # Planilhas costumam gravar a turma como número
+            turma = turma[:-2]
+        if turma and turma not in self.turmas:
+            raise ValueError(f"Turma desconhecida: {turma}")
+        return (nome, matricula, _texto(linha, 'serie'), turma,
+                _texto(linha, 'telefone'), _texto(linha, 'email')), matricula
+
+
+TIPOS = {'livros': _Livros, 'alunos': _Alunos}
+
+
+# ---------------------- GRAVAÇÃO ----------------------
+def importar(banco, tipo, caminho, progresso=None, relatorio_erros=None,
+             tamanho_bloco=TAMANHO_BLOCO):
+    """Importa livros ou alunos do arquivo e retorna um ResultadoImportacao.
+
+    progresso(resultado) é chamado após cada bloco gravado. Se relatorio_erros
+    for um caminho, todas as linhas rejeitadas são gravadas nele (CSV).
+    As mudanças não geram avisos por linha: recarregue as listas ao final.
+    """
+    if tipo not in TIPOS:
+        raise ErroImportacao(f"Tipo de importação desconhecido: {tipo}")
+    regras = TIPOS[tipo](banco)
+    resultado = ResultadoImportacao()
+    vistas = set()  # chaves únicas já vistas no arquivo
+    linhas = ler_planilha(caminho)
+
+    arquivo_erros = escritor_erros = None
+    if relatorio_erros:
+        arquivo_erros = open(relatorio_erros, 'w', newline='', encoding='utf-8-sig')
+        escritor_erros = csv.writer(arquivo_erros, delimiter=';')
+        escritor_erros.writerow(['linha', 'erro'])
+
+    def erro(numero, mensagem):
+        resultado.registrar_erro(numero, mensagem)
+        if escritor_erros:
+            escritor_erros.writerow([numero, mensagem])
+
+    try:
+        with banco.silenciar():
+            while True:
+                bloco = list(itertools.islice(linhas, tamanho_bloco))
+                if not bloco:
+                    break
+                validas = []
+                for numero, linha in bloco:
+                    try:
+                        valores, chave = regras.validar(linha)
+                    except ValueError as e:
+                        erro(numero, str(e))
+                        continue
+                    if chave is not None and chave in vistas:
+                        erro(numero, f"{regras.chave} repetido no arquivo: {chave}")
+                        continue
+                    if chave is not None:
+                        vistas.add(chave)
+                    validas.append((numero, valores, chave))
+                # Chaves que já estão no banco, em uma consulta por bloco
+                existentes = _existentes(banco, regras.tabela, regras.chave,
+                                         {c for _, _, c in validas if c is not None})
+                gravar = []
+                for numero, valores, chave in validas:
+                    if chave in existentes:
+                        erro(numero, f"{regras.chave} já existe no sistema: {chave}")
+                    else:
+                        gravar.append((numero, valores))
+                resultado.importadas += _gravar_bloco(banco, regras.insert, gravar, erro)
+                resultado.processadas += len(bloco)
+                if progresso:
+                    progresso(resultado)
+    finally:
+        if arquivo_erros:
+            arquivo_erros.close()
+            if not resultado.total_erros:
+                os.remove(relatorio_erros)
+    return resultado
+
+
+def _gravar_bloco(banco, insert, linhas, erro):
+    """Grava o bloco em uma transação; se algo violar restrição, refaz linha a linha.
+
+    As duas tentativas passam por banco.gravar, que repete a transação se o
+    balcão estiver gravando; os erros só são relatados depois do commit,
+    para uma repetição não relatar a mesma linha duas vezes.
+    """
+    if not linhas:
+        return 0
+    try:
+        banco.gravar(lambda cursor: cursor.executemany(insert, [valores for _, valores in linhas]))
+        return len(linhas)
+    except sqlite3.IntegrityError:
+        pass
+
+    # Outro balcão gravou a mesma chave no meio tempo: isola as linhas culpadas
+    def isolar(cursor):
+        recusadas = []
+        for numero, valores in linhas:
+            try:
+                cursor.execute('SAVEPOINT linha')
+                cursor.execute(insert, valores)
+                cursor.execute('RELEASE linha')
+            except sqlite3.IntegrityError as e:
+                cursor.execute('ROLLBACK TO linha')
+                cursor.execute('RELEASE linha')
+                recusadas.append((numero, f"Restrição violada: {e}"))
+        return recusadas
+
+    recusadas = banco.gravar(isolar)
+    for numero, mensagem in recusadas:
+        erro(numero, mensagem)
+    return len(linhas) - len(recusadas)
+
+
+if __name__ == "__main__":
+    from banco import DB_PATH, Banco
+
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(2)
+    tipo, caminho = sys.argv[1], sys.argv[2]
+    banco = Banco(sys.argv[3] if len(sys.argv) > 3 else DB_PATH)
+    try:
+        banco.migrar()
+        resultado = importar(
+            banco, tipo, caminho,
+            progresso=lambda r: print(f"{r.processadas} linhas, {r.importadas} importadas, {r.total_erros} erros"),
+            relatorio_erros=caminho_relatorio_erros(caminho))
+    finally:
+        banco.fechar()
+    print(f"Concluído: {resultado.importadas} importadas, {resultado.total_erros} erros")
+    if resultado.total_erros:
+        print(f"Erros em {caminho_relatorio_erros(caminho)}")
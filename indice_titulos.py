@@ -0,0 +1,309 @@
+# indice_titulos.py
+"""Índice dos títulos do catálogo em memória, para o autocomplete de livros.
+
+Os títulos normalizados (minúsculas, sem acentos) ficam todos em uma única
+string, em ordem alfabética, um por linha. Dois arrays de inteiros guardam
+onde cada título começa na string e o id do livro; um bytearray indexado
+pelo id marca os livros com exemplar disponível. Título e autor como
+cadastrados ficam numa segunda string, na mesma ordem, para as sugestões
+saírem da memória sem ler o banco. Começo de título é busca binária; trecho
+no meio do título é str.find na string inteira, parando ao juntar o limite
+pedido.
+
+O índice acompanha o banco pelos avisos do Banco: aplicar em 'livros'
+(cadastro, disponibilidade) e aplicar_troca_titulo em 'livros.titulo'.
+Gravações sem aviso (outros balcões, importação) pedem sincronizar(), que
+roda fora da thread da interface: refaz a disponibilidade e compara a versão
+dos títulos (tabela versoes, mantida por gatilhos). Se outra conexão
+cadastrou, excluiu ou renomeou um livro desde a carga, o índice precisa ser
+carregado de novo.
+
+Uso: python indice_titulos.py [banco.db]  -> memória e tempo de consulta do índice
+"""
+import bisect
+import re
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+
+# Marcas de acento que sobram depois da decomposição NFKD
+_ACENTOS = re.compile('[\u0300-\u036f]')
+
+
+def _sem_acentos(texto):
+    return _ACENTOS.sub('', unicodedata.normalize('NFKD', texto)).lower()
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e sem quebras de linha ("Sertão" -> "sertao")"""
+    return _sem_acentos(texto.replace('\n', ' ').replace('\r', ' '))
+
+
+def _exibicao(titulo, autor):
+    # Título e autor como cadastrados, numa linha: tabulação e quebras viram espaço
+    return '\t'.join(re.sub('[\t\r\n]', ' ', parte or '') for parte in (titulo, autor)) + '\n'
+
+
+class IndiceTitulos:
+    """Títulos normalizados em ordem, com ids, exibição e disponibilidade"""
+
+    def __init__(self, banco):
+        self.banco = banco
+        self._texto = ''
+        self._inicios = array('i', [0])  # início de cada título (+ o fim da string)
+        self._ids = array('i')            # id do livro de cada título, na mesma ordem
+        self._exibicao = ''               # "titulo\tautor" originais, na mesma ordem
+        self._inicios_exibicao = array('i', [0])
+        self._disponivel = bytearray()     # por id: 1 se há exemplar disponível
+        self._maior_id = 0
+        self._versao = None  # versão dos títulos no banco quando o índice foi carregado
+        self._tocados = None  # ids avisados durante um sincronizar() em andamento
+        self._lock = threading.Lock()
+        self.pronto = False
+
+    def __len__(self):
+        return len(self._ids)
+
+    # ---------------------- CARGA ----------------------
+    def _versao_titulos(self):
+        return self.banco.consultar_um("SELECT valor FROM versoes WHERE chave = 'titulos'")[0]
+
+    def carregar(self):
+        """Lê todo o catálogo e troca o conteúdo do índice (pode rodar fora da thread da interface)"""
+        # Lida antes dos títulos: uma troca no meio da leitura faz a próxima sincronização recarregar
+        versao = self._versao_titulos()
+        linhas = self.banco.consultar('SELECT id, titulo, autor, disponivel FROM livros')
+        # Normaliza tudo de uma vez: uma chamada para o catálogo inteiro
+        titulos = _sem_acentos('\n'.join(
+            (linha[1] or '').replace('\n', ' ').replace('\r', ' ') for linha in linhas)).split('\n')
+        ordem = sorted(range(len(linhas)), key=titulos.__getitem__)
+        texto = ''.join(titulos[i] + '\n' for i in ordem)
+        inicios = array('i', [0])
+        for i in ordem:
+            inicios.append(inicios[-1] + len(titulos[i]) + 1)
+        exibicoes = [_exibicao(linhas[i][1], linhas[i][2]) for i in ordem]
+        exibicao = ''.join(exibicoes)
+        inicios_exibicao = array('i', [0])
+        for linha in exibicoes:
+            inicios_exibicao.append(inicios_exibicao[-1] + len(linha))
+        ids = array('i', (linhas[i][0] for i in ordem))
+        maior_id = max(ids, default=0)
+        disponiveis = bytearray(maior_id + 1)
+        for livro_id, _, _, disponivel in linhas:
+            disponiveis[livro_id] = (disponivel or 0) > 0
+        with self._lock:
+            self._texto, self._inicios, self._ids = texto, inicios, ids
+            self._exibicao, self._inicios_exibicao = exibicao, inicios_exibicao
+            self._disponivel, self._maior_id = disponiveis, maior_id
+            self._versao = versao
+            self.pronto = True
+
+    def sincronizar(self):
+        """Refaz a disponibilidade após gravações sem aviso (pode rodar fora da
+        thread da interface: o índice segue respondendo durante a leitura).
+
+        Retorna False se os títulos mudaram no banco desde a carga (livro
+        cadastrado, excluído ou renomeado por outra conexão): só carregar()
+        de novo põe o índice em dia. Até lá ele continua respondendo com o
+        catálogo da última carga.
+        """
+        with self._lock:
+            self._tocados = set()
+        try:
+            atualizado = self._versao_titulos() == self._versao
+            indisponiveis = self.banco.consultar('SELECT id FROM livros WHERE NOT disponivel > 0')
+        except BaseException:
+            with self._lock:
+                self._tocados = None
+            raise
+        with self._lock:
+            disponiveis = bytearray(b'\x01') * len(self._disponivel)
+            for (livro_id,) in indisponiveis:
+                if livro_id < len(disponiveis):
+                    disponiveis[livro_id] = 0
+            # Avisos aplicados durante a leitura podem ser mais novos que ela
+            for livro_id in self._tocados:
+                if livro_id < len(disponiveis):
+                    disponiveis[livro_id] = self._disponivel[livro_id]
+            self._disponivel = disponiveis
+            self._tocados = None
+        return atualizado
+
+    # ---------------------- AVISOS DO BANCO ----------------------
+    def aplicar(self, acao, ids):
+        """Aviso de mudança em livros: cadastro, exclusão ou disponibilidade"""
+        if not self.pronto:
+            # Ainda carregando: quem carrega chama sincronizar() ao terminar
+            return
+        if acao == 'delete':
+            with self._lock:
+                for livro_id in ids:
+                    self._remover(livro_id)
+            return
+        linhas = self._livros(ids)
+        with self._lock:
+            for livro_id, titulo, autor, disponivel in linhas:
+                if acao == 'insert':
+                    self._adicionar(livro_id, titulo, autor, disponivel)
+                elif livro_id < len(self._disponivel):
+                    self._disponivel[livro_id] = (disponivel or 0) > 0
+            if self._tocados is not None:
+                self._tocados.update(ids)
+
+    def aplicar_troca_titulo(self, acao, ids):
+        """Aviso de livros.titulo alterado: o título muda de lugar na ordem"""
+        if not self.pronto:
+            return
+        linhas = self._livros(ids)
+        with self._lock:
+            for livro_id, titulo, autor, disponivel in linhas:
+                self._remover(livro_id)
+                self._adicionar(livro_id, titulo, autor, disponivel)
+            if self._tocados is not None:
+                self._tocados.update(ids)
+
+    def _livros(self, ids):
+        return self.banco.consultar(f'''
+            SELECT id, titulo, autor, disponivel FROM livros WHERE id IN ({', '.join('?' * len(ids))})
+        ''', ids)
+
+    def _adicionar(self, livro_id, titulo, autor, disponivel):
+        chave = normalizar(titulo or '')
+        i = bisect.bisect_right(range(len(self._ids)), chave, key=self._titulo)
+        inicio = self._inicios[i]
+        tamanho = len(chave) + 1
+        self._texto = self._texto[:inicio] + chave + '\n' + self._texto[inicio:]
+        self._inicios[i + 1:] = array('i', (x + tamanho for x in self._inicios[i:]))
+        linha = _exibicao(titulo, autor)
+        inicio = self._inicios_exibicao[i]
+        self._exibicao = self._exibicao[:inicio] + linha + self._exibicao[inicio:]
+        self._inicios_exibicao[i + 1:] = array('i', (x + len(linha) for x in self._inicios_exibicao[i:]))
+        self._ids.insert(i, livro_id)
+        if livro_id >= len(self._disponivel):
+            self._disponivel.extend(bytes(livro_id + 1 - len(self._disponivel)))
+        self._disponivel[livro_id] = (disponivel or 0) > 0
+        self._maior_id = max(self._maior_id, livro_id)
+
+    def _remover(self, livro_id):
+        try:
+            i = self._ids.index(livro_id)
+        except ValueError:
+            return
+        inicio, fim = self._inicios[i], self._inicios[i + 1]
+        self._texto = self._texto[:inicio] + self._texto[fim:]
+        self._inicios[i:] = array('i', (x - (fim - inicio) for x in self._inicios[i + 1:]))
+        inicio, fim = self._inicios_exibicao[i], self._inicios_exibicao[i + 1]
+        self._exibicao = self._exibicao[:inicio] + self._exibicao[fim:]
+        self._inicios_exibicao[i:] = array('i', (x - (fim - inicio) for x in self._inicios_exibicao[i + 1:]))
+        del self._ids[i]
+
+    # ---------------------- CONSULTAS ----------------------
+    def sugestoes(self, texto, limite):
+        """Sugestões (id, titulo, autor), como busca.sugerir_titulos, sem ler o banco"""
+        with self._lock:
+            sugestoes = []
+            for i in self._posicoes(texto, limite):
+                linha = self._exibicao[self._inicios_exibicao[i]:self._inicios_exibicao[i + 1] - 1]
+                titulo, autor = linha.split('\t')
+                sugestoes.append((self._ids[i], titulo, autor))
+        return sugestoes
+
+    def _titulo(self, i):
+        return self._texto[self._inicios[i]:self._inicios[i + 1] - 1]
+
+    def sugerir(self, texto, limite):
+        """Ids dos livros disponíveis cujo título começa com o texto, depois dos
+        que contêm o texto e dos que contêm todas as palavras, até `limite`"""
+        with self._lock:
+            return [self._ids[i] for i in self._posicoes(texto, limite)]
+
+    def _posicoes(self, texto, limite):
+        # Posições na ordem dos títulos; quem chama segura o lock
+        palavras = normalizar(texto).split()
+        if not palavras:
+            return []
+        consulta = ' '.join(palavras)
+        encontrados = self._prefixo(consulta, limite)
+        # Depois o texto inteiro no meio do título e, por fim, as palavras em qualquer ordem
+        for termos in ([consulta], palavras if len(palavras) > 1 else None):
+            if termos and len(encontrados) < limite:
+                encontrados += self._contendo(termos, limite - len(encontrados), set(encontrados))
+        return encontrados
+
+    def _prefixo(self, consulta, limite):
+        encontrados = []
+        i = bisect.bisect_left(range(len(self._ids)), consulta, key=self._titulo)
+        while i < len(self._ids) and len(encontrados) < limite:
+            if not self._texto.startswith(consulta, self._inicios[i]):
+                break
+            if self._disponivel[self._ids[i]]:
+                encontrados.append(i)
+            i += 1
+        return encontrados
+
+    def _contendo(self, palavras, limite, ignorar):
+        # Procura a palavra mais longa (mais rara) e confere as demais no título achado
+        maior = max(palavras, key=len)
+        outras = [palavra for palavra in palavras if palavra != maior]
+        encontrados = []
+        posicao = self._texto.find(maior)
+        while posicao >= 0 and len(encontrados) < limite:
+            i = bisect.bisect_right(self._inicios, posicao) - 1
+            fim = self._inicios[i + 1]
+            if (self._disponivel[self._ids[i]] and i not in ignorar
+                    and all(self._texto.find(palavra, self._inicios[i], fim) >= 0 for palavra in outras)):
+                encontrados.append(i)
+            posicao = self._texto.find(maior, fim)
+        return encontrados
+
+    # ---------------------- MEMÓRIA ----------------------
+    def memoria(self):
+        """Bytes ocupados por parte do índice"""
+        with self._lock:
+            return {
+                'titulos': sys.getsizeof(self._texto),
+                'inicios': self._inicios.buffer_info()[1] * self._inicios.itemsize,
+                'ids': self._ids.buffer_info()[1] * self._ids.itemsize,
+                'exibicao': sys.getsizeof(self._exibicao),
+                'inicios_exib': self._inicios_exibicao.buffer_info()[1] * self._inicios_exibicao.itemsize,
+                'disponivel': len(self._disponivel),
+            }
+
+
+if __name__ == "__main__":
+    import random
+
+    from banco import DB_PATH, Banco
+    from busca import LIMITE_SUGESTOES
+
+    banco = Banco(sys.argv[1] if len(sys.argv) > 1 else DB_PATH)
+    try:
+        banco.migrar()
+        indice = IndiceTitulos(banco)
+        inicio = time.perf_counter()
+        indice.carregar()
+        print(f"{len(indice)} títulos carregados em {(time.perf_counter() - inicio) * 1000:.0f} ms")
+        memoria = indice.memoria()
+        for parte, tamanho in memoria.items():
+            print(f"  {parte:12s} {tamanho / 1024:10.1f} KiB")
+        print(f"  {'total':12s} {sum(memoria.values()) / 1024:10.1f} KiB")
+
+        titulos = [r[0] for r in banco.consultar('SELECT titulo FROM livros ORDER BY random() LIMIT 200')]
+        rnd = random.Random(42)
+        for nome, gerar in (
+                ('prefixo', lambda t: t[:1 + rnd.randrange(6)]),
+                ('trecho', lambda t: t[len(t) // 2:len(t) // 2 + 2 + rnd.randrange(4)]),
+                ('palavras', lambda t: ' '.join(p[:3] for p in t.split()[-2:]))):
+            tempos = []
+            for titulo in titulos:
+                consulta = gerar(titulo)
+                comeco = time.perf_counter()
+                indice.sugerir(consulta, LIMITE_SUGESTOES)
+                tempos.append((time.perf_counter() - comeco) * 1000)
+            tempos.sort()
+            print(f"{nome:9s} mediana {tempos[len(tempos) // 2]:.3f} ms  "
+                  f"p95 {tempos[int(len(tempos) * 0.95)]:.3f} ms  máx {tempos[-1]:.3f} ms")
+    finally:
+        banco.fechar()
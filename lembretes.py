@@ -0,0 +1,111 @@
+# lembretes.py
+"""Agenda dos lembretes de devolução, guiada pelos vencimentos em vez de polling."""
+import heapq
+from datetime import date, datetime, timedelta
+
+# Maior intervalo entre duas checagens do relógio (ms). Não consulta o banco;
+# só protege contra suspensão do computador ou mudança de horário.
+ESPERA_MAXIMA = 60 * 60 * 1000
+
+
+class AgendaDevolucoes:
+    """Mantém em memória os vencimentos dos empréstimos abertos.
+
+    Um heap de (data_devolucao_prevista, id) diz qual é o próximo dia com
+    devoluções. A agenda dorme até a meia-noite desse dia e só então chama
+    `ao_vencer()`, que faz a consulta e mostra o lembrete. Empréstimos novos,
+    renovados ou devolvidos chegam por aplicar() (avisos do Banco); gravações
+    de outros balcões, por recarregar().
+    """
+
+    def __init__(self, root, banco, ao_vencer):
+        self.root = root
+        self.banco = banco
+        self.ao_vencer = ao_vencer
+        self._heap = []
+        self._vencimentos = {}  # id -> data atual (entradas antigas do heap são ignoradas)
+        self._agendado = None
+        self._dia_verificado = None
+
+    def iniciar(self):
+        """Carrega os vencimentos e agenda a primeira checagem"""
+        self.recarregar()
+
+    def recarregar(self):
+        """Relê os vencimentos de hoje em diante (uma busca pelo índice de status/data)"""
+        hoje = date.today().isoformat()
+        linhas = self.banco.consultar('''
+            SELECT id, data_devolucao_prevista FROM emprestimos
+            WHERE status = 'Emprestado' AND data_devolucao_prevista >= ?
+        ''', (hoje,))
+        self._vencimentos = {id_emp: data for id_emp, data in linhas}
+        self._heap = [(data, id_emp) for id_emp, data in linhas]
+        heapq.heapify(self._heap)
+        self._dia_verificado = None
+        self.verificar()
+
+    def aplicar(self, acao, ids):
+        """Atualiza o heap com empréstimos criados, renovados ou devolvidos"""
+        if acao == 'delete':
+            for id_emp in ids:
+                self._vencimentos.pop(id_emp, None)
+            return
+        hoje = date.today().isoformat()
+        linhas = self.banco.consultar(f'''
+            SELECT id, status, data_devolucao_prevista FROM emprestimos
+            WHERE id IN ({', '.join('?' * len(ids))})
+        ''', ids)
+        vence_hoje = False
+        for id_emp, status, data in linhas:
+            if status == 'Emprestado' and data and data >= hoje:
+                if self._vencimentos.get(id_emp) != data:
+                    self._vencimentos[id_emp] = data
+                    heapq.heappush(self._heap, (data, id_emp))
+                vence_hoje = vence_hoje or data == hoje
+            else:
+                self._vencimentos.pop(id_emp, None)
+        if vence_hoje:
+            self._dia_verificado = None
+            self.verificar()
+
+    def proximo_vencimento(self):
+        """Data (AAAA-MM-DD) da próxima devolução aberta a partir de hoje, ou None"""
+        hoje = date.today().isoformat()
+        while self._heap:
+            data, id_emp = self._heap[0]
+            if data < hoje or self._vencimentos.get(id_emp) != data:
+                heapq.heappop(self._heap)
+                if data < hoje:
+                    self._vencimentos.pop(id_emp, None)
+                continue
+            return data
+        return None
+
+    def verificar(self):
+        """Chama ao_vencer() se há devolução prevista para hoje e reagenda"""
+        hoje = date.today().isoformat()
+        try:
+            if self._dia_verificado != hoje and self.proximo_vencimento() == hoje:
+                self._dia_verificado = hoje
+                self.ao_vencer()
+        finally:
+            self._agendar()
+
+    def parar(self):
+        """Cancela a próxima checagem agendada"""
+        if self._agendado is not None:
+            self.root.after_cancel(self._agendado)
+            self._agendado = None
+
+    def _agendar(self):
+        self.parar()
+        agora = datetime.now()
+        espera = ESPERA_MAXIMA
+        proximo = self.proximo_vencimento()
+        if proximo is not None and proximo > agora.date().isoformat():
+            alvo = datetime.strptime(proximo, '%Y-%m-%d')
+        else:
+            # Só há vencimento hoje (já tratado) ou nenhum: reavalia na virada do dia
+            alvo = datetime.combine(agora.date() + timedelta(days=1), datetime.min.time())
+        espera = min(espera, int((alvo - agora).total_seconds() * 1000) + 1000)
+        self._agendado = self.root.after(max(espera, 1000), self.verificar)
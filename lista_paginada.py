@@ -0,0 +1,212 @@
+# lista_paginada.py
+"""Treeview que carrega linhas sob demanda, página a página, direto do SQLite."""
+
+# Linhas buscadas por vez: cobre a área visível com folga
+TAMANHO_PAGINA = 100
+
+# Quando a parte visível passa desta fração do que já foi carregado, busca a próxima página
+LIMIAR_CARREGAR = 0.9
+
+
+class ListaPaginada:
+    """Preenche uma Treeview com paginação por chave (keyset) em vez de fetchall.
+
+    Só a primeira página é buscada ao recarregar; as seguintes vêm conforme a
+    barra de rolagem se aproxima do fim. Cada página continua de onde a
+    anterior parou com `WHERE (chave, id) > (?, ?)`, o que mantém o custo
+    constante em qualquer ponto da lista desde que exista índice para a ordem.
+
+    - campos: lista do SELECT com as colunas exibidas; a primeira deve ser o id,
+      que também vira o identificador do item na Treeview
+    - origem: trecho FROM (tabelas e joins)
+    - ordens: {coluna da Treeview: (expressões SQL da chave de ordenação)};
+      a última expressão deve ser única (normalmente o id) e todas NOT NULL
+    - filtro: função sem argumentos que retorna (condição SQL, parâmetros)
+    - formatar: função que converte a linha do banco nos valores exibidos
+    - coluna_id: expressão SQL do id (ex.: 'e.id' quando há joins)
+
+    aplicar() recebe os avisos de mudança do Banco e corrige só as linhas
+    afetadas, sem recarregar a lista.
+    """
+
+    def __init__(self, tree, scrollbar, banco, campos, origem, ordens,
+                 ordem_inicial, descendente=False, filtro=None, formatar=None,
+                 tamanho_pagina=TAMANHO_PAGINA, coluna_id='id'):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.banco = banco
+        self.campos = campos
+        self.origem = origem
+        self.ordens = ordens
+        self.ordem = ordem_inicial
+        self.descendente = descendente
+        self.filtro = filtro
+        self.formatar = formatar
+        self.tamanho_pagina = tamanho_pagina
+        self.coluna_id = coluna_id
+        self._ultima_chave = None
+        self._fim = True
+        self._fixa = False
+        self._chaves = {}
+        self._carregando = False
+        self._titulos = {col: tree.heading(col, 'text') for col in tree['columns']}
+
+        self.tree.configure(yscrollcommand=self._rolou)
+        for coluna in ordens:
+            self.tree.heading(coluna, command=lambda c=coluna: self.ordenar(c))
+        self._marcar_cabecalho()
+
+    # ---------------------- API ----------------------
+    def recarregar(self):
+        """Descarta as linhas exibidas e busca a primeira página"""
+        self.tree.delete(*self.tree.get_children())
+        self._chaves.clear()
+        self._ultima_chave = None
+        self._fim = False
+        self._fixa = False
+        self.carregar_mais()
+
+    def mostrar(self, linhas):
+        """Exibe um conjunto fixo de linhas (ex.: resultado de busca), sem paginação"""
+        self.tree.delete(*self.tree.get_children())
+        self._chaves.clear()
+        self._fim = True
+        self._fixa = True
+        for linha in linhas:
+            self.tree.insert('', 'end', iid=str(linha[0]), values=self._formatar(linha))
+
+    def aplicar(self, acao, ids):
+        """Atualiza, insere ou remove apenas as linhas com os ids informados"""
+        for id_linha in ids:
+            iid = str(id_linha)
+            if acao == 'delete':
+                self._remover(iid)
+                continue
+            linha = self._buscar_linha(id_linha)
+            if linha is None:
+                # Deixou de satisfazer o filtro (ex.: empréstimo devolvido)
+                self._remover(iid)
+            elif self._fixa:
+                # Resultado de busca: só corrige o que já está na tela
+                if self.tree.exists(iid):
+                    self.tree.item(iid, values=self._formatar(linha[0]))
+            else:
+                self._posicionar(iid, *linha)
+
+    def ordenar(self, coluna):
+        """Ordena pela coluna (no SQL); clicar de novo inverte o sentido"""
+        if coluna == self.ordem:
+            self.descendente = not self.descendente
+        else:
+            self.ordem = coluna
+            self.descendente = False
+        self._marcar_cabecalho()
+        self.recarregar()
+
+    def carregar_mais(self):
+        """Busca a próxima página e acrescenta ao fim da lista"""
+        if self._fim or self._carregando:
+            return
+        self._carregando = True
+        try:
+            chaves = self.ordens[self.ordem]
+            condicoes, params = self._condicoes_filtro()
+            if self._ultima_chave is not None:
+                operador = '<' if self.descendente else '>'
+                condicoes.append(
+                    f"({', '.join(chaves)}) {operador} ({', '.join('?' * len(chaves))})")
+                params.extend(self._ultima_chave)
+            sentido = ' DESC' if self.descendente else ''
+            where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+            linhas = self.banco.consultar(f'''
+                SELECT {self.campos}, {', '.join(chaves)}
+                FROM {self.origem}
+                {where}
+                ORDER BY {', '.join(c + sentido for c in chaves)}
+                LIMIT ?
+            ''', params + [self.tamanho_pagina])
+            n = len(chaves)
+            for linha in linhas:
+                iid = str(linha[0])
+                if self.tree.exists(iid):
+                    # Já inserida por aplicar() antes desta página chegar
+                    continue
+                self.tree.insert('', 'end', iid=iid, values=self._formatar(linha[:-n]))
+                self._chaves[iid] = linha[-n:]
+            if linhas:
+                self._ultima_chave = linhas[-1][-n:]
+            self._fim = len(linhas) < self.tamanho_pagina
+        finally:
+            self._carregando = False
+
+    # ---------------------- INTERNOS ----------------------
+    def _condicoes_filtro(self):
+        if self.filtro is None:
+            return [], []
+        condicao, params = self.filtro()
+        return ([condicao], list(params)) if condicao else ([], [])
+
+    def _buscar_linha(self, id_linha):
+        """(valores, chave) da linha se ela pertence à lista, senão None"""
+        chaves = self.ordens[self.ordem]
+        condicoes, params = self._condicoes_filtro()
+        condicoes.append(f"{self.coluna_id} = ?")
+        linha = self.banco.consultar_um(f'''
+            SELECT {self.campos}, {', '.join(chaves)}
+            FROM {self.origem}
+            WHERE {' AND '.join(condicoes)}
+        ''', params + [id_linha])
+        if linha is None:
+            return None
+        n = len(chaves)
+        return linha[:-n], tuple(linha[-n:])
+
+    def _remover(self, iid):
+        if self.tree.exists(iid):
+            self.tree.delete(iid)
+        self._chaves.pop(iid, None)
+
+    def _antes(self, a, b):
+        return a > b if self.descendente else a < b
+
+    def _posicionar(self, iid, valores, chave):
+        """Coloca a linha na posição certa da ordem atual, se ela já foi carregada"""
+        valores = self._formatar(valores)
+        if self.tree.exists(iid) and self._chaves.get(iid) == chave:
+            self.tree.item(iid, values=valores)
+            return
+        self._remover(iid)
+        # Depois da última página carregada: virá naturalmente ao rolar
+        if not self._fim and (self._ultima_chave is None
+                              or not self._antes(chave, tuple(self._ultima_chave))):
+            return
+        filhos = self.tree.get_children()
+        inicio, fim = 0, len(filhos)
+        while inicio < fim:
+            meio = (inicio + fim) // 2
+            if self._antes(self._chaves[filhos[meio]], chave):
+                inicio = meio + 1
+            else:
+                fim = meio
+        self.tree.insert('', inicio, iid=iid, values=valores)
+        self._chaves[iid] = chave
+
+    def _formatar(self, linha):
+        return self.formatar(linha) if self.formatar else linha
+
+    def _rolou(self, primeiro, ultimo):
+        self.scrollbar.set(primeiro, ultimo)
+        if not self._fim and float(ultimo) >= LIMIAR_CARREGAR:
+            # Fora do callback de rolagem para não inserir itens durante o redesenho
+            self.tree.after_idle(self._carregar_se_no_fim)
+
+    def _carregar_se_no_fim(self):
+        # Vários eventos de rolagem podem ter sido agendados; só o primeiro carrega
+        if self.tree.yview()[1] >= LIMIAR_CARREGAR:
+            self.carregar_mais()
+
+    def _marcar_cabecalho(self):
+        for coluna, titulo in self._titulos.items():
+            if coluna == self.ordem:
+                titulo += ' ▼' if self.descendente else ' ▲'
+            self.tree.heading(coluna, text=titulo)
@@ -0,0 +1,122 @@
+# manutencao.py
+"""Tarefas de manutenção do banco, pela linha de comando.
+
+Uso: python manutencao.py reconciliar [banco.db]
+     python manutencao.py arquivar [banco.db] [--dias 365] [--lote 500]
+     python manutencao.py resumos [banco.db]
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+from banco import COLUNAS_EMPRESTIMOS, DB_PATH, Banco, recalcular_resumos
+
+# Devolvidos há mais que isto saem de emprestimos para emprestimos_arquivo
+DIAS_ARQUIVO = 365
+
+# Empréstimos movidos por transação e pausa (s) entre os lotes: cada lote
+# segura o lock de escrita por poucos milissegundos e o balcão grava no intervalo
+LOTE_ARQUIVO = 500
+PAUSA_ARQUIVO = 0.05
+
+
+def reconciliar(banco):
+    """Recalcula os contadores de estatísticas e informa o que estava divergente"""
+    divergencias = banco.reconciliar_estatisticas()
+    if not divergencias:
+        print("OK: contadores de estatísticas conferem com as tabelas")
+    for chave, (gravado, correto) in sorted(divergencias.items()):
+        print(f"Corrigido {chave}: {gravado} -> {correto}")
+
+
+def arquivar_emprestimos(banco, dias=DIAS_ARQUIVO, lote=LOTE_ARQUIVO, pausa=PAUSA_ARQUIVO,
+                         progresso=None):
+    """Move os empréstimos retirados e devolvidos há mais de `dias` para o arquivo.
+
+    Anda pelo índice (status, data_emprestimo) em lotes de `lote` linhas, cada
+    um em sua própria transação; pode ser interrompido e rodado de novo a
+    qualquer momento. Retorna quantos empréstimos foram movidos.
+    """
+    limite = (date.today() - timedelta(days=dias)).isoformat()
+    posicao = ('', 0)
+    total = 0
+
+    def mover(cursor):
+        linhas = cursor.execute('''
+            SELECT id, data_emprestimo FROM emprestimos
+            WHERE status = 'Devolvido' AND data_emprestimo < :limite
+              AND (data_emprestimo, id) > (:data, :id)
+              AND data_devolucao_real < :limite
+            ORDER BY data_emprestimo, id
+            LIMIT :lote
+        ''', {'limite': limite, 'data': posicao[0], 'id': posicao[1], 'lote': lote}).fetchall()
+        if not linhas:
+            return None
+        ids = [linha[0] for linha in linhas]
+        marcadores = ', '.join('?' * len(ids))
+        cursor.execute(f'''
+            INSERT INTO emprestimos_arquivo ({COLUNAS_EMPRESTIMOS})
+            SELECT {COLUNAS_EMPRESTIMOS} FROM emprestimos WHERE id IN ({marcadores})
+        ''', ids)
+        cursor.execute(f'DELETE FROM emprestimos WHERE id IN ({marcadores})', ids)
+        return len(ids), (linhas[-1][1], linhas[-1][0])
+
+    # Só devolvidos saem: listas e contadores da interface não mudam
+    with banco.silenciar():
+        while True:
+            movidos = banco.gravar(mover)
+            if movidos is None:
+                return total
+            total += movidos[0]
+            posicao = movidos[1]
+            if progresso is not None:
+                progresso(total)
+            time.sleep(pausa)
+
+
+def arquivar(banco, dias=DIAS_ARQUIVO, lote=LOTE_ARQUIVO):
+    inicio = time.perf_counter()
+    total = arquivar_emprestimos(
+        banco, dias, lote, progresso=lambda n: print(f"\r{n} empréstimos arquivados...", end='', flush=True))
+    restantes = banco.consultar_um('SELECT COUNT(*) FROM emprestimos')[0]
+    print(f"\r{total} empréstimos arquivados em {time.perf_counter() - inicio:.1f} s; "
+          f"{restantes} continuam em emprestimos")
+
+
+def resumos(banco):
+    """Refaz os resumos de circulação a partir do histórico completo"""
+    inicio = time.perf_counter()
+    banco.gravar(recalcular_resumos)
+    dias = banco.consultar_um('SELECT COUNT(DISTINCT dia) FROM resumo_dia_categoria')[0]
+    print(f"Resumos de circulação refeitos ({dias} dias com movimento) em "
+          f"{time.perf_counter() - inicio:.1f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manutenção do banco da biblioteca")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    comando = comandos.add_parser('reconciliar', help="recalcula os contadores de estatísticas")
+    comando.add_argument('banco', nargs='?', default=DB_PATH)
+    comando.set_defaults(funcao=reconciliar)
+    comando = comandos.add_parser('arquivar', help="move empréstimos devolvidos antigos para o arquivo")
+    comando.add_argument('banco', nargs='?', default=DB_PATH)
+    comando.add_argument('--dias', type=int, default=DIAS_ARQUIVO,
+                         help=f"idade mínima, em dias, do empréstimo e da devolução (padrão {DIAS_ARQUIVO})")
+    comando.add_argument('--lote', type=int, default=LOTE_ARQUIVO,
+                         help=f"empréstimos por transação (padrão {LOTE_ARQUIVO})")
+    comando.set_defaults(funcao=lambda banco: arquivar(banco, args.dias, args.lote))
+    comando = comandos.add_parser('resumos', help="refaz os resumos de circulação dos gráficos")
+    comando.add_argument('banco', nargs='?', default=DB_PATH)
+    comando.set_defaults(funcao=resumos)
+    args = parser.parse_args()
+
+    banco = Banco(args.banco)
+    try:
+        banco.migrar()
+        args.funcao(banco)
+    finally:
+        banco.fechar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# referencia.py
+"""Dados de referência da escola: blocos, turmas, séries e categorias padrão,
+e o cache das turmas do banco usadas nos comboboxes."""
+
+# Blocos de turmas exibidos na aba Estudante
+BLOCOS_TURMAS = {
+    "6º Ano": ["601", "602", "603", "604"],
+    "7º Ano": ["701", "702", "703", "704"],
+    "8º Ano": ["801", "802", "803", "804"],
+    "9º Ano": ["901", "902", "903", "904"],
+    "1º Médio": ["1001", "1002", "1003", "1004", "1005"],
+    "2º Médio": ["2001", "2002", "2003", "2004", "2005"],
+    "3º Médio": ["3001", "3002", "3003", "3005"]
+}
+
+# Turmas padrão corrigidas (sempre oferecidas, mesmo sem alunos cadastrados)
+TURMAS_PADRAO = [turma for turmas in BLOCOS_TURMAS.values() for turma in turmas]
+
+# Séries oferecidas no cadastro de alunos
+SERIES = (
+    '6º Fundamental', '7º Fundamental', '8º Fundamental', '9º Fundamental',
+    '1º Médio', '2º Médio', '3º Médio'
+)
+
+# Categorias oferecidas no cadastro de livros
+CATEGORIAS = (
+    'Romance', 'Conto', 'Poesia', 'Drama', 'Aventura', 'Fantasia', 'Ficção Científica',
+    'Mistério', 'Suspense', 'Terror', 'Biografia', 'Autobiografia', 'Infantil',
+    'Juvenil', 'Didático', 'Literatura Brasileira', 'Literatura Estrangeira',
+    'Clássicos', 'História', 'Ciências', 'Geografia', 'Matemática', 'Religião', 'Outros'
+)
+
+
+def ordenar_turmas(turmas):
+    """Ordena turmas numericamente ("601" antes de "1001")"""
+    return sorted(set(turmas), key=lambda x: (len(x), x))
+
+
+class CacheReferencia:
+    """Turmas dos comboboxes, lidas do banco uma vez.
+
+    Inscrito nos avisos do Banco (aplicar em 'alunos', aplicar_troca_turma em
+    'alunos.turma'), descarta a lista só quando um aluno entra numa turma
+    nova, sai ou muda de turma. Os alunos em si não ficam em cache: o
+    seletor de alunos (seletor_aluno.py) busca por índice enquanto se digita.
+    Gravações de outros balcões não avisam: quem detecta (versao_dados)
+    chama limpar().
+    """
+
+    def __init__(self, banco):
+        self.banco = banco
+        self._turmas = None   # turmas com alunos no banco
+
+    def limpar(self):
+        self._turmas = None
+
+    def turmas(self, incluir_padrao=True):
+        """Turmas em ordem numérica; com incluir_padrao, também as TURMAS_PADRAO"""
+        if self._turmas is None:
+            self._turmas = {r[0] for r in self.banco.consultar(
+                'SELECT DISTINCT turma FROM alunos WHERE turma IS NOT NULL AND turma <> ""')}
+        if incluir_padrao:
+            return ordenar_turmas(list(self._turmas) + TURMAS_PADRAO)
+        return ordenar_turmas(self._turmas)
+
+    def blocos(self):
+        """BLOCOS_TURMAS mais um bloco "Outras" com as turmas do banco fora deles"""
+        blocos = dict(BLOCOS_TURMAS)
+        outras = [t for t in self.turmas(incluir_padrao=False) if t not in TURMAS_PADRAO]
+        if outras:
+            blocos["Outras"] = outras
+        return blocos
+
+    def aplicar(self, acao, ids):
+        """Aviso de mudança em alunos"""
+        if acao == 'insert':
+            if self._turmas is not None:
+                self._turmas.update(turma for turma in self._turmas_dos_alunos(ids) if turma)
+        elif acao == 'delete':
+            # A turma pode ter ficado sem alunos
+            self._turmas = None
+
+    def aplicar_troca_turma(self, acao, ids):
+        """Aviso de alunos.turma alterada: a turma de origem pode ter esvaziado"""
+        self._turmas = None
+
+    def _turmas_dos_alunos(self, ids):
+        return [r[0] for r in self.banco.consultar(f'''
+            SELECT DISTINCT turma FROM alunos WHERE id IN ({', '.join('?' * len(ids))})
+        ''', ids)]
@@ -0,0 +1,120 @@
+# seletor_aluno.py
+"""Campo de aluno que sugere enquanto o nome é digitado, no lugar do combo com todos os alunos."""
+import tkinter as tk
+
+import busca
+import consultas
+
+
+class SeletorAluno:
+    """Liga um Entry a uma Listbox de sugestões de alunos.
+
+    Cada tecla agenda consultas.sugerir_alunos (prefixo do nome por índice
+    ou matrícula exata, no máximo LIMITE_SUGESTOES_ALUNOS linhas) fora da
+    thread da interface; a turma vem de `turma()` no momento da tecla. O
+    aluno escolhido fica em `aluno` como (id, nome, matricula): quem grava
+    usa o id guardado, não o texto exibido. Editar o texto desfaz a escolha.
+
+    Enter escolhe a primeira sugestão (ou a matrícula lida pelo leitor);
+    seta para baixo passa para a lista.
+    """
+
+    def __init__(self, root, banco, entry, listbox, turma=None, atraso_ms=120):
+        self.banco = banco
+        self.entry = entry
+        self.listbox = listbox
+        self.turma = turma or (lambda: None)
+        self.aluno = None
+        self._opcoes = []  # (id, nome, matricula) exibidos na lista
+        self._busca = busca.BuscaAoDigitar(
+            root, banco, lambda banco, pedido: consultas.sugerir_alunos(banco, *pedido),
+            self._mostrar, self._erro, atraso_ms=atraso_ms)
+        entry.bind('<KeyRelease>', self._digitou)
+        entry.bind('<Return>', self._confirmar)
+        entry.bind('<Down>', self._ir_para_lista)
+        # Clique ou Enter escolhem; as setas só percorrem a lista
+        listbox.bind('<ButtonRelease-1>', self._escolheu)
+        listbox.bind('<Return>', self._escolheu)
+        listbox.grid_remove()
+
+    # ---------------------- API ----------------------
+    def limpar(self):
+        """Esvazia o campo e desfaz a escolha"""
+        self._busca.cancelar()
+        self.aluno = None
+        self.entry.delete(0, tk.END)
+        self._esconder()
+
+    def sugerir(self):
+        """Mostra as sugestões do texto atual (ex.: ao trocar a turma)"""
+        self._busca.agendar((self.entry.get(), self.turma()), imediato=True)
+
+    def escolher(self, aluno):
+        """Marca o aluno (id, nome, matricula) como escolhido e o exibe no campo"""
+        self._busca.cancelar()
+        self.aluno = tuple(aluno)
+        self.entry.delete(0, tk.END)
+        self.entry.insert(0, self.texto(aluno))
+        self._esconder()
+
+    def parar(self):
+        self._busca.parar()
+
+    @staticmethod
+    def texto(aluno):
+        return f"{aluno[1]} ({aluno[2]})"
+
+    # ---------------------- EVENTOS ----------------------
+    def _digitou(self, event):
+        if event.keysym in ('Return', 'Down', 'Up', 'Tab', 'Escape'):
+            if event.keysym == 'Escape':
+                self._esconder()
+            return
+        if self.aluno is not None and self.entry.get() == self.texto(self.aluno):
+            return
+        self.aluno = None
+        self._busca.agendar((self.entry.get(), self.turma()))
+
+    def _confirmar(self, event=None):
+        if self.aluno is not None or not self.entry.get().strip():
+            return 'break'
+        # Enter pode chegar antes da busca agendada (leitor de matrícula,
+        # digitação rápida): consulta o texto atual na hora
+        self._busca.cancelar()
+        linhas = consultas.sugerir_alunos(self.banco, self.entry.get(), self.turma())
+        if linhas:
+            self.escolher(linhas[0])
+        else:
+            self._mostrar(None, linhas)
+        return 'break'
+
+    def _ir_para_lista(self, event=None):
+        if self._opcoes:
+            self.listbox.focus_set()
+            self.listbox.selection_clear(0, tk.END)
+            self.listbox.selection_set(0)
+            self.listbox.activate(0)
+        return 'break'
+
+    def _escolheu(self, event=None):
+        selecao = self.listbox.curselection()
+        if selecao:
+            self.escolher(self._opcoes[selecao[0]])
+            self.entry.focus_set()
+
+    def _mostrar(self, pedido, linhas):
+        self._opcoes = list(linhas)
+        self.listbox.delete(0, tk.END)
+        for aluno in self._opcoes:
+            self.listbox.insert(tk.END, self.texto(aluno))
+        if self._opcoes:
+            self.listbox.grid()
+        else:
+            self.listbox.grid_remove()
+
+    def _erro(self, pedido, erro):
+        self._esconder()
+
+    def _esconder(self):
+        self._opcoes = []
+        self.listbox.grid_remove()
@@ -0,0 +1,300 @@
+# servico.py
+"""Operações da biblioteca (cadastros, empréstimos, buscas) sem dependência de Tk.
+
+Usado pela interface no modo local e pelo servidor HTTP (servidor.py), que
+expõe os mesmos métodos para vários balcões.
+"""
+import sqlite3
+from datetime import date, timedelta
+
+import busca
+import consultas
+
+# Prazos padrão (dias)
+DIAS_EMPRESTIMO = 15
+DIAS_RENOVACAO = 7
+
+
+class ErroServico(Exception):
+    """Operação recusada por regra de negócio; a mensagem vai para o usuário"""
+
+
+def _erro_emprestimo(cursor, emprestimo_id):
+    """Lança ErroServico explicando por que o empréstimo ativo não foi alterado"""
+    existe = cursor.execute('SELECT 1 FROM emprestimos_historico WHERE id = ?', (emprestimo_id,)).fetchone()
+    raise ErroServico("Empréstimo já devolvido!" if existe else "Empréstimo não encontrado!")
+
+
+def _filtro_obrigatorio(turma, vence_ate):
+    """Filtro de uma ação em lote; sem turma nem data alcançaria todos os abertos"""
+    if not turma and not vence_ate:
+        raise ErroServico("Informe a turma ou a data de vencimento!")
+    return consultas.filtro_abertos(turma=turma, vence_ate=vence_ate)
+
+
+def _devolver_abertos(cursor, condicao, params):
+    """Devolve os empréstimos abertos da condição e retorna quantos.
+
+    Os exemplares voltam ao acervo antes, num único UPDATE ... FROM com a
+    contagem por livro; depois um único UPDATE baixa os empréstimos.
+    """
+    # +livro_id: agrupa só os abertos da condição (faixa de status/vencimento)
+    # em vez de percorrer idx_emprestimos_livro_status inteiro pela ordem do livro
+    cursor.execute(f'''
+        UPDATE livros SET disponivel = disponivel + devolvidos.quantidade
+        FROM (SELECT livro_id, COUNT(*) AS quantidade FROM emprestimos
+              WHERE {condicao} GROUP BY +livro_id) AS devolvidos
+        WHERE livros.id = devolvidos.livro_id
+    ''', params)
+    cursor.execute(f'''
+        UPDATE emprestimos SET data_devolucao_real = CURRENT_DATE, status = 'Devolvido'
+        WHERE {condicao}
+    ''', params)
+    return cursor.rowcount
+
+
+def _prazo(dias, nome):
+    """`dias` como inteiro positivo; validado antes de abrir a transação.
+
+    Zero ou negativo criaria empréstimos já vencidos, e no SQLite
+    date(data, '+-3 days') é NULL: apagaria a devolução prevista.
+    """
+    try:
+        dias = int(dias)
+    except (TypeError, ValueError):
+        raise ErroServico(f"{nome} deve ser um número!")
+    if dias < 1:
+        raise ErroServico(f"{nome} deve ser maior que zero!")
+    return dias
+
+
+def _renovar_abertos(cursor, condicao, params, dias):
+    """Adia em `dias` (já validado por _prazo) a devolução prevista dos abertos da condição"""
+    cursor.execute(f'''
+        UPDATE emprestimos SET data_devolucao_prevista = date(data_devolucao_prevista, ?)
+        WHERE {condicao}
+    ''', [f'{dias:+d} days'] + params)
+    return cursor.rowcount
+
+
+class ServicoBiblioteca:
+    """Regras de circulação e cadastro sobre um Banco"""
+
+    # Métodos que o servidor pode chamar, separados por tipo de acesso
+    LEITURAS = ('buscar_livros', 'sugerir_titulos', 'buscar_por_autor', 'estudantes_da_turma',
+                'contar_abertos')
+    GRAVACOES = ('cadastrar_livro', 'cadastrar_aluno', 'atualizar_aluno',
+                 'registrar_emprestimo', 'registrar_devolucao', 'renovar_emprestimo',
+                 'emprestar_lote', 'devolver_lote', 'devolver_por_filtro',
+                 'renovar_lote', 'renovar_por_filtro')
+
+    def __init__(self, banco):
+        self.banco = banco
+
+    # ---------------------- CADASTROS ----------------------
+    def cadastrar_livro(self, titulo, autor, isbn='', categoria='', quantidade=1):
+        """Cadastra um livro e retorna o id"""
+        if not titulo or not autor:
+            raise ErroServico("Título e Autor são obrigatórios!")
+        try:
+            quantidade = int(quantidade)
+        except (TypeError, ValueError):
+            raise ErroServico("Quantidade deve ser um número!")
+        try:
+            cursor = self.banco.executar('''
+                INSERT INTO livros (titulo, autor, isbn, categoria, quantidade, disponivel)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (titulo, autor, isbn, categoria, quantidade, quantidade))
+        except sqlite3.IntegrityError:
+            raise ErroServico("ISBN já existe no sistema!")
+        return cursor.lastrowid
+
+    def cadastrar_aluno(self, nome, matricula, serie='', turma='', telefone='', email=''):
+        """Cadastra um aluno e retorna o id"""
+        if not nome or not matricula:
+            raise ErroServico("Nome e Matrícula são obrigatórios!")
+        try:
+            cursor = self.banco.executar('''
+                INSERT INTO alunos (nome, matricula, serie, turma, telefone, email)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (nome, matricula, serie, turma, telefone, email))
+        except sqlite3.IntegrityError:
+            raise ErroServico("Matrícula já existe no sistema!")
+        return cursor.lastrowid
+
+    def atualizar_aluno(self, aluno_id, nome, matricula, serie='', turma='', telefone='', email=''):
+        """Grava os dados editados de um aluno"""
+        if not nome or not matricula:
+            raise ErroServico("Nome e Matrícula são obrigatórios!")
+        try:
+            self.banco.executar('''
+                UPDATE alunos SET nome=?, matricula=?, serie=?, turma=?, telefone=?, email=?
+                WHERE id=?
+            ''', (nome, matricula, serie, turma, telefone, email, aluno_id))
+        except sqlite3.IntegrityError:
+            raise ErroServico("Matrícula já existe no sistema!")
+
+    # ---------------------- CIRCULAÇÃO ----------------------
+    def registrar_emprestimo(self, livro_id, aluno_id, dias=DIAS_EMPRESTIMO, observacoes=''):
+        """Empresta o livro ao aluno e retorna (id do empréstimo, data prevista AAAA-MM-DD).
+
+        A baixa no estoque é um UPDATE condicional (disponivel > 0) dentro de
+        BEGIN IMMEDIATE: dois balcões disputando o último exemplar nunca
+        emprestam os dois, e o perdedor recebe "não está disponível".
+        """
+        dias = _prazo(dias, "Dias para devolução")
+        prevista = (date.today() + timedelta(days=dias)).isoformat()
+
+        def emprestar(cursor):
+            cursor.execute('''
+                UPDATE livros SET disponivel = disponivel - 1
+                WHERE id = ? AND disponivel > 0
+            ''', (livro_id,))
+            if cursor.rowcount == 0:
+                existe = cursor.execute('SELECT 1 FROM livros WHERE id = ?', (livro_id,)).fetchone()
+                raise ErroServico("Livro não está disponível!" if existe else "Livro não encontrado!")
+            cursor.execute('''
+                INSERT INTO emprestimos (livro_id, aluno_id, data_devolucao_prevista, observacoes)
+                VALUES (?, ?, ?, ?)
+            ''', (livro_id, aluno_id, prevista, observacoes))
+            return cursor.lastrowid
+
+        return self.banco.gravar(emprestar), prevista
+
+    def registrar_devolucao(self, emprestimo_id):
+        """Marca o empréstimo como devolvido hoje e devolve o exemplar ao acervo.
+
+        Só um empréstimo ainda 'Emprestado' é baixado, então devolver duas vezes
+        (ou em dois balcões) não cria exemplares a mais.
+        """
+        def devolver(cursor):
+            cursor.execute('''
+                UPDATE emprestimos
+                SET data_devolucao_real = CURRENT_DATE, status = 'Devolvido'
+                WHERE id = ? AND status = 'Emprestado'
+            ''', (emprestimo_id,))
+            if cursor.rowcount == 0:
+                _erro_emprestimo(cursor, emprestimo_id)
+            cursor.execute('''
+                UPDATE livros SET disponivel = disponivel + 1
+                WHERE id = (SELECT livro_id FROM emprestimos WHERE id = ?)
+            ''', (emprestimo_id,))
+
+        self.banco.gravar(devolver)
+
+    def renovar_emprestimo(self, emprestimo_id, dias=DIAS_RENOVACAO):
+        """Adia a devolução prevista e retorna a nova data (AAAA-MM-DD)"""
+        dias = _prazo(dias, "Dias de renovação")
+
+        def renovar(cursor):
+            cursor.execute('''
+                UPDATE emprestimos
+                SET data_devolucao_prevista = date(data_devolucao_prevista, ?)
+                WHERE id = ? AND status = 'Emprestado'
+            ''', (f'{dias:+d} days', emprestimo_id))
+            if cursor.rowcount == 0:
+                _erro_emprestimo(cursor, emprestimo_id)
+            return cursor.execute('SELECT data_devolucao_prevista FROM emprestimos WHERE id = ?',
+                                  (emprestimo_id,)).fetchone()[0]
+
+        return self.banco.gravar(renovar)
+
+    # ---------------------- LOTES ----------------------
+    def emprestar_lote(self, itens, dias=DIAS_EMPRESTIMO, observacoes=''):
+        """Empresta vários livros em uma única transação.
+
+        itens é uma lista de (livro_id, aluno_id). Retorna ([id do empréstimo,
+        None] ou [None, motivo] por item, na mesma ordem; data prevista). Um
+        item sem exemplar é recusado sem desfazer os demais.
+        """
+        dias = _prazo(dias, "Dias para devolução")
+        prevista = (date.today() + timedelta(days=dias)).isoformat()
+
+        def emprestar(cursor):
+            # Primeiro todas as baixas de estoque, depois todos os inserts: cada
+            # tabela gera um único aviso para as listas abertas
+            resultados = []
+            for livro_id, _ in itens:
+                cursor.execute('''
+                    UPDATE livros SET disponivel = disponivel - 1
+                    WHERE id = ? AND disponivel > 0
+                ''', (livro_id,))
+                if cursor.rowcount:
+                    resultados.append([None, None])
+                    continue
+                existe = cursor.execute('SELECT 1 FROM livros WHERE id = ?', (livro_id,)).fetchone()
+                resultados.append([None, "Livro não está disponível!" if existe else "Livro não encontrado!"])
+            for (livro_id, aluno_id), resultado in zip(itens, resultados):
+                if resultado[1] is None:
+                    cursor.execute('''
+                        INSERT INTO emprestimos (livro_id, aluno_id, data_devolucao_prevista, observacoes)
+                        VALUES (?, ?, ?, ?)
+                    ''', (livro_id, aluno_id, prevista, observacoes))
+                    resultado[0] = cursor.lastrowid
+            return resultados
+
+        return self.banco.gravar(emprestar), prevista
+
+    def devolver_lote(self, emprestimo_ids):
+        """Devolve os empréstimos marcados em uma única transação.
+
+        Retorna [id, None] ou [None, motivo] por empréstimo, na mesma ordem.
+        """
+        emprestimo_ids = [int(i) for i in emprestimo_ids]
+        if not emprestimo_ids:
+            return []
+        condicao, params = consultas.filtro_abertos(emprestimo_ids)
+
+        def devolver(cursor):
+            # Dentro do BEGIN IMMEDIATE: os abertos lidos aqui são os que o UPDATE baixa
+            abertos = {r[0] for r in cursor.execute(f'SELECT id FROM emprestimos WHERE {condicao}', params)}
+            _devolver_abertos(cursor, condicao, params)
+            resultados = []
+            for emprestimo_id in emprestimo_ids:
+                if emprestimo_id in abertos:
+                    resultados.append([emprestimo_id, None])
+                    continue
+                existe = cursor.execute('SELECT 1 FROM emprestimos_historico WHERE id = ?',
+                                        (emprestimo_id,)).fetchone()
+                resultados.append([None, "Empréstimo já devolvido!" if existe else "Empréstimo não encontrado!"])
+            return resultados
+
+        return self.banco.gravar(devolver)
+
+    def devolver_por_filtro(self, turma=None, vence_ate=None):
+        """Devolve todos os empréstimos abertos da turma e/ou com vencimento
+        até a data (AAAA-MM-DD); retorna quantos foram devolvidos"""
+        condicao, params = _filtro_obrigatorio(turma, vence_ate)
+        return self.banco.gravar(lambda cursor: _devolver_abertos(cursor, condicao, params))
+
+    def renovar_lote(self, emprestimo_ids, dias=DIAS_RENOVACAO):
+        """Renova os empréstimos marcados; retorna quantos estavam abertos e foram renovados"""
+        emprestimo_ids = [int(i) for i in emprestimo_ids]
+        dias = _prazo(dias, "Dias de renovação")
+        if not emprestimo_ids:
+            return 0
+        condicao, params = consultas.filtro_abertos(emprestimo_ids)
+        return self.banco.gravar(lambda cursor: _renovar_abertos(cursor, condicao, params, dias))
+
+    def renovar_por_filtro(self, turma=None, vence_ate=None, dias=DIAS_RENOVACAO):
+        """Renova os empréstimos abertos da turma e/ou com vencimento até a
+        data (AAAA-MM-DD), por exemplo "turma 702, vencendo esta semana"; retorna quantos"""
+        condicao, params = _filtro_obrigatorio(turma, vence_ate)
+        dias = _prazo(dias, "Dias de renovação")
+        return self.banco.gravar(lambda cursor: _renovar_abertos(cursor, condicao, params, dias))
+
+    # ---------------------- CONSULTAS ----------------------
+    def buscar_livros(self, texto, coluna=None, somente_disponiveis=True, limite=busca.LIMITE_BUSCA):
+        return busca.buscar_livros(self.banco, texto, coluna, somente_disponiveis, limite)
+
+    def sugerir_titulos(self, texto, limite=busca.LIMITE_SUGESTOES):
+        return busca.sugerir_titulos(self.banco, texto, limite)
+
+    def buscar_por_autor(self, texto, limite=busca.LIMITE_BUSCA):
+        return busca.buscar_por_autor(self.banco, texto, limite)
+
+    def estudantes_da_turma(self, turma):
+        return consultas.estudantes_da_turma(self.banco, turma)
+
+    def contar_abertos(self, turma=None, vence_ate=None):
+        return consultas.contar_abertos(self.banco, turma, vence_ate)
@@ -0,0 +1,186 @@
+# servidor.py
+"""Servidor HTTP/JSON para que vários balcões usem o mesmo banco.
+
+Só este processo abre o arquivo SQLite. As requisições são atendidas por um
+pool de threads de leitura; toda gravação passa por uma única thread
+escritora, então os balcões nunca disputam o lock de escrita do arquivo.
+As threads de leitura usam conexões abertas em somente leitura (mode=ro e
+autorizador, ver Banco): o SQL de /api/consulta não consegue gravar, anexar
+outro arquivo nem mudar PRAGMAs. Não há autenticação: por padrão o servidor
+só atende nesta máquina; use --host 0.0.0.0 apenas em rede da escola.
+
+Rotas (corpo e resposta em JSON):
+    GET  /api/versao          -> {"versao": n}   muda a cada gravação
+    POST /api/consulta        {"sql", "params", "um"} -> {"linhas": [...]}  (só SELECT)
+    POST /api/<operacao>      {argumentos}       -> {"resultado": ...}
+                              operações de ServicoBiblioteca.LEITURAS/GRAVACOES
+
+Uso: python servidor.py [--porta 8765] [--host 127.0.0.1] [banco.db]
+"""
+import argparse
+import json
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from banco import DB_PATH, Banco
+from servico import ErroServico, ServicoBiblioteca
+
+PORTA_PADRAO = 8765
+HOST_PADRAO = '127.0.0.1'
+
+# Threads que atendem requisições (leituras rodam nelas em paralelo)
+LEITORES = 8
+
+# Maior corpo de requisição aceito (bytes)
+MAX_CORPO = 1024 * 1024
+
+log = logging.getLogger(__name__)
+
+
+class ServidorBiblioteca(HTTPServer):
+    """HTTPServer com pool de leitores e uma thread escritora sobre o mesmo arquivo"""
+
+    def __init__(self, endereco, caminho_banco, leitores=LEITORES):
+        self.banco = Banco(caminho_banco)
+        self.banco.migrar()
+        self.servico = ServicoBiblioteca(self.banco)
+        # Conexões das threads de leitura: recusam qualquer escrita já na preparação
+        self.leitura = Banco(caminho_banco, somente_leitura=True)
+        self.servico_leitura = ServicoBiblioteca(self.leitura)
+        self._gravacoes = 0
+        self._leitores = ThreadPoolExecutor(leitores, thread_name_prefix='leitor')
+        self._escritor = ThreadPoolExecutor(1, thread_name_prefix='escritor')
+        super().__init__(endereco, Requisicao)
+
+    # ---------------------- THREADS ----------------------
+    def process_request(self, request, client_address):
+        self._leitores.submit(self._atender, request, client_address)
+
+    def _atender(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def gravar(self, funcao, *args, **kwargs):
+        """Executa a função na thread escritora e espera o resultado"""
+        return self._escritor.submit(self._gravar, funcao, args, kwargs).result()
+
+    def _gravar(self, funcao, args, kwargs):
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            self._gravacoes += 1
+
+    def versao(self):
+        """Muda a cada gravação deste servidor ou de outro processo no arquivo"""
+        # data_version da conexão escritora só muda com commits de outras conexões
+        return self._escritor.submit(lambda: self._gravacoes + self.banco.versao_dados()).result()
+
+    def server_close(self):
+        super().server_close()
+        self._leitores.shutdown(wait=True)
+        self._escritor.shutdown(wait=True)
+        self.leitura.fechar()
+        self.banco.fechar()
+
+
+class Requisicao(BaseHTTPRequestHandler):
+    """Traduz as rotas /api/* em chamadas ao ServicoBiblioteca"""
+
+    server_version = 'Biblioteca/1.0'
+
+    def do_GET(self):
+        if self.path == '/api/versao':
+            self._responder(200, {'versao': self.server.versao()})
+        else:
+            self._responder(404, {'erro': 'Rota desconhecida'})
+
+    def do_POST(self):
+        if not self.path.startswith('/api/'):
+            self._responder(404, {'erro': 'Rota desconhecida'})
+            return
+        operacao = self.path[len('/api/'):]
+        try:
+            dados = self._ler_corpo()
+            if operacao == 'consulta':
+                resposta = {'linhas': self._consultar(dados)}
+            elif operacao in ServicoBiblioteca.LEITURAS:
+                resposta = {'resultado': getattr(self.server.servico_leitura, operacao)(**dados)}
+            elif operacao in ServicoBiblioteca.GRAVACOES:
+                funcao = getattr(self.server.servico, operacao)
+                resposta = {'resultado': self.server.gravar(funcao, **dados)}
+            else:
+                self._responder(404, {'erro': f'Operação desconhecida: {operacao}'})
+                return
+        except (ErroServico, ValueError, TypeError) as e:
+            self._responder(400, {'erro': str(e)})
+            return
+        except sqlite3.Error as e:
+            log.exception("Erro no banco em %s", operacao)
+            self._responder(500, {'erro': f'Erro no banco: {e}'})
+            return
+        self._responder(200, resposta)
+
+    def _consultar(self, dados):
+        sql, params = dados.get('sql', ''), dados.get('params', [])
+        # Na conexão somente leitura da thread: o autorizador recusa o que não for SELECT
+        try:
+            if dados.get('um'):
+                linha = self.server.leitura.consultar_um(sql, params)
+                return [linha] if linha is not None else []
+            return self.server.leitura.consultar(sql, params)
+        except sqlite3.DatabaseError as e:
+            if 'not authorized' in str(e):
+                raise ErroServico("Consulta recusada: o servidor só aceita SELECT")
+            raise
+
+    def _ler_corpo(self):
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        if tamanho > MAX_CORPO:
+            raise ValueError('Requisição grande demais')
+        if not tamanho:
+            return {}
+        dados = json.loads(self.rfile.read(tamanho))
+        if not isinstance(dados, dict):
+            raise ValueError('O corpo deve ser um objeto JSON')
+        return dados
+
+    def _responder(self, status, dados):
+        corpo = json.dumps(dados, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        log.debug("%s - %s", self.address_string(), formato % args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor da biblioteca para vários balcões")
+    parser.add_argument('banco', nargs='?', default=DB_PATH, help="arquivo do banco SQLite")
+    parser.add_argument('--host', default=HOST_PADRAO,
+                        help="endereço em que atende (0.0.0.0 abre para a rede, sem autenticação)")
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    parser.add_argument('--leitores', type=int, default=LEITORES)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    servidor = ServidorBiblioteca((args.host, args.porta), args.banco, args.leitores)
+    log.info("Servindo %s em http://%s:%d", args.banco, args.host, args.porta)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
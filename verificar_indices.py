@@ -0,0 +1,268 @@
+# verificar_indices.py
+"""Confere com EXPLAIN QUERY PLAN que os comandos SQL do sistema usam índices.
+
+Os comandos não são copiados aqui: cada cenário chama o código das abas
+(consultas, busca, ListaPaginada, serviço, circulação em lote...) sobre um
+banco temporário com poucas linhas e anota o SQL e os parâmetros que ele
+executa. Depois o plano de cada comando anotado é conferido no banco
+informado (ou no temporário). Mudar uma consulta no sistema muda o que é
+conferido. O banco informado é só lido; se o esquema dele for antigo, a
+conferência para e avisa que ele precisa migrar.
+
+Uso: python verificar_indices.py [caminho_do_banco]
+Sem argumento, confere no banco temporário com o esquema atual.
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import busca
+import circulacao
+import consultas
+import manutencao
+from banco import MIGRACOES, Banco, varreduras_completas
+from benchmark import BarraSemTela, TreeSemTela
+from lembretes import AgendaDevolucoes
+from lista_paginada import ListaPaginada
+from referencia import CacheReferencia
+from servico import ServicoBiblioteca
+
+# Cenários em que percorrer um índice (ou uma tabela pequena) inteiro é o
+# esperado, com o motivo. Em todos os outros, qualquer SCAN é problema.
+VARREDURAS_PERMITIDAS = {
+    'lista_livros': "primeira página: percorre o índice da ordem só até o LIMIT",
+    'lista_alunos': "primeira página: percorre o índice da ordem só até o LIMIT",
+    'estatisticas': "a tabela estatisticas tem uma linha por contador",
+}
+
+
+# ---------------------- ANOTAÇÃO DOS COMANDOS ----------------------
+class _CursorAnotado:
+    """Cursor que anota cada comando antes de executá-lo"""
+
+    def __init__(self, cursor, anotar):
+        self._cursor = cursor
+        self._anotar = anotar
+
+    def execute(self, sql, params=()):
+        self._anotar(sql, params)
+        self._cursor.execute(sql, params)
+        return self
+
+    def executemany(self, sql, linhas):
+        linhas = list(linhas)
+        if linhas:
+            self._anotar(sql, linhas[0])
+        self._cursor.executemany(sql, linhas)
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+
+class _BancoAnotado(Banco):
+    """Banco que guarda (cenário, sql, params) de tudo o que executa"""
+
+    def __init__(self, caminho):
+        super().__init__(caminho)
+        self.cenario = None
+        self.comandos = []
+
+    def _anotar(self, sql, params):
+        if self.cenario is not None:
+            self.comandos.append((self.cenario, sql, params))
+
+    def executar(self, sql, params=()):
+        self._anotar(sql, params)
+        return super().executar(sql, params)
+
+    def consultar(self, sql, params=()):
+        self._anotar(sql, params)
+        return super().consultar(sql, params)
+
+    def consultar_um(self, sql, params=()):
+        self._anotar(sql, params)
+        return super().consultar_um(sql, params)
+
+    @contextmanager
+    def transacao(self, modo="DEFERRED"):
+        with super().transacao(modo) as cursor:
+            yield _CursorAnotado(cursor, self._anotar)
+
+
+class _RootSemTela:
+    def after(self, ms, funcao=None):
+        return None
+
+    def after_cancel(self, agendado):
+        pass
+
+
+# ---------------------- CENÁRIOS ----------------------
+def _popular(servico):
+    """Poucas linhas de cada tabela; retorna (livros, alunos, empréstimos)"""
+    livros = [servico.cadastrar_livro(f'Livro {i}', f'Autor {i}', f'978000000000{i}', 'Romance', 5)
+              for i in range(3)]
+    alunos = [servico.cadastrar_aluno(f'Aluno {i}', f'2024{i:06d}', '7º Fundamental', '701')
+              for i in range(3)]
+    emprestimos = [servico.registrar_emprestimo(livro, aluno)[0]
+                   for livro in livros for aluno in alunos]
+    servico.banco.executar("UPDATE emprestimos SET data_devolucao_prevista = '2000-01-01' WHERE id = ?",
+                           (emprestimos[0],))
+    return livros, alunos, emprestimos
+
+
+def _percorrer_lista(banco, definicao, **extras):
+    """Todas as ordens, nos dois sentidos: primeira página, a seguinte e aplicar()"""
+    lista = ListaPaginada(TreeSemTela(list(definicao['ordens'])), BarraSemTela(), banco,
+                          tamanho_pagina=1, **dict(definicao, **extras))
+    for ordem in definicao['ordens']:
+        for descendente in (False, True):
+            lista.ordem, lista.descendente = ordem, descendente
+            lista.recarregar()
+            lista.carregar_mais()
+            lista.aplicar('update', [1])
+
+
+def _lembretes(banco, emprestimo_ids):
+    agenda = AgendaDevolucoes(_RootSemTela(), banco, lambda: None)
+    agenda.recarregar()
+    agenda.aplicar('update', emprestimo_ids)
+
+
+def _cenarios(banco, servico, livros, alunos, emprestimos):
+    hoje = date.today()
+    um_ano = (hoje - timedelta(days=365)).isoformat()
+    # Um dia do mês corrente sem os empréstimos de hoje: o ranking conta esse mês no histórico
+    vizinho = hoje + timedelta(days=1) if (hoje + timedelta(days=1)).month == hoje.month \
+        else hoje - timedelta(days=1)
+    lote = circulacao.LoteCirculacao(banco, circulacao.DEVOLUCAO)
+    return {
+        'lista_livros': lambda: _percorrer_lista(banco, consultas.LISTA_LIVROS),
+        'lista_alunos': lambda: _percorrer_lista(banco, consultas.LISTA_ALUNOS),
+        'lista_alunos_turma': lambda: _percorrer_lista(
+            banco, consultas.LISTA_ALUNOS, filtro=lambda: consultas.filtro_turma_alunos('701')),
+        'lista_emprestimos': lambda: _percorrer_lista(banco, consultas.LISTA_EMPRESTIMOS),
+        'lista_emprestimos_atrasados': lambda: _percorrer_lista(
+            banco, consultas.LISTA_EMPRESTIMOS, filtro=lambda: consultas.filtro_emprestimos(True)),
+        'estudantes_da_turma': lambda: (consultas.estudantes_da_turma(banco, '701'),
+                                        consultas.estudantes_da_turma(banco, '701', alunos[:2])),
+        'seletor_aluno': lambda: (consultas.sugerir_alunos(banco, 'alu'),
+                                  consultas.sugerir_alunos(banco, 'alu', '701'),
+                                  consultas.sugerir_alunos(banco, '', '701'),
+                                  consultas.sugerir_alunos(banco, '2024000001')),
+        'turmas': lambda: CacheReferencia(banco).turmas(),
+        'busca_livros': lambda: (busca.sugerir_titulos(banco, 'livro'),
+                                 busca.buscar_por_autor(banco, 'autor'),
+                                 busca.buscar_livros(banco, 'li', somente_disponiveis=False)),
+        'estatisticas': lambda: consultas.estatisticas(banco),
+        'atrasos': lambda: consultas.atrasos_por_turma(banco),
+        'devolucoes_do_dia': lambda: consultas.devolucoes_do_dia(banco, hoje.isoformat()),
+        'lembretes': lambda: _lembretes(banco, emprestimos[:2]),
+        'circulacao_lote': lambda: (circulacao.identificar(banco, '2024000001'),
+                                    circulacao.identificar(banco, '9780000000001'),
+                                    circulacao.identificar(banco, str(livros[0])),
+                                    circulacao.emprestimo_aberto(banco, livros[0]),
+                                    circulacao.emprestimo_aberto(banco, livros[0], alunos[0],
+                                                                 emprestimos[:1]),
+                                    lote.ler('9780000000002')),
+        'emprestimo': lambda: (servico.registrar_emprestimo(livros[0], alunos[0]),
+                               servico.emprestar_lote([(livros[1], alunos[1]), (9999, alunos[1])])),
+        'renovacao': lambda: (servico.renovar_emprestimo(emprestimos[1]),
+                              servico.renovar_lote(emprestimos[1:3]),
+                              servico.renovar_por_filtro('701', hoje.isoformat())),
+        'devolucao': lambda: (servico.registrar_devolucao(emprestimos[3]),
+                              servico.devolver_lote(emprestimos[4:6]),
+                              consultas.contar_abertos(banco, '701', hoje.isoformat()),
+                              servico.devolver_por_filtro(None, '2000-01-01')),
+        'arquivar': lambda: manutencao.arquivar_emprestimos(banco, dias=0, pausa=0),
+        'resumos': lambda: (consultas.circulacao_por_mes(banco, um_ano),
+                            [consultas.circulacao_por_grupo(banco, grupo, um_ano)
+                             for grupo in consultas.GRUPOS_CIRCULACAO],
+                            consultas.livros_mais_emprestados(banco, um_ano),
+                            consultas.livros_mais_emprestados(banco, vizinho.isoformat(),
+                                                              vizinho.isoformat())),
+    }
+
+
+def anotar_comandos():
+    """{(cenário, sql): params} de tudo o que os cenários executam"""
+    with tempfile.TemporaryDirectory() as pasta:
+        banco = _BancoAnotado(os.path.join(pasta, "anotacao.db"))
+        try:
+            banco.migrar()
+            servico = ServicoBiblioteca(banco)
+            cenarios = _cenarios(banco, servico, *_popular(servico))
+            for nome, executar in cenarios.items():
+                banco.cenario = nome
+                executar()
+            banco.cenario = None
+        finally:
+            banco.fechar()
+    comandos = {}
+    for cenario, sql, params in banco.comandos:
+        if sql.lstrip().upper().startswith(('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')):
+            comandos.setdefault((cenario, sql), params)
+    return comandos
+
+
+class BancoDesatualizado(Exception):
+    """O banco informado está numa versão do esquema anterior à do sistema"""
+
+
+def verificar(caminho):
+    """Retorna ({(cenário, sql): [varreduras]} dos comandos com problema, total conferido).
+
+    O banco é aberto somente leitura: numa versão antiga do esquema levanta
+    BancoDesatualizado em vez de migrá-lo.
+    """
+    comandos = anotar_comandos()
+    banco = Banco(caminho, somente_leitura=True)
+    try:
+        versao = banco.versao()
+        if versao < len(MIGRACOES):
+            raise BancoDesatualizado(
+                f"O banco está na versão {versao} do esquema e o sistema na {len(MIGRACOES)}: "
+                f"precisa migrar (abra-o no sistema ou rode manutencao.py) antes da conferência.")
+        conn = banco.conexao()
+        # EXPLAIN não executa o comando e mode=ro já impede gravações; o autorizador
+        # da conexão somente leitura recusaria até preparar os UPDATE e DELETE conferidos
+        conn.set_authorizer(None)
+        problemas = {}
+        for (cenario, sql), params in comandos.items():
+            if cenario in VARREDURAS_PERMITIDAS:
+                continue
+            varreduras = varreduras_completas(conn, sql, params)
+            if varreduras:
+                problemas[cenario, sql] = varreduras
+        return problemas, len(comandos)
+    finally:
+        banco.fechar()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        try:
+            problemas, total = verificar(sys.argv[1])
+        except BancoDesatualizado as e:
+            print(e)
+            sys.exit(2)
+    else:
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "verificacao.db")
+            temporario = Banco(caminho)
+            try:
+                temporario.migrar()
+            finally:
+                temporario.fechar()
+            problemas, total = verificar(caminho)
+    for (cenario, sql), varreduras in problemas.items():
+        print(f"{cenario}: {'; '.join(varreduras)}\n    {' '.join(sql.split())}")
+    if problemas:
+        sys.exit(1)
+    print(f"OK: {total} comandos usam índices")